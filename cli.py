@@ -0,0 +1,160 @@
+# cli.py — служебные команды без GUI
+import argparse
+import re
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent
+sys.path.append(str(PROJECT_ROOT))
+
+from config.paths import CLIENTS_DB_PATH, CONTRACTS_DB_PATH, SQLITE_DB_PATH
+from core.utils import setup_logging
+
+
+def cmd_import_sqlite(args):
+    """Excel → SQLite"""
+    from core.storage import import_excel_to_sqlite
+    counts = import_excel_to_sqlite(args.clients, args.registry, args.db)
+    print(f"Импортировано: клиентов {counts['clients']}, договоров {counts['registry']}")
+
+
+def cmd_export_excel(args):
+    """SQLite → Excel"""
+    from core.storage import export_sqlite_to_excel
+    try:
+        counts = export_sqlite_to_excel(args.clients, args.registry, args.db, overwrite=args.force)
+    except FileExistsError as e:
+        sys.exit(f"{e}. Укажите другие файлы или --force для перезаписи")
+    print(f"Выгружено: клиентов {counts['clients']}, договоров {counts['registry']}")
+
+
+def cmd_compact(args):
+    """Журнал → Excel"""
+    from core.database import compact_storage
+    print(f"Перенесено строк из журнала: {compact_storage()}")
+
+
+def cmd_archive_registry(args):
+    """Договоры прошлых периодов → data/registry_archive/"""
+    from core.database import archive_registry
+    print(f"Перенесено договоров в архив: {archive_registry()}")
+
+
+def cmd_import_clients(args):
+    """Таблица дилера → база клиентов"""
+    from core.bulk_import import import_clients
+    mapping = dict(item.split("=", 1) for item in args.map)
+    result = import_clients(args.file, mapping, args.report, args.dry_run)
+    print(f"Строк в файле: {result.total}, {'прошли проверку' if args.dry_run else 'добавлено клиентов'}: "
+          f"{result.imported}, отклонено: {result.rejected}")
+    if result.report_path:
+        print(f"Отклонённые строки: {result.report_path}")
+
+
+def cmd_generate_contracts(args):
+    """Пакет договоров по списку VIN/ФИО"""
+    from core.batch import generate_contracts
+    terms = list(args.terms)
+    if args.file:
+        terms += [line.strip() for line in args.file.read_text(encoding="utf-8").splitlines() if line.strip()]
+    result = generate_contracts(terms, workers=args.workers, allow_existing=args.allow_existing)
+    for item in result.items:
+        print(f"{'✅' if item.ok else '🔴'} {item.term}: {item.contract_num or '—'} {item.error}".rstrip())
+    print(f"Создано договоров: {len(result.succeeded)} из {len(result.items)} "
+          f"за {result.elapsed:.1f} с ({result.throughput:.1f} док/с)")
+
+
+def cmd_generate_invoices(args):
+    """Пакет счетов по номерам договоров"""
+    from config.settings import DEFAULT_PRICE_SBKTS, DEFAULT_PRICE_SCRAP
+    from core.batch import InvoiceRequest, generate_invoices
+    specs = list(args.contracts)
+    if args.file:
+        specs += [line.strip() for line in args.file.read_text(encoding="utf-8").splitlines() if line.strip()]
+    default_amount = DEFAULT_PRICE_SBKTS if args.service == "sbkts" else DEFAULT_PRICE_SCRAP
+    requests, invalid = [], []
+    for spec in specs:
+        contract_num, _, amount = spec.partition(":")
+        amount = re.sub(r"\s+", "", amount)  # "32 000" → "32000"
+        if not contract_num.strip() or (amount and not amount.isdecimal()):
+            invalid.append(spec)
+            continue
+        requests.append(InvoiceRequest(contract_num.strip(), int(amount) if amount else default_amount,
+                                       args.service, args.payment))
+    if invalid:
+        sys.exit(f"Неверный формат (нужно ДОГОВОР[:СУММА], сумма — целое число): {', '.join(invalid)}")
+    result = generate_invoices(requests, workers=args.workers)
+    for item in result.items:
+        print(f"{'✅' if item.ok else '🔴'} {item.contract_num} {item.error}".rstrip())
+    print(f"Создано счетов: {len(result.succeeded)} из {len(result.items)} "
+          f"за {result.elapsed:.1f} с ({result.throughput:.1f} док/с)")
+
+
+def cmd_backfill_client_keys(args):
+    """№ клиента в старых строках реестра"""
+    from core.database import backfill_contract_clients
+    print(f"Заполнен № клиента в строках реестра: {backfill_contract_clients()}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="AutoContractManager — служебные команды")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import-sqlite", help="Перенести базу из Excel в SQLite")
+    p.add_argument("--clients", type=Path, default=CLIENTS_DB_PATH)
+    p.add_argument("--registry", type=Path, default=CONTRACTS_DB_PATH)
+    p.add_argument("--db", type=Path, default=SQLITE_DB_PATH)
+    p.set_defaults(func=cmd_import_sqlite)
+
+    p = sub.add_parser("export-excel", help="Выгрузить SQLite в файлы Excel")
+    p.add_argument("--clients", type=Path, required=True, help="Файл для листа Folder")
+    p.add_argument("--registry", type=Path, required=True, help="Файл для листа Registry")
+    p.add_argument("--db", type=Path, default=SQLITE_DB_PATH)
+    p.add_argument("--force", action="store_true",
+                   help="Перезаписать существующие файлы (заголовки и другие листы сохраняются)")
+    p.set_defaults(func=cmd_export_excel)
+
+    p = sub.add_parser("compact", help="Перенести журнал новых записей в файлы Excel")
+    p.set_defaults(func=cmd_compact)
+
+    p = sub.add_parser("import-clients", help="Массовый импорт клиентов из .csv/.xlsx")
+    p.add_argument("file", type=Path)
+    p.add_argument("--map", action="append", default=[], metavar="ЗАГОЛОВОК=КОЛОНКА",
+                   help='Колонка файла → колонка листа "Folder", например --map "Тел. моб.=Телефон"')
+    p.add_argument("--report", type=Path, help="Файл отчёта об отклонённых строках (.xlsx или .csv)")
+    p.add_argument("--dry-run", action="store_true", help="Только проверить файл, ничего не сохраняя")
+    p.set_defaults(func=cmd_import_clients)
+
+    p = sub.add_parser("generate-contracts", help="Оформить договоры пакетом по списку VIN или ФИО")
+    p.add_argument("terms", nargs="*", help="VIN или ФИО клиентов")
+    p.add_argument("--file", type=Path, help="Файл со списком: по одному VIN или ФИО в строке")
+    p.add_argument("--workers", type=int, help="Число процессов (по умолчанию — по числу ядер)")
+    p.add_argument("--allow-existing", action="store_true", help="Оформлять и клиентам, у которых договор уже есть")
+    p.set_defaults(func=cmd_generate_contracts)
+
+    p = sub.add_parser("generate-invoices", help="Выставить счета пакетом по номерам договоров")
+    p.add_argument("contracts", nargs="*", metavar="ДОГОВОР[:СУММА]", help='Например, 101-ИП:32000 или 102')
+    p.add_argument("--file", type=Path, help="Файл со списком: по одному ДОГОВОР[:СУММА] в строке")
+    p.add_argument("--service", choices=["sbkts", "scrap"], default="sbkts")
+    p.add_argument("--payment", choices=["card", "account"], default="card")
+    p.add_argument("--workers", type=int, help="Число процессов (по умолчанию — по числу ядер)")
+    p.set_defaults(func=cmd_generate_invoices)
+
+    p = sub.add_parser("backfill-client-keys",
+                       help="Заполнить № клиента в старых строках реестра (по ФИО и телефону)")
+    p.set_defaults(func=cmd_backfill_client_keys)
+
+    p = sub.add_parser("archive-registry", help="Перенести договоры прошлых периодов в архив реестра")
+    p.set_defaults(func=cmd_archive_registry)
+
+    return parser
+
+
+def main(argv=None):
+    setup_logging()
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,9 @@ LOGS_DIR = PROJECT_ROOT / "logs"
 # Файлы данных
 CLIENTS_DB_PATH = DATA_DIR / "database_of_contracts.xlsx"
 CONTRACTS_DB_PATH = DATA_DIR / "contracts_registry.xlsx"
+SQLITE_DB_PATH = DATA_DIR / "database.sqlite3"   # используется при STORAGE_BACKEND = "sqlite"
+SEQUENCES_PATH = DATA_DIR / "sequences.json"     # счётчики номеров клиентов и договоров
+REGISTRY_ARCHIVE_DIR = DATA_DIR / "registry_archive"   # договоры прошлых периодов (см. archive_registry)
 
 # Шаблоны документов
 CONTRACT_TEMPLATE = TEMPLATES_DIR / "contract_template.docx"
@@ -16,6 +16,7 @@ CURRENCY_SYMBOL = "₽"
 # Лимиты
 MAX_SEARCH_RESULTS = 10
 AUTOCOMPLETE_DELAY_MS = 300       # Задержка при поиске в мс
+FUZZY_MAX_DISTANCE = 2            # Сколько опечаток допускает нечёткий поиск (VIN, фамилия)
 
 # Параметры документов
 DEFAULT_SERVICE_SBKTS = "выпуску СБКТС + ЭПТС"
@@ -28,6 +29,35 @@ TAX_RATE = 0.20  # НДС 20%
 DEFAULT_PRICE_SBKTS = 32000
 DEFAULT_PRICE_SCRAP = 1500
 
+# Хранилище данных: "excel" (файлы .xlsx) или "sqlite" (data/database.sqlite3)
+STORAGE_BACKEND = "excel"
+
+# Держать таблицы и индексы в памяти. False — режим экономии памяти:
+# поиск идёт потоковым чтением файла без загрузки всей таблицы
+TABLE_CACHE_ENABLED = True
+
+# Хранить снимок листов Excel в двоичном файле (*.snapshot.pkl) для быстрого запуска
+EXCEL_SNAPSHOT_ENABLED = True
+
+# Период архива реестра договоров: "year", "quarter" или "month".
+# Договоры прошлых периодов переносятся из contracts_registry.xlsx
+# в data/registry_archive/ (python cli.py archive-registry)
+REGISTRY_ARCHIVE_PERIOD = "year"
+
+# Как часто переносить журнал новых записей в файлы Excel (мс)
+JOURNAL_COMPACT_INTERVAL_MS = 5 * 60 * 1000
+
+# Сколько ждать, пока другое рабочее место освободит файл данных (сек)
+LOCK_TIMEOUT_SEC = 15
+
+# Фоновые задания окна (core/jobs.py): поиск, генерация документов, запись в Excel
+JOB_WORKERS = 2                   # Сколько заданий выполняется одновременно
+JOB_POLL_INTERVAL_MS = 100        # Как часто окно забирает результаты заданий
+
+# Движок заполнения шаблонов .docx: "docx" (python-docx) или "xml"
+# (правка XML внутри архива напрямую — быстрее при пакетной генерации)
+DOCX_RENDER_ENGINE = "docx"
+
 # Форматы дат
 DATE_FORMAT = "%d.%m.%Y"
 DATETIME_FORMAT = "%d.%m.%Y %H:%M:%S"
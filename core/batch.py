@@ -0,0 +1,248 @@
+# core/batch.py
+import logging
+import os
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+from config.paths import CONTRACT_TEMPLATE
+from core.database import (
+    is_contract_exists_for_fio, reserve_contract_numbers, save_contract_records, resolve_contracts,
+    search_clients,
+)
+from core.document_generator import contract_context, invoice_context, invoice_run_constants
+from core.jobs import job_cancelled, report_progress
+from core.output_cache import record_rendered, render_replacing
+from core.utils import get_current_date
+
+# Ошибка документа, который не создан из-за отмены задания
+CANCELLED = "отменено"
+
+
+@dataclass
+class BatchItem:
+    """Один документ пакета"""
+    term: str                               # запрос из списка (VIN или ФИО)
+    contract_num: str = ""                  # номер договора ("" — не дошло до нумерации)
+    output_path: Optional[Path] = None
+    error: str = ""                         # "" — документ создан
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+
+@dataclass
+class InvoiceRequest:
+    """Счёт для пакетного выставления"""
+    contract_num: str                       # например, "101-ИП" (можно "101")
+    amount: int
+    service_type: str = "sbkts"             # "sbkts" или "scrap"
+    payment_method: str = "card"            # "card" или "account"
+
+
+@dataclass
+class BatchResult:
+    """Итог пакетной генерации"""
+    items: List[BatchItem] = field(default_factory=list)
+    elapsed: float = 0.0                    # секунды
+
+    @property
+    def succeeded(self) -> List[BatchItem]:
+        return [item for item in self.items if item.ok]
+
+    @property
+    def failed(self) -> List[BatchItem]:
+        return [item for item in self.items if not item.ok]
+
+    @property
+    def throughput(self) -> float:
+        """Документов в секунду"""
+        return len(self.succeeded) / self.elapsed if self.elapsed else 0.0
+
+
+def _render_all(jobs: list, workers: Optional[int]) -> List[str]:
+    """
+    Заполняет шаблоны [(шаблон, файл, данные)] в пуле процессов.
+    Файлы подменяются через временные (core.output_cache), созданные
+    документы записываются в манифест готовых документов одной записью.
+    Из очереди заданий окна (core.jobs) — с ходом выполнения; после отмены
+    оставшиеся документы не создаются.
+    :return: ошибка по каждому заданию ("" — успешно)
+    """
+    errors = _render_jobs(jobs, workers)
+    try:
+        record_rendered(job for job, error in zip(jobs, errors) if not error)
+    except Exception as e:
+        logging.warning(f"⚠️ Манифест готовых документов не обновлён: {e}")
+    return errors
+
+
+def _render_jobs(jobs: list, workers: Optional[int]) -> List[str]:
+    """Сами документы: по одному или в пуле процессов"""
+    errors = [""] * len(jobs)
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers <= 1 or len(jobs) <= 1:
+        # Запуск пула дороже одного документа
+        for i, job in enumerate(jobs):
+            if job_cancelled():
+                errors[i] = CANCELLED
+                continue
+            try:
+                render_replacing(*job)
+            except Exception as e:
+                errors[i] = str(e)
+            report_progress(i + 1, len(jobs))
+        return errors
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(render_replacing, *job): i for i, job in enumerate(jobs)}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                future.result()
+            except CancelledError:
+                errors[futures[future]] = CANCELLED
+            except Exception as e:
+                errors[futures[future]] = str(e)
+            report_progress(done, len(jobs))
+            if job_cancelled():
+                for pending in futures:
+                    pending.cancel()
+    return errors
+
+
+def generate_contracts(terms: List[str], workers: Optional[int] = None,
+                       allow_existing: bool = False) -> BatchResult:
+    """
+    Пакетное оформление договоров (например, в конце месяца).
+
+    Клиент ищется по VIN или ФИО точным поиском (search_clients, без нечёткого):
+    договор оформляется, только если по запросу найден ровно один клиент —
+    подтвердить выбор в пакете некому. Номера договоров резервируются
+    одним обращением подряд, документы заполняются в пуле процессов, а все
+    созданные договоры записываются в реестр одной записью.
+    Номер договора, документ которого не удалось создать, не выдаётся повторно.
+
+    :param terms: VIN или ФИО клиентов
+    :param workers: число процессов (по умолчанию — по числу ядер)
+    :param allow_existing: оформлять клиентам, у которых договор уже есть
+    """
+    started = time.perf_counter()
+    result = BatchResult()
+    clients, pending, seen = [], [], set()
+    for term in terms:
+        item = BatchItem(term=term)
+        result.items.append(item)
+        found = search_clients(term, limit=2)
+        if not found:
+            item.error = "клиент не найден"
+            continue
+        if len(found) > 1:
+            item.error = "по запросу найдено несколько клиентов — укажите VIN или полное ФИО"
+            continue
+        client = found[0]
+        if client.number in seen:
+            item.error = f"клиент {client.full_name} уже есть в списке"
+            continue
+        seen.add(client.number)
+        if not allow_existing and is_contract_exists_for_fio(client.full_name):
+            item.error = f"у клиента {client.full_name} уже есть договор"
+            continue
+        clients.append(client)
+        pending.append(item)
+
+    if pending:
+        jobs, rendered = [], []
+        for item, client, contract_num in zip(pending, clients, reserve_contract_numbers(len(pending))):
+            item.contract_num = contract_num
+            try:
+                context, item.output_path = contract_context(client, contract_num)
+            except Exception as e:
+                item.error = f"неполные данные клиента: {e}"
+                continue
+            jobs.append((CONTRACT_TEMPLATE, item.output_path, context))
+            rendered.append(item)
+
+        for item, error in zip(rendered, _render_all(jobs, workers)):
+            item.error = error
+
+        today = get_current_date()
+        created = [(item, client) for item, client in zip(pending, clients) if item.ok]
+        try:
+            saved = save_contract_records([
+                {
+                    "Номер": None,
+                    "ФИО": client.full_name,
+                    "Номер договора": item.contract_num,
+                    "Телефон": client["Телефон"],
+                    "Индекс": client["Индекс"],
+                    "Дата": today,
+                    "№ клиента": client.number,
+                }
+                for item, client in created
+            ])
+            saved_numbers = {row["Номер договора"] for row in saved}
+        except Exception as e:
+            logging.error(f"🔴 Ошибка записи пакета договоров в реестр: {e}")
+            saved_numbers = set()
+        for item, _ in created:
+            if item.contract_num not in saved_numbers:
+                item.error = "документ создан, но договор не записан в реестр"
+
+    result.elapsed = time.perf_counter() - started
+    for item in result.failed:
+        number = f" (номер {item.contract_num} пропущен)" if item.contract_num else ""
+        logging.warning(f"⚠️ Договор для '{item.term}' не создан{number}: {item.error}")
+    logging.info(f"✅ Пакет договоров: создано {len(result.succeeded)} из {len(result.items)} "
+                 f"за {result.elapsed:.1f} с ({result.throughput:.1f} док/с)")
+    return result
+
+
+def generate_invoices(requests: List[InvoiceRequest], workers: Optional[int] = None) -> BatchResult:
+    """
+    Пакетное выставление счетов по номерам договоров.
+
+    Договоры и клиенты находятся одним чтением реестра и базы клиентов
+    (resolve_contracts), дата и дата прописью считаются один раз на пакет,
+    шаблоны счетов разбираются один раз (core.templates).
+    :param workers: число процессов (по умолчанию — по числу ядер)
+    """
+    started = time.perf_counter()
+    result = BatchResult()
+    numbers = [r.contract_num if "-ИП" in r.contract_num else f"{r.contract_num}-ИП" for r in requests]
+    resolved = resolve_contracts(numbers)
+    run = invoice_run_constants()
+
+    jobs, rendered = [], []
+    for request, contract_num in zip(requests, numbers):
+        item = BatchItem(term=request.contract_num, contract_num=contract_num)
+        result.items.append(item)
+        contract, client = resolved.get(contract_num.strip(), (None, None))
+        if contract is None:
+            item.error = "договор не найден в реестре"
+            continue
+        if client is None:
+            item.error = f"клиент {contract.fio} не найден"
+            continue
+        try:
+            template_path, context, item.output_path = invoice_context(
+                client, contract_num, str(contract.date).strip(), request.service_type,
+                request.amount, request.payment_method, run,
+            )
+        except Exception as e:
+            item.error = f"неполные данные клиента: {e}"
+            continue
+        jobs.append((template_path, item.output_path, context))
+        rendered.append(item)
+
+    for item, error in zip(rendered, _render_all(jobs, workers)):
+        item.error = error
+
+    result.elapsed = time.perf_counter() - started
+    for item in result.failed:
+        logging.warning(f"⚠️ Счёт по договору '{item.term}' не создан: {item.error}")
+    logging.info(f"✅ Пакет счетов: создано {len(result.succeeded)} из {len(result.items)} "
+                 f"за {result.elapsed:.1f} с ({result.throughput:.1f} док/с)")
+    return result
@@ -0,0 +1,187 @@
+# core/bulk_import.py
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from core.database import existing_client_vins, save_clients
+from core.records import cell_text
+from core.storage import CLIENT_COLUMNS
+from core.utils import get_current_date, normalize_vin
+from core.validators import validate_phone_series, validate_vin_series, validate_date_series
+
+# Заголовки из файлов дилеров → колонки листа "Folder".
+# Сравниваются без регистра, пробелов и знаков препинания (см. _header_key)
+COLUMN_ALIASES = {
+    "фамилия": "Фамилия", "surname": "Фамилия", "lastname": "Фамилия",
+    "имя": "Имя", "name": "Имя", "firstname": "Имя",
+    "отчество": "Отчество", "patronymic": "Отчество", "middlename": "Отчество",
+    "маркаавто": "Марка авто", "марка": "Марка авто", "автомобиль": "Марка авто",
+    "модель": "Марка авто", "car": "Марка авто", "carmodel": "Марка авто",
+    "vin": "VIN", "вин": "VIN", "vinкод": "VIN", "vincode": "VIN",
+    "индекс": "Индекс", "index": "Индекс",
+    "адрес": "Адрес", "address": "Адрес",
+    "паспорт": "Паспорт (серия и номер)", "паспортсерияиномер": "Паспорт (серия и номер)",
+    "серияиномерпаспорта": "Паспорт (серия и номер)", "passport": "Паспорт (серия и номер)",
+    "кемвыдан": "Кем выдан", "issuedby": "Кем выдан",
+    "датавыдачи": "Дата выдачи", "issuedate": "Дата выдачи",
+    "кодподразделения": "Код подразделения",
+    "телефон": "Телефон", "тел": "Телефон", "phone": "Телефон", "мобильный": "Телефон",
+    "датарождения": "Дата рождения", "birthdate": "Дата рождения",
+}
+
+# Обязательные поля — как в окне ввода клиента
+REQUIRED_COLUMNS = ["Марка авто", "VIN", "Индекс"]
+
+# Колонки отчёта об отклонённых строках
+REPORT_ROW = "Строка файла"
+REPORT_REASON = "Причина"
+
+
+@dataclass
+class ImportResult:
+    """Итог массового импорта"""
+    total: int                      # строк в файле (без пустых)
+    imported: int                   # сохранено клиентов
+    rejected: int                   # отклонено (см. отчёт)
+    report_path: Optional[Path]     # отчёт об отклонённых строках (None — всё принято)
+
+
+def _header_key(header: str) -> str:
+    return re.sub(r"[\W_]+", "", str(header).casefold())
+
+
+def read_source(path: Path) -> pd.DataFrame:
+    """Таблица дилера (.csv или .xlsx/.xls) как есть: все значения — строки"""
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        try:
+            df = pd.read_csv(path, dtype=object, sep=None, engine="python", encoding="utf-8-sig")
+        except UnicodeDecodeError:
+            # Выгрузки из Excel под Windows
+            df = pd.read_csv(path, dtype=object, sep=None, engine="python", encoding="cp1251")
+    else:
+        df = pd.read_excel(path, dtype=object)
+    # Даты из Excel → ДД.ММ.ГГГГ, 89991234567.0 → "89991234567"
+    return df.map(cell_text).apply(lambda column: column.str.strip())
+
+
+def map_columns(df: pd.DataFrame, mapping: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    Переименовывает колонки файла в колонки листа "Folder": сначала по mapping
+    (заголовок файла → колонка), затем по COLUMN_ALIASES. Неизвестные колонки
+    отбрасываются, недостающие заполняются пустыми строками.
+    """
+    mapping = dict(mapping or {})
+    known = {_header_key(column): column for column in CLIENT_COLUMNS}
+    renamed = {}
+    for header in df.columns:
+        target = mapping.get(header) or known.get(_header_key(header)) or COLUMN_ALIASES.get(_header_key(header))
+        if target in CLIENT_COLUMNS and target not in renamed.values():
+            renamed[header] = target
+    unknown = [str(header) for header in df.columns if header not in renamed]
+    if unknown:
+        logging.warning(f"⚠️ Колонки файла не распознаны и пропущены: {', '.join(unknown)}")
+    result = df[list(renamed)].rename(columns=renamed)
+    return result.reindex(columns=CLIENT_COLUMNS, fill_value="")
+
+
+def _rejection_reasons(df: pd.DataFrame) -> pd.Series:
+    """Причины отклонения по строкам ("" — строка принята): проверки целыми колонками"""
+    reasons = pd.Series("", index=df.index)
+
+    def reject(mask: pd.Series, reason: str):
+        reasons[mask] += reason + "; "
+
+    for column in REQUIRED_COLUMNS:
+        reject(df[column] == "", f"не заполнено поле '{column}'")
+    reject((df["VIN"] != "") & ~validate_vin_series(df["VIN"]), "неверный VIN")
+    reject((df["Телефон"] != "") & ~validate_phone_series(df["Телефон"]), "неверный телефон")
+    for column in ("Дата выдачи", "Дата рождения"):
+        reject((df[column] != "") & ~validate_date_series(df[column]), f"неверная дата в поле '{column}'")
+
+    vin_keys = df["VIN"].map(normalize_vin)
+    reject((reasons == "") & vin_keys.isin(existing_client_vins(list(vin_keys.unique()))), "VIN уже есть в базе")
+    reject((reasons == "") & vin_keys.duplicated() & (vin_keys != ""), "VIN повторяется в файле")
+    return reasons.str.rstrip("; ")
+
+
+def _format_phones(phones: pd.Series) -> pd.Series:
+    """format_phone для колонки (пустой телефон остаётся пустым)"""
+    digits = phones.str.replace(r"\D", "", regex=True).str[-11:].str.zfill(11)
+    formatted = ("+" + digits.str[0] + " " + digits.str[1:4] + " " + digits.str[4:7]
+                 + "-" + digits.str[7:9] + "-" + digits.str[9:11])
+    return formatted.where(phones != "", "")
+
+
+def _folder_names(df: pd.DataFrame) -> pd.Series:
+    """client_folder_name для всех строк: Фамилия_Марка_vin VIN_Индекс"""
+    return df["Фамилия"] + "_" + df["Марка авто"] + "_vin " + df["VIN"] + "_" + df["Индекс"]
+
+
+def prepare_clients(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Проверяет и готовит строки к сохранению.
+    :param df: таблица с колонками листа "Folder" (см. map_columns)
+    :return: (принятые строки, отклонённые строки с колонкой REPORT_REASON)
+    """
+    reasons = _rejection_reasons(df)
+    accepted = df[reasons == ""].copy()
+    rejected = df[reasons != ""].assign(**{REPORT_REASON: reasons[reasons != ""]})
+
+    accepted["Телефон"] = _format_phones(accepted["Телефон"])
+    accepted["Папка"] = _folder_names(accepted)
+    accepted["Дата создания папки"] = get_current_date()
+    return accepted, rejected
+
+
+def _write_report(rejected: pd.DataFrame, path: Path):
+    if path.suffix.lower() == ".csv":
+        rejected.to_csv(path, index=False, encoding="utf-8-sig", sep=";")
+    else:
+        rejected.to_excel(path, index=False)
+
+
+def import_clients(path: Path, mapping: Optional[Dict[str, str]] = None,
+                   report_path: Optional[Path] = None, dry_run: bool = False) -> ImportResult:
+    """
+    Массовый импорт клиентов из таблицы дилера (.csv/.xlsx).
+
+    Все проверки (VIN, телефон, даты) идут целыми колонками, принятые клиенты
+    сохраняются одной записью (save_clients) с № подряд. Клиенты, чей VIN уже
+    есть в базе или повторяется в файле, отклоняются.
+    :param mapping: заголовок файла → колонка листа "Folder", если не распознан сам
+    :param report_path: куда записать отклонённые строки (по умолчанию
+        <имя файла>_отклонено.xlsx рядом с исходным файлом)
+    :param dry_run: только проверить, ничего не сохраняя
+    """
+    path = Path(path)
+    df = map_columns(read_source(path), mapping)
+    df.index = df.index + 2  # Номер строки в файле (строка 1 — заголовок)
+    # Полностью пустые строки (хвосты выгрузок из Excel) не считаются и не отклоняются
+    df = df[(df != "").any(axis=1)]
+    accepted, rejected = prepare_clients(df)
+
+    imported = len(accepted)
+    if len(accepted) and not dry_run:
+        saved, duplicates = save_clients(accepted.to_dict("records"))
+        imported = len(saved)
+        if duplicates:
+            # Клиента с тем же VIN успели сохранить на другом рабочем месте
+            duplicate_vins = {normalize_vin(row["VIN"]) for row in duplicates}
+            in_base = accepted[accepted["VIN"].map(normalize_vin).isin(duplicate_vins)]
+            rejected = pd.concat([rejected, in_base.assign(**{REPORT_REASON: "VIN уже есть в базе"})])
+
+    if len(rejected):
+        report_path = Path(report_path) if report_path else path.with_name(f"{path.stem}_отклонено.xlsx")
+        report = rejected.sort_index().rename_axis(REPORT_ROW).reset_index()
+        _write_report(report.drop(columns=["№", "Папка", "Дата создания папки"]), report_path)
+        logging.warning(f"⚠️ Импорт {path.name}: отклонено строк — {len(rejected)}, отчёт: {report_path}")
+    else:
+        report_path = None
+
+    logging.info(f"✅ Импорт {path.name}: строк {len(df)}, {'проверено' if dry_run else 'сохранено'} {imported}")
+    return ImportResult(total=len(df), imported=imported, rejected=len(rejected), report_path=report_path)
@@ -1,52 +1,796 @@
 # core/database.py
 import logging
-import pandas as pd
-from openpyxl import load_workbook
-from typing import Optional, Dict, Any
+import re
+import threading
+import heapq
+from contextlib import contextmanager
+from typing import Callable, Optional, Dict, Any, List, NamedTuple, Tuple
 
-# Импортируем пути
-from config.paths import CLIENTS_DB_PATH, CONTRACTS_DB_PATH
+from config.paths import SEQUENCES_PATH, CLIENTS_DB_PATH, CONTRACTS_DB_PATH, REGISTRY_ARCHIVE_DIR
+from config.settings import TABLE_CACHE_ENABLED, MAX_SEARCH_RESULTS, FUZZY_MAX_DISTANCE, REGISTRY_ARCHIVE_PERIOD
+from core.locking import FileLock
+from core.fuzzy import FuzzyIndex, levenshtein, allowed_distance, best_matches
+from core.records import ClientRecord, ContractRecord, cell_int, cell_text
+from core.registry_archive import RegistryArchive, period_of
+from core.search_index import SubstringIndex, KeyIndex, PrefixIndex
+from core.sequences import SequenceStore
+from core.storage import get_storage, REGISTRY_COLUMNS
+from core.utils import normalize_search_text, normalize_vin, get_current_date, client_folder_name
+
+# Тип записи для каждой таблицы
+RECORD_TYPES = {"clients": ClientRecord, "registry": ContractRecord}
+
+# Межпроцессные замки таблиц: запись, проверка номеров и уплотнение журнала
+# идут по очереди, даже если программа открыта на нескольких рабочих местах
+_table_locks = {
+    "clients": FileLock(CLIENTS_DB_PATH.with_suffix(".lock")),
+    "registry": FileLock(CONTRACTS_DB_PATH.with_suffix(".lock")),
+}
+# Замки уплотнения журнала: .xlsx переписывается без замка таблицы,
+# но два уплотнения одной таблицы не идут одновременно. Берутся до замка таблицы
+_compaction_locks = {
+    "clients": FileLock(CLIENTS_DB_PATH.with_suffix(".compact.lock")),
+    "registry": FileLock(CONTRACTS_DB_PATH.with_suffix(".compact.lock")),
+}
+
+
+# --- Кэш таблиц ---
+
+class _TableCache:
+    """
+    Кэш таблиц хранилища (Excel или SQLite) на весь процесс.
+    Таблица хранится списком компактных записей (ClientRecord / ContractRecord),
+    собранных прямо из строк файла. Файл читается один раз и перечитывается
+    только если изменились mtime/размер файла или после собственной записи
+    (invalidate). К таблице можно привязать производные структуры (индексы
+    и т.п.) — они живут, пока актуальна таблица, и дополняются при append_rows.
+
+    Производные структуры дополняются на месте, а поиск идёт в фоновых
+    потоках (core.jobs) параллельно с записью: обход индексов и чтение строк
+    по найденным позициям — только внутри `with _cache.reading():`.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # имя → {"stamp": штамп таблицы, "rows": [записи], "derived": {ключ: (объект, extend)}}
+        self._entries: Dict[str, dict] = {}
+        self._stats = {"hits": 0, "misses": 0, "reloads": 0}
+
+    @staticmethod
+    def _stamp(name: str) -> tuple:
+        return tuple(get_storage().stamp(name))
+
+    def _entry(self, name: str) -> dict:
+        stamp = self._stamp(name)
+        entry = self._entries.get(name)
+        if entry is not None and entry["stamp"] == stamp:
+            self._stats["hits"] += 1
+            return entry
+
+        record_type = RECORD_TYPES[name]
+        rows = [record_type.from_row(row) for row in get_storage().read_rows(name)]
+        if entry is None:
+            self._stats["misses"] += 1
+        else:
+            self._stats["reloads"] += 1
+            logging.info(f"Таблица '{name}' изменилась на диске — перечитана")
+        entry = self._entries[name] = {"stamp": stamp, "rows": rows, "derived": {}}
+        return entry
+
+    def get(self, name: str) -> list:
+        """
+        Возвращает таблицу из кэша. Список общий для всех вызовов —
+        изменять его нельзя, только читать.
+        """
+        with self._lock:
+            return self._entry(name)["rows"]
+
+    def reading(self):
+        """Замок для обхода производных структур: пока он взят, append_rows их не меняет"""
+        return self._lock
+
+    def get_derived(self, name: str, key: str, build, extend=None, replace=None):
+        """
+        Производная структура таблицы: build(rows) при первом обращении.
+        extend(объект, rows, start) -> объект — дополнение после append_rows
+        (записи начиная с позиции start); без extend структура пересобирается.
+        replace(объект, rows, position, old) -> объект — поправка после
+        replace_row (old — прежняя запись); без replace структура пересобирается.
+        """
+        with self._lock:
+            entry = self._entry(name)
+            item = entry["derived"].get(key)
+            if item is None:
+                item = entry["derived"][key] = (build(entry["rows"]), extend, replace)
+            return item[0]
+
+    def stamp_of(self, name: str) -> Optional[tuple]:
+        """Текущий штамп таблицы (None, если файла нет)"""
+        try:
+            return self._stamp(name)
+        except Exception:
+            return None
+
+    def append_rows(self, name: str, rows: list, stamp_before: Optional[tuple]):
+        """
+        Дописывает в кэш строки, только что сохранённые в файл.
+        stamp_before — штамп файла до записи: если кэш к тому моменту уже
+        устарел (файл меняли извне), таблица просто будет перечитана.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry["stamp"] is None or entry["stamp"] != stamp_before:
+                self.invalidate(name)
+                return
+
+            # Новый список, а не append: ранее выданный get() не меняется под читателем
+            start = len(entry["rows"])
+            record_type = RECORD_TYPES[name]
+            entry["rows"] = entry["rows"] + [record_type.from_row(row) for row in rows]
+            entry["stamp"] = self._stamp(name)
+
+            derived = {}
+            for key, (obj, extend, replace) in entry["derived"].items():
+                if extend is not None:
+                    derived[key] = (extend(obj, entry["rows"], start), extend, replace)
+            entry["derived"] = derived
+
+    def replace_row(self, name: str, position: int, row: Dict[str, Any], stamp_before: Optional[tuple]):
+        """
+        Заменяет в кэше одну запись, только что исправленную в хранилище.
+        Производные структуры поправляются только для этой записи (replace,
+        см. get_derived), остальные пересобираются при обращении (таблица
+        с диска не перечитывается). Если кэш к моменту записи уже устарел —
+        таблица будет перечитана.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry["stamp"] is None or entry["stamp"] != stamp_before:
+                self.invalidate(name)
+                return
+
+            rows = list(entry["rows"])
+            old = rows[position]
+            rows[position] = RECORD_TYPES[name].from_row(row)
+            entry["rows"] = rows
+            entry["stamp"] = self._stamp(name)
+
+            derived = {}
+            for key, (obj, extend, replace) in entry["derived"].items():
+                if replace is not None:
+                    derived[key] = (replace(obj, rows, position, old), extend, replace)
+            entry["derived"] = derived
+
+    def restamp(self, name: str, stamp_before: Optional[tuple]):
+        """
+        Файл таблицы переписан без изменения содержимого (уплотнение журнала):
+        кэш остаётся в силе, если был актуален до записи.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry["stamp"] is not None and entry["stamp"] == stamp_before:
+                entry["stamp"] = self._stamp(name)
+            else:
+                self.invalidate(name)
+
+    def invalidate(self, name: Optional[str] = None):
+        """Сбрасывает одну таблицу (или все), следующее чтение пойдёт с диска"""
+        with self._lock:
+            # Штамп None: таблица будет перечитана и учтена как reload
+            for key in ([name] if name else list(self._entries)):
+                if key in self._entries:
+                    self._entries[key]["stamp"] = None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, cached=len(self._entries))
+
+
+_cache = _TableCache()
+
+
+def read_table(name: str) -> list:
+    """
+    Таблица через кэш (только для чтения!):
+    'clients' — список ClientRecord, 'registry' — список ContractRecord
+    """
+    return _cache.get(name)
+
+
+def invalidate_cache(name: Optional[str] = None):
+    """Принудительно сбрасывает кэш таблицы (или всех таблиц)"""
+    _cache.invalidate(name)
+
+
+def iter_table(name: str):
+    """
+    Потоковый обход строк таблицы без загрузки её целиком (словари {колонка: значение}).
+    Для проходов, которым не нужна вся таблица: поиск первого совпадения, максимум номера.
+    """
+    return get_storage().iter_rows(name)
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """Счётчики кэша: hits / misses / reloads и число таблиц в памяти"""
+    return _cache.stats()
+
+
+def has_pending_writes() -> bool:
+    """Есть ли строки в журнале, ещё не перенесённые в .xlsx"""
+    storage = get_storage()
+    return any(storage.has_pending(name) for name in ("clients", "registry"))
+
+
+def _compaction_step(name: str):
+    """
+    Замок таблицы на шаг уплотнения (смена журнала, подмена файла).
+    Содержимое таблицы при этом не меняется — кэш и счётчики остаются верными.
+    """
+    @contextmanager
+    def locked():
+        with _table_locks[name]:
+            stamp_before = _cache.stamp_of(name)
+            yield
+            stamp_after = _cache.stamp_of(name)
+            if stamp_after != stamp_before:
+                _cache.restamp(name, stamp_before)
+                _sequences.advance(name, {}, stamp_before, stamp_after)
+    return locked
+
+
+def compact_storage() -> int:
+    """
+    Переносит журнал записей в файлы Excel (в простое или при выходе).
+    Замок таблицы берётся только на короткие шаги (см. ExcelStorage.compact):
+    сохранение на других рабочих местах не ждёт перезаписи .xlsx.
+    :return: сколько строк перенесено
+    """
+    total = 0
+    for name in ("clients", "registry"):
+        try:
+            with _compaction_locks[name]:
+                total += get_storage().compact(name, _compaction_step(name))
+        except Exception as e:
+            logging.error(f"Ошибка переноса журнала '{name}' в Excel: {e}")
+    return total
+
+
+# --- Нумерация ---
+
+_sequences = SequenceStore(SEQUENCES_PATH)
+
+
+def _contract_number_value(num_str: Any) -> Optional[int]:
+    """Числовая часть номера договора: '101-ИП' → 101 (None для некорректных)"""
+    if isinstance(num_str, str) and "-ИП" in num_str:
+        try:
+            return int(num_str.replace("-ИП", "").strip())
+        except ValueError:
+            return None  # Пропускаем некорректные значения
+    return None
+
+
+def _client_counters() -> Dict[str, int]:
+    """Пересчёт последнего № клиента по таблице (только при расхождении со счётчиком)"""
+    last = 0
+    for row in iter_table("clients"):  # Потоково: нужен только максимум
+        number = cell_int(row.get("№"))
+        if number is not None:
+            last = max(last, number)
+    return {"client": last}
+
+
+def _registry_counters() -> Dict[str, int]:
+    """Пересчёт последнего Номера и номера договора по реестру и его архиву"""
+    # Нумерация продолжается после архивных договоров — их максимумы в манифесте
+    archived = _archive.max_values()
+    last_id, last_contract = archived["registry"], max(100, archived["contract"])
+    for row in iter_table("registry"):
+        registry_id = cell_int(row.get("Номер"))
+        if registry_id is not None:
+            last_id = max(last_id, registry_id)
+        # Извлекаем числовую часть из 'Номер договора' (например, из '101-ИП' → 101)
+        contract = _contract_number_value(row.get("Номер договора"))
+        if contract is not None:
+            last_contract = max(last_contract, contract)
+    return {"registry": last_id, "contract": last_contract}
+
+
+def _counters(table: str) -> Dict[str, int]:
+    rebuild = _client_counters if table == "clients" else _registry_counters
+    return _sequences.peek(table, _cache.stamp_of(table), rebuild)
+
+
+def _reserve(table: str, counter: str, count: int = 1) -> int:
+    """Первый из count номеров, выданных только этому вызову (на всех рабочих местах)"""
+    rebuild = _client_counters if table == "clients" else _registry_counters
+    return _sequences.reserve(table, counter, _cache.stamp_of(table), rebuild, count)
+
+
+def reserve_client_id() -> int:
+    """Резервирует № для нового клиента: тот же номер больше никому не выдаётся"""
+    return _reserve("clients", "client")
+
+
+def reserve_registry_id() -> int:
+    """Резервирует порядковый Номер для новой строки реестра"""
+    return _reserve("registry", "registry")
+
+
+def reserve_contract_number() -> str:
+    """
+    Резервирует номер договора (например, 103-ИП) до генерации документа:
+    два рабочих места не получат один и тот же номер
+    """
+    return f"{_reserve('registry', 'contract')}-ИП"
+
+
+def reserve_contract_numbers(count: int) -> List[str]:
+    """
+    Резервирует count номеров договоров подряд одним обращением к счётчику
+    (пакетная генерация). Неиспользованные номера остаются пропуском в нумерации
+    """
+    first = _reserve("registry", "contract", count)
+    return [f"{number}-ИП" for number in range(first, first + count)]
+
+
+# --- Поисковый индекс клиентов ---
+
+# Колонки, по которым find_client ищет подстроку
+CLIENT_SEARCH_COLUMNS = ["VIN", "Фамилия", "Имя", "Отчество"]
+
+
+class _ClientKeys(NamedTuple):
+    """Нормализованные ключи поиска клиента (см. normalize_vin, normalize_search_text)"""
+    vin: str
+    surname: str
+    name: str
+    patronymic: str
+    fio: str
+
+
+def _client_keys(client: ClientRecord) -> _ClientKeys:
+    surname, name, patronymic = map(normalize_search_text, (client.surname, client.name, client.patronymic))
+    fio = " ".join(part for part in (surname, name, patronymic) if part)
+    return _ClientKeys(normalize_vin(client.vin), surname, name, patronymic, fio)
+
+
+def _client_search_keys() -> List[_ClientKeys]:
+    """
+    Ключи поиска всех клиентов (по позиции в таблице): нормализуются один раз
+    при загрузке таблицы и при сохранении клиента, а не при каждом запросе
+    """
+    def extend(keys, rows, start):
+        keys.extend(_client_keys(client) for client in rows[start:])
+        return keys
+
+    def replace(keys, rows, position, old):
+        keys[position] = _client_keys(rows[position])
+        return keys
+
+    return _cache.get_derived(
+        "clients", "keys",
+        build=lambda rows: [_client_keys(client) for client in rows],
+        extend=extend,
+        replace=replace,
+    )
+
+
+def _client_search_index() -> Dict[str, SubstringIndex]:
+    """Подстрочные индексы по ключам: VIN отдельно, Фамилия/Имя/Отчество вместе"""
+    def add(indexes, keys):
+        for k in keys:
+            indexes["vin"].add_row((k.vin,))
+            indexes["names"].add_row((k.surname, k.name, k.patronymic))
+        return indexes
+
+    def replace(indexes, rows, position, old):
+        k = _client_keys(rows[position])
+        indexes["vin"].replace_row(position, (k.vin,))
+        indexes["names"].replace_row(position, (k.surname, k.name, k.patronymic))
+        return indexes
+
+    return _cache.get_derived(
+        "clients", "search",
+        build=lambda rows: add({"vin": SubstringIndex(), "names": SubstringIndex()}, _client_search_keys()),
+        extend=lambda indexes, rows, start: add(indexes, map(_client_keys, rows[start:])),
+        replace=replace,
+    )
+
+
+def _client_exact_indexes() -> Dict[str, KeyIndex]:
+    """Точные ключи клиентов: VIN, полное ФИО и фамилия"""
+    def add(indexes, keys):
+        for k in keys:
+            indexes["vin"].add(k.vin)
+            indexes["fio"].add(k.fio)
+            indexes["surname"].add(k.surname)
+        return indexes
+
+    def replace(indexes, rows, position, old):
+        before, after = _client_keys(old), _client_keys(rows[position])
+        for name in ("vin", "fio", "surname"):
+            indexes[name].replace(position, getattr(before, name), getattr(after, name))
+        return indexes
+
+    return _cache.get_derived(
+        "clients", "exact",
+        build=lambda rows: add({"vin": KeyIndex(), "fio": KeyIndex(), "surname": KeyIndex()}, _client_search_keys()),
+        extend=lambda indexes, rows, start: add(indexes, map(_client_keys, rows[start:])),
+        replace=replace,
+    )
+
+
+def _client_number_index() -> KeyIndex:
+    """№ клиента → позиция в таблице"""
+    def add(index, rows):
+        index.extend(str(client.number) if client.number is not None else None for client in rows)
+        return index
+
+    def replace(index, rows, position, old):
+        def key(client):
+            return str(client.number) if client.number is not None else None
+        index.replace(position, key(old), key(rows[position]))
+        return index
+
+    return _cache.get_derived(
+        "clients", "number",
+        build=lambda rows: add(KeyIndex(), rows),
+        extend=lambda index, rows, start: add(index, rows[start:]),
+        replace=replace,
+    )
+
+
+def _locate_client(key: Any) -> Optional[tuple]:
+    """
+    Клиент по № (число или строка из цифр) или по VIN:
+    (позиция в таблице, ClientRecord) или None, если не найден или VIN неоднозначен
+    """
+    number = cell_int(key) if str(key).strip().isdigit() else None
+    vin = normalize_vin(str(key)) if number is None else ""
+    if number is None and not vin:
+        return None
+
+    if TABLE_CACHE_ENABLED:
+        with _cache.reading():
+            if number is not None:
+                positions = list(_client_number_index().get(str(number)))
+            else:
+                positions = list(_client_exact_indexes()["vin"].get(vin))
+            client = read_table("clients")[positions[0]] if positions else None
+        if len(positions) > 1 and number is None:
+            logging.warning(f"⚠️ VIN {key} есть у нескольких клиентов — укажите №")
+            return None
+        return (positions[0], client) if positions else None
+
+    matches = []
+    for row in iter_table("clients"):
+        client = ClientRecord.from_row(row)
+        if (client.number == number) if number is not None else (normalize_vin(client.vin) == vin):
+            matches.append(client)
+            if number is not None or len(matches) > 1:
+                break
+    if len(matches) > 1:
+        logging.warning(f"⚠️ VIN {key} есть у нескольких клиентов — укажите №")
+        return None
+    return (None, matches[0]) if matches else None
+
+
+def _client_prefix_index() -> Dict[str, PrefixIndex]:
+    """Поиск по началу: VIN отдельно; фамилия, имя, отчество и полное ФИО вместе"""
+    def add(indexes, keys, start):
+        for pos, k in enumerate(keys, start):
+            indexes["vin"].add(k.vin, pos)
+            for key in (k.surname, k.name, k.patronymic, k.fio):
+                indexes["names"].add(key, pos)
+        return indexes
+
+    def build(rows):
+        keys = _client_search_keys()
+        return {
+            "vin": PrefixIndex((k.vin, pos) for pos, k in enumerate(keys)),
+            "names": PrefixIndex(
+                (key, pos) for pos, k in enumerate(keys) for key in (k.surname, k.name, k.patronymic, k.fio)
+            ),
+        }
+
+    def replace(indexes, rows, position, old):
+        k = _client_keys(old)
+        indexes["vin"].remove(k.vin, position)
+        for key in (k.surname, k.name, k.patronymic, k.fio):
+            indexes["names"].remove(key, position)
+        return add(indexes, [_client_keys(rows[position])], position)
+
+    return _cache.get_derived(
+        "clients", "prefix",
+        build=build,
+        extend=lambda indexes, rows, start: add(indexes, map(_client_keys, rows[start:]), start),
+        replace=replace,
+    )
+
+
+def _search_clients_cached(vin: str, key: str, needed: int) -> List[ClientRecord]:
+    """Ранжированный поиск по индексам: каждый уровень — пока не набрано needed"""
+    found: List[int] = []
+    seen = set()
+
+    def take(positions) -> bool:
+        for pos in positions:
+            if pos not in seen:
+                seen.add(pos)
+                found.append(pos)
+                if len(found) >= needed:
+                    return True
+        return False
+
+    def substring(limit):
+        search = _client_search_index()
+        return sorted(set(
+            (search["vin"].search(vin, limit=limit, literal=True) if vin else [])
+            + (search["names"].search(key, limit=limit, literal=True) if key else [])
+        ))[:limit]
+
+    exact = _client_exact_indexes()
+    prefix = _client_prefix_index()
+    (
+        take(exact["vin"].get(vin))                                  # 1. Точный VIN
+        or take(exact["fio"].get(key))                               # 2. Точное ФИО
+        or take(exact["surname"].get(key))                           #    или фамилия
+        or (vin and take(prefix["vin"].iter_prefix(vin)))            # 3. Начало VIN
+        or (key and take(prefix["names"].iter_prefix(key)))          #    или ФИО
+        or take(substring(needed + len(seen)))                       # 4. Подстрока
+    )
+    rows = read_table("clients")
+    return [rows[pos] for pos in found]
+
+
+def _client_rank(k: _ClientKeys, vin: str, key: str) -> Optional[tuple]:
+    """Место клиента в выдаче (меньше — выше) или None, если не подходит"""
+    if vin and k.vin == vin:
+        return (0, 0, "")
+    if key and key in (k.fio, k.surname):
+        return (1, 0, "")
+    if vin and k.vin.startswith(vin):
+        return (2, 0, k.vin)
+    prefixed = [name for name in (k.surname, k.name, k.patronymic, k.fio) if key and name.startswith(key)]
+    if prefixed:
+        return (2, 1, min(prefixed))
+    if (vin and vin in k.vin) or (key and any(key in name for name in (k.surname, k.name, k.patronymic))):
+        return (3, 0, "")
+    return None
+
+
+def _search_clients_streaming(vin: str, key: str, needed: int) -> List[ClientRecord]:
+    """Ранжированный поиск без кэша: один потоковый проход, в памяти — только лучшие needed"""
+    def candidates():
+        exact_vin = 0
+        for pos, row in enumerate(iter_table("clients")):
+            client = ClientRecord.from_row(row)
+            rank = _client_rank(_client_keys(client), vin, key)
+            if rank is None:
+                continue
+            yield rank + (pos,), client
+            if rank[0] == 0:
+                exact_vin += 1
+                if exact_vin >= needed:
+                    return  # Лучше точного VIN ничего не будет
+
+    return [client for _, client in heapq.nsmallest(needed, candidates(), key=lambda item: item[0])]
+
+
+def search_clients(search_term: str, limit: int = MAX_SEARCH_RESULTS, offset: int = 0) -> List[ClientRecord]:
+    """
+    Ранжированный поиск клиентов, не больше limit результатов начиная с offset:
+    сначала точный VIN, затем точное ФИО (или фамилия), затем совпадение
+    по началу VIN/ФИО (по алфавиту), затем по подстроке (в порядке базы).
+    Запрос и данные сравниваются по нормализованным ключам: регистр, ё/е,
+    латиница вместо похожей кириллицы, транслит и лишние пробелы не мешают.
+    Поиск останавливается, как только набрано offset + limit результатов.
+    """
+    if not search_term or not search_term.strip():
+        return []
+    try:
+        needed = offset + limit
+        vin, key = normalize_vin(search_term), normalize_search_text(search_term)
+        if TABLE_CACHE_ENABLED:
+            with _cache.reading():
+                found = _search_clients_cached(vin, key, needed)
+        else:
+            found = _search_clients_streaming(vin, key, needed)
+        return found[offset:needed]
+    except Exception as e:
+        logging.error(f"Ошибка поиска клиентов: {e}")
+        return []
+
+
+def _first_positions(sources, limit: int) -> List[int]:
+    """Первые limit разных позиций из нескольких итераторов (по очереди источников)"""
+    found: List[int] = []
+    seen = set()
+    for positions in sources:
+        for pos in positions:
+            if pos not in seen:
+                seen.add(pos)
+                found.append(pos)
+                if len(found) >= limit:
+                    return found
+    return found
+
+
+def suggest_clients(prefix: str, limit: int = MAX_SEARCH_RESULTS) -> List[ClientRecord]:
+    """
+    Подсказки при вводе VIN или ФИО: клиенты, у которых VIN, фамилия, имя,
+    отчество или полное ФИО начинаются с prefix (сначала по VIN, затем по
+    алфавиту). Только по индексу в памяти (bisect по отсортированным ключам),
+    без подстрочного и нечёткого поиска — быстро на каждое нажатие клавиши.
+    Без кэша таблиц (TABLE_CACHE_ENABLED = False) подсказок нет.
+    """
+    if not TABLE_CACHE_ENABLED or not prefix or not prefix.strip():
+        return []
+    try:
+        vin, key = normalize_vin(prefix), normalize_search_text(prefix)
+        with _cache.reading():
+            index = _client_prefix_index()
+            rows = read_table("clients")
+            positions = _first_positions(
+                (index["vin"].iter_prefix(vin) if vin else (), index["names"].iter_prefix(key) if key else ()),
+                limit,
+            )
+            return [rows[pos] for pos in positions]
+    except Exception as e:
+        logging.error(f"Ошибка подсказок по клиентам: {e}")
+        return []
+
+
+def _client_fuzzy_indexes() -> Dict[str, FuzzyIndex]:
+    """Индексы для нечёткого поиска: по VIN (с учётом I/O/Q) и по фамилии"""
+    def add(indexes, keys, start):
+        for pos, k in enumerate(keys, start):
+            indexes["vin"].add(k.vin, pos)
+            indexes["surname"].add(k.surname, pos)
+        return indexes
+
+    def replace(indexes, rows, position, old):
+        k = _client_keys(old)
+        indexes["vin"].remove(k.vin, position)
+        indexes["surname"].remove(k.surname, position)
+        return add(indexes, [_client_keys(rows[position])], position)
+
+    return _cache.get_derived(
+        "clients", "fuzzy",
+        build=lambda rows: add(
+            {"vin": FuzzyIndex(FUZZY_MAX_DISTANCE), "surname": FuzzyIndex(FUZZY_MAX_DISTANCE)},
+            _client_search_keys(), 0),
+        extend=lambda indexes, rows, start: add(indexes, map(_client_keys, rows[start:]), start),
+        replace=replace,
+    )
+
+
+def _fuzzy_candidates_cached(vin: str, surname: str, distance: int) -> Dict[int, int]:
+    """{позиция: расстояние} для клиентов не дальше distance по VIN или фамилии"""
+    indexes = _client_fuzzy_indexes()
+    candidates: Dict[int, int] = {}
+    for name, key in (("vin", vin), ("surname", surname)):
+        for found_distance, _, positions in indexes[name].search(key, distance):
+            for pos in positions:
+                if found_distance < candidates.get(pos, distance + 1):
+                    candidates[pos] = found_distance
+    return candidates
+
+
+def _fuzzy_search_streaming(vin: str, surname: str, distance: int, needed: int) -> List[ClientRecord]:
+    """Нечёткий поиск без кэша: один проход по таблице, в памяти — только лучшие needed"""
+    def candidates():
+        for pos, row in enumerate(iter_table("clients")):
+            client = ClientRecord.from_row(row)
+            k = _client_keys(client)
+            found_distance = min(
+                levenshtein(vin, k.vin, distance) if vin and k.vin else distance + 1,
+                levenshtein(surname, k.surname, distance) if surname and k.surname else distance + 1,
+            )
+            if found_distance <= distance:
+                yield (found_distance, pos), client
+
+    return [client for _, client in heapq.nsmallest(needed, candidates(), key=lambda item: item[0])]
+
+
+def fuzzy_search_clients(search_term: str, limit: int = MAX_SEARCH_RESULTS,
+                         max_distance: int = FUZZY_MAX_DISTANCE) -> List[ClientRecord]:
+    """
+    Нечёткий поиск клиентов по VIN и фамилии с опечатками: не больше
+    max_distance правок (короткому запросу — меньше, см. allowed_distance;
+    с кэшем — не больше FUZZY_MAX_DISTANCE, под который построен индекс).
+    В VIN буквы I, O, Q считаются цифрами 1, 0, 0.
+    Ближайшие клиенты идут первыми, при равенстве — в порядке базы.
+    """
+    if not search_term or not search_term.strip():
+        return []
+    try:
+        vin, surname = normalize_vin(search_term), normalize_search_text(search_term)
+        distance = allowed_distance(search_term.strip(), max_distance)
+        if TABLE_CACHE_ENABLED:
+            with _cache.reading():
+                rows = read_table("clients")
+                candidates = _fuzzy_candidates_cached(vin, surname, distance)
+                return [rows[pos] for pos in best_matches(candidates, limit)]
+        return _fuzzy_search_streaming(vin, surname, distance, limit)
+    except Exception as e:
+        logging.error(f"Ошибка нечёткого поиска клиентов: {e}")
+        return []
+
+
+def warm_cache():
+    """
+    Заранее загружает таблицы и строит поисковые индексы — вызывается
+    в фоновом потоке при запуске, чтобы первый поиск не ждал чтения файлов
+    """
+    if not TABLE_CACHE_ENABLED:
+        return
+    try:
+        for build in (_client_exact_indexes, _client_prefix_index, _client_search_index,
+                      _client_number_index, _client_fuzzy_indexes):
+            build()
+        _registry_index("ФИО", _fio_key)
+        _registry_index("Номер договора", _contract_key)
+        _registry_prefix_index()
+        logging.info("Кэш таблиц и поисковые индексы готовы")
+    except Exception as e:
+        logging.warning(f"⚠️ Не удалось заранее загрузить таблицы: {e}")
 
 
 def get_next_client_id(sheet_name="Folder") -> int:
     """Возвращает следующий номер клиента (№)"""
     try:
-        df = pd.read_excel(CLIENTS_DB_PATH, sheet_name=sheet_name)
-        return int(df["№"].max()) + 1 if not df.empty else 1
+        return _counters("clients")["client"] + 1
     except Exception as e:
         print(f"Ошибка чтения ID: {e}")
         return 1
 
 
-def find_client(search_term: str) -> Optional[pd.Series]:
+def find_client(search_term: str) -> Optional[ClientRecord]:
     """
     Ищет клиента по VIN, ФИО
-    Возвращает строку DataFrame или None
+    Возвращает лучший результат search_clients (ClientRecord, доступ и
+    по заголовкам: client["Фамилия"]) или None.
+    Поиск точный: клиентов с опечаткой ищет fuzzy_search_clients.
     """
-    try:
-        df = pd.read_excel(CLIENTS_DB_PATH, sheet_name="Folder")
-        df = df.fillna("")  # Заменяем NaN
-
-        mask = (
-            df["VIN"].astype(str).str.contains(search_term, case=False, na=False) |
-            df["Фамилия"].str.contains(search_term, case=False, na=False) |
-            df["Имя"].str.contains(search_term, case=False, na=False) |
-            df["Отчество"].str.contains(search_term, case=False, na=False)
-        )
-        if mask.any():
-            return df[mask].iloc[0]
-    except Exception as e:
-        print(f"Ошибка поиска клиента: {e}")
-    return None
+    found = search_clients(search_term, limit=1)
+    return found[0] if found else None
+
+
+def _client_number_taken(number: int) -> bool:
+    """
+    Занят ли № клиента — вызывать под замком клиентов. С кэшем — по индексу
+    (под замком кэш сверяется со штампом файла и видит чужие записи),
+    без кэша — потоковый проход по таблице до первого совпадения.
+    """
+    if TABLE_CACHE_ENABLED:
+        return bool(_client_number_index().get(str(number)))
+    return any(cell_int(row.get("№")) == number for row in iter_table("clients"))
 
 
 def save_client(data: Dict[str, Any]) -> bool:
-    """Сохраняет нового клиента в Excel"""
+    """
+    Сохраняет нового клиента в хранилище.
+    Если № уже занят (например, клиента с тем же номером только что сохранили
+    на другом рабочем месте), клиенту присваивается новый зарезервированный №.
+    """
     try:
-        wb = load_workbook(CLIENTS_DB_PATH)
-        ws = wb["Folder"]
-        ws.append(list(data.values()))
-        wb.save(CLIENTS_DB_PATH)
+        with _table_locks["clients"]:
+            number = cell_int(data.get("№"))
+            taken = number is not None and _client_number_taken(number)
+            if number is None or taken:
+                new_number = reserve_client_id()
+                if taken:
+                    logging.warning(f"⚠️ № {number} уже занят — клиенту присвоен № {new_number}")
+                data = dict(data, **{"№": new_number})
+                number = new_number
+
+            stamp_before = _cache.stamp_of("clients")
+            get_storage().append("clients", [data])
+            # Дописываем строку в кэш и индексы вместо полного перечитывания
+            _cache.append_rows("clients", [data], stamp_before)
+            _sequences.advance("clients", {"client": number}, stamp_before, _cache.stamp_of("clients"))
         logging.info(f"Клиент сохранён: {data['Фамилия']} {data['Имя']}")
         return True
     except Exception as e:
@@ -54,49 +798,187 @@ def save_client(data: Dict[str, Any]) -> bool:
         return False
 
 
+def existing_client_vins(vins: List[str]) -> set:
+    """Какие из VIN (нормализованных, см. normalize_vin) уже есть в базе клиентов"""
+    if TABLE_CACHE_ENABLED:
+        with _cache.reading():
+            index = _client_exact_indexes()["vin"]
+            return {vin for vin in vins if index.get(vin)}
+    wanted = set(vins)
+    return {vin for vin in (normalize_vin(row.get("VIN") or "") for row in iter_table("clients")) if vin in wanted}
+
+
+def save_clients(rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Сохраняет пачку новых клиентов одной записью (массовый импорт).
+    Клиенты с VIN, который уже есть в базе (или встретился в пачке раньше),
+    не сохраняются. № выдаются подряд одним резервированием, колонка № в rows
+    не учитывается.
+    :return: (сохранённые строки с присвоенными №, пропущенные дубликаты VIN)
+    """
+    with _table_locks["clients"]:
+        # Проверка под замком: видит клиентов, только что сохранённых на других местах
+        existing = existing_client_vins([normalize_vin(row.get("VIN") or "") for row in rows])
+        fresh, duplicates = [], []
+        for row in rows:
+            vin = normalize_vin(row.get("VIN") or "")
+            if vin in existing:
+                duplicates.append(row)
+            else:
+                existing.add(vin)
+                fresh.append(row)
+        if not fresh:
+            return [], duplicates
+
+        first = _reserve("clients", "client", len(fresh))
+        saved = [dict(row, **{"№": first + i}) for i, row in enumerate(fresh)]
+        stamp_before = _cache.stamp_of("clients")
+        get_storage().append("clients", saved)
+        _cache.append_rows("clients", saved, stamp_before)
+        _sequences.advance("clients", {"client": first + len(saved) - 1}, stamp_before, _cache.stamp_of("clients"))
+    logging.info(f"Сохранено клиентов: {len(saved)}, дубликатов VIN пропущено: {len(duplicates)}")
+    return saved, duplicates
+
+
+def _merge_changes(current: ClientRecord, expected: ClientRecord,
+                   changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Правки пользователя поверх записи, которую могли изменить на другом
+    рабочем месте: берутся только колонки, которые пользователь поменял
+    относительно expected (что он видел). None — если ту же ячейку
+    уже изменили по-другому (конфликт).
+    """
+    merged = {}
+    for column, value in changes.items():
+        if column not in current.HEADERS or cell_text(value) == cell_text(expected[column]):
+            continue  # Пользователь эту ячейку не трогал
+        if cell_text(current[column]) not in (cell_text(expected[column]), cell_text(value)):
+            return None
+        merged[column] = value
+    return merged
+
+
+def update_client(key: Any, changes: Dict[str, Any],
+                  expected: Optional[ClientRecord] = None) -> Optional[ClientRecord]:
+    """
+    Исправляет данные клиента, найденного по № или VIN.
+    В хранилище пишутся только изменившиеся ячейки; "Папка" пересобирается
+    из фамилии, марки, VIN и индекса, № не меняется.
+    :param changes: {колонка: новое значение}
+    :param expected: запись, которую видел пользователь при редактировании.
+        Если клиента с тех пор изменили на другом рабочем месте, применяются
+        только ячейки, изменённые пользователем, а правка той же ячейки
+        с обеих сторон отклоняется (None) — чужие изменения не затираются.
+    :return: обновлённая запись или None, если клиент не найден / конфликт / ошибка
+    """
+    try:
+        with _table_locks["clients"]:
+            found = _locate_client(key)
+            if found is None or found[1].number is None:
+                logging.warning(f"Клиент '{key}' не найден для обновления")
+                return None
+            position, client = found
+
+            if expected is not None and expected != client:
+                changes = _merge_changes(client, expected, changes)
+                if changes is None:
+                    logging.warning(f"⚠️ Клиент № {client.number} изменён на другом рабочем месте — правка отклонена")
+                    return None
+
+            data = client.to_dict()
+            data.update(changes)
+            data["№"] = client.number
+            data["Папка"] = client_folder_name(data["Фамилия"], data["Марка авто"], data["VIN"], data["Индекс"])
+            changed = {
+                column: value for column, value in data.items()
+                if column in client.HEADERS and cell_text(value) != cell_text(client[column])
+            }
+            if not changed:
+                return client
+
+            stamp_before = _cache.stamp_of("clients")
+            if not get_storage().update("clients", "№", client.number, changed):
+                logging.warning(f"Клиент № {client.number} не найден в хранилище")
+                invalidate_cache("clients")
+                return None
+            if position is not None:
+                _cache.replace_row("clients", position, data, stamp_before)
+            # № при редактировании не меняется — счётчик остаётся верным
+            _sequences.advance("clients", {}, stamp_before, _cache.stamp_of("clients"))
+        logging.info(f"Клиент № {client.number} обновлён: {', '.join(changed)}")
+        return ClientRecord.from_row(data)
+    except Exception as e:
+        logging.error(f"Ошибка обновления клиента '{key}': {e}")
+        return None
+
+
 def get_next_contract_number() -> str:
     """
     Генерирует следующий номер договора: 101-ИП, 102-ИП и т.д.
     Основывается на максимальном номере в столбце 'Номер договора'
+    (хранится в счётчике, реестр перечитывается только при расхождении)
     """
     try:
-        df = pd.read_excel(CONTRACTS_DB_PATH, sheet_name="Registry")
-        if df.empty:
-            return "101-ИП"
-
-        # Извлекаем числовую часть из 'Номер договора' (например, из '101-ИП' → 101)
-        numbers = []
-        for num_str in df["Номер договора"].dropna():  # Исключаем NaN
-            if isinstance(num_str, str) and "-ИП" in num_str:
-                try:
-                    n = int(num_str.replace("-ИП", "").strip())
-                    numbers.append(n)
-                except ValueError:
-                    continue  # Пропускаем некорректные значения
-
-        last_num = max(numbers) if numbers else 100
-        return f"{last_num + 1}-ИП"
-
+        return f"{_counters('registry')['contract'] + 1}-ИП"
     except Exception as e:
         logging.warning(f"⚠️ Ошибка при получении номера договора: {e}")
         return "101-ИП"
 
 
+def _registry_taken() -> Tuple[Callable[[str], bool], Callable[[int], bool]]:
+    """
+    Проверки (номер договора занят?, Номер реестра занят?) — вызывать под
+    замком реестра. С кэшем — по индексам, без кэша — один проход по реестру.
+    Номер договора ищется и в архиве реестра.
+    """
+    if TABLE_CACHE_ENABLED:
+        contracts, numbers = _registry_index("Номер договора", _contract_key), _registry_index("Номер", _number_key)
+        in_registry = lambda key: bool(contracts.get(key))
+        number_taken = lambda number: bool(numbers.get(str(number)))
+    else:
+        contract_keys, used_numbers = set(), set()
+        for row in iter_table("registry"):
+            record = ContractRecord.from_row(row)
+            contract_keys.add(_contract_key(record.contract_num))
+            used_numbers.add(cell_int(record.number))
+        in_registry, number_taken = contract_keys.__contains__, used_numbers.__contains__
+    return (lambda key: in_registry(key) or _archived_contract(key) is not None), number_taken
+
+
 def save_contract_record(contract_data: Dict[str, Any]) -> bool:
-    """Сохраняет запись о договоре в реестр"""
+    """
+    Сохраняет запись о договоре в реестр.
+    Номер договора должен быть свободен (см. reserve_contract_number) —
+    иначе запись не сохраняется. Занятый порядковый Номер заменяется новым.
+    "№ клиента" связывает договор с клиентом (см. client_for_contract).
+    """
     try:
-        wb = load_workbook(CONTRACTS_DB_PATH)
-        ws = wb["Registry"]
-        row = [
-            contract_data["Номер"],
-            contract_data["ФИО"],
-            contract_data["Номер договора"],
-            contract_data["Телефон"],
-            contract_data["Индекс"],
-            contract_data["Дата"]
-        ]
-        ws.append(row)
-        wb.save(CONTRACTS_DB_PATH)
+        row = {column: contract_data[column] for column in REGISTRY_COLUMNS if column != "№ клиента"}
+        row["№ клиента"] = contract_data.get("№ клиента", "")
+        with _table_locks["registry"]:
+            contract_taken, number_taken = _registry_taken()
+            contract_key = _contract_key(str(row["Номер договора"]))
+            if contract_key and contract_taken(contract_key):
+                logging.error(f"🔴 Договор {row['Номер договора']} уже есть в реестре — запись не сохранена")
+                return False
+            registry_id = cell_int(row["Номер"])
+            if registry_id is None or number_taken(registry_id):
+                row["Номер"] = reserve_registry_id()
+                if registry_id is not None:
+                    logging.warning(f"⚠️ Номер {registry_id} в реестре уже занят — присвоен {row['Номер']}")
+
+            stamp_before = _cache.stamp_of("registry")
+            get_storage().append("registry", [row])
+            _cache.append_rows("registry", [row], stamp_before)
+
+            values = {}
+            registry_id = cell_int(row["Номер"])
+            if registry_id is not None:
+                values["registry"] = registry_id
+            contract = _contract_number_value(row["Номер договора"])
+            if contract is not None:
+                values["contract"] = contract
+            _sequences.advance("registry", values, stamp_before, _cache.stamp_of("registry"))
         logging.info(f"Договор сохранён: {contract_data['Номер договора']}")
         return True
     except Exception as e:
@@ -104,16 +986,50 @@ def save_contract_record(contract_data: Dict[str, Any]) -> bool:
         return False
 
 
+def save_contract_records(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Сохраняет пачку договоров в реестр одной записью (пакетная генерация).
+    Порядковые Номера выдаются подряд одним резервированием (колонка Номер
+    в rows не учитывается). Договоры с уже занятым номером договора пропускаются.
+    :return: сохранённые строки с присвоенными Номерами
+    """
+    rows = [dict({column: row[column] for column in REGISTRY_COLUMNS if column != "№ клиента"},
+                 **{"№ клиента": row.get("№ клиента", "")}) for row in rows]
+    with _table_locks["registry"]:
+        contract_taken, _ = _registry_taken()
+        fresh = []
+        for row in rows:
+            contract_key = _contract_key(str(row["Номер договора"]))
+            if contract_key and contract_taken(contract_key):
+                logging.error(f"🔴 Договор {row['Номер договора']} уже есть в реестре — запись не сохранена")
+            else:
+                fresh.append(row)
+        rows = fresh
+        if not rows:
+            return []
+
+        first = _reserve("registry", "registry", len(rows))
+        for i, row in enumerate(rows):
+            row["Номер"] = first + i
+        stamp_before = _cache.stamp_of("registry")
+        get_storage().append("registry", rows)
+        _cache.append_rows("registry", rows, stamp_before)
+
+        values = {"registry": first + len(rows) - 1}
+        contracts = [_contract_number_value(row["Номер договора"]) for row in rows]
+        if any(number is not None for number in contracts):
+            values["contract"] = max(number for number in contracts if number is not None)
+        _sequences.advance("registry", values, stamp_before, _cache.stamp_of("registry"))
+    logging.info(f"Договоров сохранено в реестр: {len(rows)}")
+    return rows
+
+
 def get_next_registry_id() -> int:
     """
     Возвращает следующий порядковый номер для реестра договоров
     """
     try:
-        df = pd.read_excel(CONTRACTS_DB_PATH, sheet_name="Registry")
-        if df.empty:
-            return 1
-        last_id = df["Номер"].max()
-        return int(last_id) + 1
+        return _counters("registry")["registry"] + 1
     except Exception as e:
         logging.warning(f"⚠️ Не удалось прочитать Номер из реестра: {e}")
         return 1
@@ -154,6 +1070,126 @@ def get_client_data_for_contract(search_term: str) -> list:
     ]
 
 
+# --- Индексы реестра ---
+
+def _fio_key(full_name: str) -> Optional[str]:
+    """Ключ ФИО для сравнения: без лишних пробелов и без учёта регистра"""
+    return normalize_search_text(full_name) or None
+
+
+def _contract_key(contract_num: str) -> Optional[str]:
+    return contract_num.strip() or None
+
+
+def _number_key(number: Any) -> Optional[str]:
+    return str(number) if number != "" else None
+
+
+def _registry_index(column: str, key_func) -> KeyIndex:
+    """Хэш-индекс реестра по колонке, дополняется при save_contract_record"""
+    def keys(rows):
+        return (key_func(record[column]) for record in rows)
+
+    def extend(index, rows, start):
+        index.extend(keys(rows[start:]))
+        return index
+
+    return _cache.get_derived(
+        "registry", f"by:{column}",
+        build=lambda rows: KeyIndex(keys(rows)),
+        extend=extend,
+    )
+
+
+def _registry_rows_streaming(column: str, key_func, key: str):
+    """Строки реестра с нужным ключом — потоковым чтением, без кэша"""
+    for row in iter_table("registry"):
+        record = ContractRecord.from_row(row)
+        if key_func(record[column]) == key:
+            yield record
+
+
+# --- Архив реестра ---
+
+# Договоры прошлых периодов: файлы data/registry_archive/ и манифест для поиска по ним
+_archive = RegistryArchive(REGISTRY_ARCHIVE_DIR, REGISTRY_COLUMNS, _fio_key, _contract_number_value)
+
+
+def _archived_contract(contract_num: str) -> Optional[ContractRecord]:
+    """Договор из архива: манифест подсказывает, в каком файле его искать"""
+    for period in _archive.periods_for_contract(contract_num):
+        for row in _archive.read(period):
+            if _contract_key(str(row.get("Номер договора") or "")) == contract_num:
+                return ContractRecord.from_row(row)
+    return None
+
+
+def archive_registry() -> int:
+    """
+    Переносит договоры прошлых периодов (REGISTRY_ARCHIVE_PERIOD) из реестра
+    в архив: в contracts_registry.xlsx остаются только договоры текущего периода
+    и строки с неразобранной датой. Только для хранения в Excel.
+    :return: сколько строк перенесено в архив
+    """
+    storage = get_storage()
+    if storage.name != "excel":
+        logging.info("Архив реестра нужен только при хранении в Excel — пропускаем")
+        return 0
+
+    current = period_of(get_current_date(), REGISTRY_ARCHIVE_PERIOD)
+    # Замок уплотнения — до замка таблицы, в том же порядке, что и compact_storage
+    with _compaction_locks["registry"], _table_locks["registry"]:
+        compact_storage()
+        hot, archived = [], {}
+        for row in storage.iter_rows("registry"):
+            period = period_of(row.get("Дата"), REGISTRY_ARCHIVE_PERIOD)
+            if period is not None and period < current:
+                archived.setdefault(period, []).append(row)
+            else:
+                hot.append(row)
+        if not archived:
+            logging.info("В реестре нет договоров прошлых периодов")
+            return 0
+
+        # Сначала архив, затем реестр: при сбое договор не пропадёт,
+        # а повторный запуск не задвоит его в архиве
+        for period, rows in sorted(archived.items()):
+            _archive.add(period, rows)
+        stamp_before = _cache.stamp_of("registry")
+        storage.replace_rows("registry", hot)
+        invalidate_cache("registry")
+        # Максимумы номеров не изменились — они учтены в манифесте архива
+        _sequences.advance("registry", {}, stamp_before, _cache.stamp_of("registry"))
+
+    moved = sum(len(rows) for rows in archived.values())
+    logging.info(f"✅ В архив реестра перенесено договоров: {moved}, в реестре осталось: {len(hot)}")
+    return moved
+
+
+def get_contracts_for_client(full_name: str) -> List[ContractRecord]:
+    """
+    Все договоры клиента из реестра (в порядке записи): сначала архивные, затем текущие
+    :param full_name: Полное ФИО клиента (например, "Иванов Иван Иванович")
+    :return: список ContractRecord, пустой — если договоров нет
+    """
+    try:
+        key = _fio_key(full_name)
+        archived = [
+            ContractRecord.from_row(row)
+            for period in _archive.periods_for_fio(full_name)
+            for row in _archive.read(period)
+            if _fio_key(str(row.get("ФИО") or "")) == key
+        ]
+        if not TABLE_CACHE_ENABLED:
+            return archived + list(_registry_rows_streaming("ФИО", _fio_key, key))
+        with _cache.reading():
+            rows = read_table("registry")
+            return archived + [rows[pos] for pos in _registry_index("ФИО", _fio_key).get(key)]
+    except Exception as e:
+        logging.warning(f"⚠️ Не удалось получить договоры клиента {full_name}: {e}")
+        return []
+
+
 def is_contract_exists_for_fio(full_name: str) -> bool:
     """
     Проверяет, существует ли уже договор для указанного ФИО
@@ -161,12 +1197,15 @@ def is_contract_exists_for_fio(full_name: str) -> bool:
     :return: True, если договор уже есть
     """
     try:
-        df = pd.read_excel(CONTRACTS_DB_PATH, sheet_name="Registry")
-        # Приводим к строке и удаляем лишние пробелы
-        df["ФИО"] = df["ФИО"].astype(str).str.strip()
-
-        # Ищем точное совпадение ФИО
-        return (df["ФИО"] == full_name.strip()).any()
+        # Архивные договоры — по манифесту, без открытия файлов архива
+        if _archive.periods_for_fio(full_name):
+            return True
+        if not TABLE_CACHE_ENABLED:
+            rows = _registry_rows_streaming("ФИО", _fio_key, _fio_key(full_name))
+            return next(rows, None) is not None
+        # ФИО сравнивается без лишних пробелов и регистра — поиск по хэш-индексу
+        with _cache.reading():
+            return bool(_registry_index("ФИО", _fio_key).get(_fio_key(full_name)))
     except Exception as e:
         logging.warning(f"⚠️ Не удалось проверить дубликат договора: {e}")
         return False  # На всякий случай разрешаем, если ошибка
@@ -180,18 +1219,189 @@ def get_contract_creation_date(contract_num: str) -> str:
     :return: Дата в формате "ДД.ММ.ГГГГ" или пустая строка, если не найдено
     """
     try:
-        # Читаем реестр договоров
-        df = pd.read_excel(CONTRACTS_DB_PATH, sheet_name="Registry")
-
-        # Ищем строку с нужным номером договора
-        mask = df["Номер договора"].astype(str).str.strip() == contract_num.strip()
-        if mask.any():
-            date = df.loc[mask, "Дата"].iloc[0]
-            return str(date).strip()
+        # Ищем строку с нужным номером договора: по хэш-индексу или потоково
+        if TABLE_CACHE_ENABLED:
+            with _cache.reading():
+                pos = _registry_index("Номер договора", _contract_key).first(contract_num.strip())
+                row = read_table("registry")[pos] if pos is not None else None
+        else:
+            row = next(_registry_rows_streaming("Номер договора", _contract_key, contract_num.strip()), None)
+        if row is None:
+            row = _archived_contract(contract_num.strip())
+        if row is not None:
+            return str(row["Дата"]).strip()
         else:
             logging.warning(f"Договор {contract_num} не найден в реестре.")
             return ""
 
     except Exception as e:
         logging.error(f"Ошибка при поиске даты договора {contract_num}: {e}")
-        return ""
\ No newline at end of file
+        return ""
+
+
+def _registry_prefix_index() -> Dict[str, PrefixIndex]:
+    """Поиск по началу в реестре: номер договора (без учёта регистра) и ФИО"""
+    def add(indexes, rows, start):
+        for pos, record in enumerate(rows, start):
+            indexes["contract"].add(str(record.contract_num).strip().upper(), pos)
+            indexes["fio"].add(_fio_key(str(record.fio)) or "", pos)
+        return indexes
+
+    return _cache.get_derived(
+        "registry", "prefix",
+        build=lambda rows: {
+            "contract": PrefixIndex((str(r.contract_num).strip().upper(), pos) for pos, r in enumerate(rows)),
+            "fio": PrefixIndex((_fio_key(str(r.fio)) or "", pos) for pos, r in enumerate(rows)),
+        },
+        extend=lambda indexes, rows, start: add(indexes, rows[start:], start),
+    )
+
+
+def suggest_contracts(prefix: str, limit: int = MAX_SEARCH_RESULTS) -> List[ContractRecord]:
+    """
+    Подсказки при вводе номера договора или ФИО: договоры текущего реестра,
+    номер которых (или ФИО клиента) начинается с prefix. Архив не просматривается.
+    Без кэша таблиц (TABLE_CACHE_ENABLED = False) подсказок нет.
+    """
+    if not TABLE_CACHE_ENABLED or not prefix or not prefix.strip():
+        return []
+    try:
+        fio = _fio_key(prefix)
+        with _cache.reading():
+            index = _registry_prefix_index()
+            rows = read_table("registry")
+            positions = _first_positions(
+                (index["contract"].iter_prefix(prefix.strip().upper()), index["fio"].iter_prefix(fio) if fio else ()),
+                limit,
+            )
+            return [rows[pos] for pos in positions]
+    except Exception as e:
+        logging.error(f"Ошибка подсказок по договорам: {e}")
+        return []
+
+
+def resolve_contracts(contract_nums: List[str]) -> Dict[str, Tuple[ContractRecord, Optional[ClientRecord]]]:
+    """
+    Договоры по номерам и их клиенты — одним чтением реестра и одним
+    чтением базы клиентов (пакетное выставление счетов).
+    Клиент берётся по "№ клиента" из строки реестра; для старых строк без
+    него — по точному полному ФИО, если такой клиент один (однофамилец или
+    тёзка не подставляется — клиент None).
+    :return: {номер договора: (ContractRecord, ClientRecord или None)} — только найденные договоры
+    """
+    wanted = {key for key in map(_contract_key, contract_nums) if key}
+    contracts: Dict[str, ContractRecord] = {}
+    if TABLE_CACHE_ENABLED:
+        with _cache.reading():
+            rows, index = read_table("registry"), _registry_index("Номер договора", _contract_key)
+            for key in wanted:
+                pos = index.first(key)
+                if pos is not None:
+                    contracts[key] = rows[pos]
+    else:
+        for row in iter_table("registry"):
+            record = ContractRecord.from_row(row)
+            key = _contract_key(record.contract_num)
+            if key in wanted and key not in contracts:
+                contracts[key] = record
+    for key in wanted - contracts.keys():
+        archived = _archived_contract(key)
+        if archived is not None:
+            contracts[key] = archived
+
+    numbers = {str(c.client_number) for c in contracts.values() if c.client_number is not None}
+    fios = {_fio_key(c.fio) for c in contracts.values() if c.client_number is None} - {None}
+    by_number: Dict[str, ClientRecord] = {}
+    by_fio: Dict[str, ClientRecord] = {}
+    if TABLE_CACHE_ENABLED:
+        with _cache.reading():
+            rows = read_table("clients")
+            number_index, fio_index = _client_number_index(), _client_exact_indexes()["fio"]
+            for number in numbers:
+                pos = number_index.first(number)
+                if pos is not None:
+                    by_number[number] = rows[pos]
+            for fio in fios:
+                positions = fio_index.get(fio)
+                if len(positions) == 1:
+                    by_fio[fio] = rows[positions[0]]
+    else:
+        repeated = set()
+        for row in iter_table("clients"):
+            client = ClientRecord.from_row(row)
+            number, fio = str(client.number), _client_keys(client).fio
+            if number in numbers and number not in by_number:
+                by_number[number] = client
+            if fio in fios:
+                if fio in by_fio:
+                    repeated.add(fio)
+                by_fio[fio] = client
+        for fio in repeated:
+            del by_fio[fio]
+
+    result = {}
+    for key, contract in contracts.items():
+        if contract.client_number is not None:
+            client = by_number.get(str(contract.client_number))
+        else:
+            fio = _fio_key(contract.fio)
+            client = by_fio.get(fio) if fio else None
+        result[key] = (contract, client)
+    return result
+
+
+def client_for_contract(contract_num: str) -> Optional[ClientRecord]:
+    """
+    Клиент договора: номер договора → строка реестра → "№ клиента" → клиент
+    (два поиска по хэш-индексам в памяти). Без "№ клиента" — по ФИО,
+    только если клиент с таким ФИО один.
+    """
+    try:
+        contract_num = contract_num.strip()
+        return resolve_contracts([contract_num]).get(contract_num, (None, None))[1]
+    except Exception as e:
+        logging.warning(f"⚠️ Не удалось найти клиента договора {contract_num}: {e}")
+        return None
+
+
+def _phone_key(phone: Any) -> str:
+    """Телефон для сравнения: последние 10 цифр"""
+    return re.sub(r"\D", "", cell_text(phone))[-10:]
+
+
+def backfill_contract_clients() -> int:
+    """
+    Разовое заполнение "№ клиента" в строках реестра, записанных до появления
+    колонки: клиент подбирается по полному ФИО и телефону. Строки без
+    телефона (в реестре или у клиента), а также строки, которым подходит
+    не один клиент (или ни одного), остаются без номера.
+    Архив реестра (только чтение) не меняется.
+    :return: сколько строк реестра заполнено
+    """
+    clients = read_table("clients") if TABLE_CACHE_ENABLED else map(ClientRecord.from_row, iter_table("clients"))
+    candidates: Dict[tuple, set] = {}
+    for client in clients:
+        phone = _phone_key(client.phone)
+        if phone:  # Пустой телефон у двух записей — не совпадение
+            candidates.setdefault((_client_keys(client).fio, phone), set()).add(client.number)
+
+    filled, ambiguous = 0, 0
+    storage = get_storage()
+    with _table_locks["registry"]:
+        for row in iter_table("registry"):
+            contract = ContractRecord.from_row(row)
+            if contract.client_number is not None or not _contract_key(contract.contract_num):
+                continue
+            phone = _phone_key(contract.phone)
+            if not phone:
+                continue
+            numbers = candidates.get((_fio_key(contract.fio), phone), set())
+            if len(numbers) != 1 or None in numbers:
+                ambiguous += len(numbers) > 1
+                continue
+            storage.update("registry", "Номер договора", contract.contract_num, {"№ клиента": next(iter(numbers))})
+            filled += 1
+        if filled:
+            invalidate_cache("registry")
+    logging.info(f"✅ № клиента заполнен в реестре: {filled} строк, неоднозначных: {ambiguous}")
+    return filled
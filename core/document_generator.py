@@ -1,10 +1,8 @@
 # core/document_generator.py
-from openpyxl import load_workbook
-
-from docx import Document
 from pathlib import Path
 import logging
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple, Union
 
 # Импорты из проекта
 from config.paths import OUTPUT_DIR, CONTRACT_TEMPLATE, INVOICE_TEMPLATE, INVOICE_CARD_TEMPLATE
@@ -14,35 +12,19 @@ from config.settings import (
 )
 from core.utils import sanitize_filename, get_current_date, number_to_words, get_date_verbose
 from core.database import get_contract_creation_date, get_next_contract_number
+from core.records import ClientRecord
+from core.output_cache import render_cached
 
 
 
-def replace_placeholders_in_paragraph(paragraph, data: Dict[str, Any]):
-    """Заменяет {ключ} на значение в параграфе"""
-    for key, value in data.items():
-        placeholder = f"{{{key}}}"
-        if placeholder in paragraph.text:
-            # Сохраняем форматирование каждого run
-            for run in paragraph.runs:
-                if placeholder in run.text:
-                    run.text = run.text.replace(placeholder, str(value))
-
-
-def replace_placeholders_in_table(table, data: Dict[str, Any]):
-    """Заменяет {ключ} на значение в таблицах"""
-    for row in table.rows:
-        for cell in row.cells:
-            for paragraph in cell.paragraphs:
-                replace_placeholders_in_paragraph(paragraph, data)
-
-
-def fill_template(template_path: Path, output_path: Path, data: Dict[str, Any]) -> bool:
+def fill_template(template_path: Path, output_path: Path, data: Dict[str, Any], force: bool = False) -> bool:
     """
     Заполняет шаблон Word и сохраняет результат
 
     :param template_path: путь к .docx шаблону
     :param output_path: куда сохранить заполненный документ
     :param data: словарь с данными для подстановки
+    :param force: создать заново, даже если такой документ уже есть (core.output_cache)
     :return: True при успехе
     """
     try:
@@ -50,19 +32,10 @@ def fill_template(template_path: Path, output_path: Path, data: Dict[str, Any])
             logging.error(f"Шаблон не найден: {template_path}")
             return False
 
-        doc = Document(template_path)
-
-        # Замена в обычных параграфах
-        for paragraph in doc.paragraphs:
-            replace_placeholders_in_paragraph(paragraph, data)
-
-        # Замена в таблицах
-        for table in doc.tables:
-            replace_placeholders_in_table(table, data)
-
-        # Сохранение
-        doc.save(output_path)
-        logging.info(f"Документ создан: {output_path}")
+        # Шаблон разбирается один раз (core.templates), здесь — только подстановка;
+        # тот же документ повторно не создаётся (core.output_cache)
+        if not render_cached(template_path, output_path, data, force):
+            logging.info(f"Документ создан: {output_path}")
         return True
 
     except Exception as e:
@@ -70,15 +43,11 @@ def fill_template(template_path: Path, output_path: Path, data: Dict[str, Any])
         return False
 
 
-def generate_contract(client_data: Dict[str, Any]) -> bool:
+def contract_context(client_data: Union[ClientRecord, Dict[str, Any]], contract_num: str) -> Tuple[Dict[str, Any], Path]:
     """
-    Создаёт договор на основе данных клиента
-
-    :param client_data: данные клиента из Excel
-    :return: True при успехе
+    Данные для шаблона договора и путь к готовому файлу
+    (общие для generate_contract и пакетной генерации core.batch)
     """
-        # Данные для шаблона
-    contract_num = get_next_contract_number()
     full_name = f"{client_data['Фамилия']} {client_data['Имя']} {client_data['Отчество']}"
     car_info = f"{client_data['Марка авто']} (VIN {client_data['VIN']})"
     phone, _ = client_data.get("Телефон_формат", ("", ""))  # может быть предварительно обработан
@@ -112,9 +81,24 @@ def generate_contract(client_data: Dict[str, Any]) -> bool:
     safe_index = client_data['Индекс'] if '*' not in client_data['Индекс'] else "ИНДЕКС"
     filename = f"Договор № {contract_num} ({safe_fio})_{safe_index}.docx"
     output_path = OUTPUT_DIR / filename
+    return context, output_path
+
+
+def generate_contract(client_data: Union[ClientRecord, Dict[str, Any]], contract_num: Optional[str] = None,
+                      force: bool = False) -> bool:
+    """
+    Создаёт договор на основе данных клиента
+
+    :param client_data: запись клиента (ClientRecord) или словарь с теми же заголовками
+    :param contract_num: номер договора, зарезервированный заранее (reserve_contract_number);
+        без него берётся следующий номер из реестра
+    :param force: создать заново, даже если такой же договор уже создан
+    :return: True при успехе
+    """
+    context, output_path = contract_context(client_data, contract_num or get_next_contract_number())
 
     # Генерация
-    success = fill_template(CONTRACT_TEMPLATE, output_path, context)
+    success = fill_template(CONTRACT_TEMPLATE, output_path, context, force)
     return success
 
 
@@ -126,16 +110,36 @@ def format_phone(phone: str) -> tuple[str, str]:
     return util_format(phone)
 
 
-def generate_invoice(
-    client_data: dict,
+def invoice_run_constants() -> Dict[str, str]:
+    """Значения, общие для всех счетов одного запуска (дата и дата прописью)"""
+    current_date = get_current_date()  # "03.10.2025"
+    return {"DATE": current_date, "VERBOSE_DATE": get_date_verbose(current_date)}  # "3 октября 2025 г."
+
+
+@lru_cache(maxsize=None)
+def _amount_text(amount: int) -> str:
+    """Сумма прописью в тысячах: "Тридцать две тысячи" (одна на все счета с этой суммой)"""
+    number_to_word = number_to_words(amount // 1000).capitalize()
+    return f"{number_to_word}{' тысячи' if number_to_word[-1] in ['и', 'е'] else ' тысяч'}"
+
+
+def invoice_context(
+    client_data: Union[ClientRecord, Dict[str, Any]],
     contract_num: str,
+    contract_date: str,
     service_type: str,
     amount: int,
-    payment_method: str = "card"
-) -> bool:
+    payment_method: str = "card",
+    run: Optional[Dict[str, str]] = None,
+) -> Tuple[Path, Dict[str, Any], Path]:
     """
-    Заполняет шаблон счёта с использованием {ключей}
+    Шаблон, данные для него и путь к готовому счёту
+    (общие для generate_invoice и пакетного выставления core.batch)
+    :param contract_date: дата договора из реестра ("" — не найдена)
+    :param run: invoice_run_constants(), посчитанные один раз на пакет
     """
+    run = run or invoice_run_constants()
+
     # Выбор шаблона
     if payment_method == "card":
         template_path = INVOICE_CARD_TEMPLATE
@@ -143,56 +147,59 @@ def generate_invoice(
         template_path = INVOICE_TEMPLATE
 
     output_filename = (f"Подписанный счет{' НА КАРТУ ' if payment_method == 'card' else ' '}№ {contract_num[:3]}-001 от"
-                       f" {get_current_date()} для {client_data['Фамилия']} {client_data['Имя']} "
+                       f" {run['DATE']} для {client_data['Фамилия']} {client_data['Имя']} "
                        f"{client_data['Отчество']}_{client_data['Индекс']}.docx")
     output_path = OUTPUT_DIR / sanitize_filename(output_filename)
 
-    try:
-        if not template_path.exists():
-            logging.error(f"Шаблон не найден: {template_path}")
-            return False
+    # Определяем услугу
+    service_desc = "выпуску СБКТС + ЭПТС" if service_type == "sbkts" else "списанию утильсбора"
 
-        doc = Document(template_path)
+    # Если дата договора не найдена — fallback
+    if not contract_date:
+        contract_date = "03.10.2025"
 
-        # Определяем услугу
-        service_desc = "выпуску СБКТС + ЭПТС" if service_type == "sbkts" else "списанию утильсбора"
+    # Формируем контекст
+    context = {
+        "NUM": contract_num[:3],
+        "DATE": run["DATE"],
+        "VERBOSE_DATE": run["VERBOSE_DATE"],
+        "FIO": f"{client_data['Фамилия']} {client_data['Имя']} {client_data['Отчество']}",
+        "ADDRESS": client_data['Адрес'],
+        "SERVICE": service_desc,
+        "CAR": f"{client_data['Марка авто']}_vin {client_data['VIN']}",
+        "AMOUNT": f"{amount:.2f}".replace('.00', ''),  # Без .00
+        "AMOUNT_RUB": f"{amount} руб.",
+        "AMOUNT_TEXT": _amount_text(amount),
+        "CONTRACT_REF": f"{contract_num} от {contract_date}",
+    }
+    return template_path, context, output_path
 
-        # Формируем контекст
-        current_date = get_current_date()  # "03.10.2025"
-        verbose_date = get_date_verbose(current_date)  # "3 октября 2025 г."
-        number_to_word = number_to_words(amount // 1000).capitalize()
 
+def generate_invoice(
+    client_data: Union[ClientRecord, Dict[str, Any]],
+    contract_num: str,
+    service_type: str,
+    amount: int,
+    payment_method: str = "card",
+    force: bool = False,
+) -> bool:
+    """
+    Заполняет шаблон счёта с использованием {ключей}.
+    Если такой же счёт уже создан, берётся готовый файл (force — создать заново)
+    """
+    try:
         # Получаем дату создания договора из реестра
         contract_date = get_contract_creation_date(contract_num)
-        # Если дата не найдена — используем сегодняшнюю как fallback
-        if not contract_date:
-            contract_date = "03.10.2025"
-
-        # Формируем контекст
-        context = {
-            "NUM": contract_num[:3],
-            "DATE": get_current_date(),
-            "VERBOSE_DATE": verbose_date,
-            "FIO": f"{client_data['Фамилия']} {client_data['Имя']} {client_data['Отчество']}",
-            "ADDRESS": client_data['Адрес'],
-            "SERVICE": service_desc,
-            "CAR": f"{client_data['Марка авто']}_vin {client_data['VIN']}",
-            "AMOUNT": f"{amount:.2f}".replace('.00', ''),  # Без .00
-            "AMOUNT_RUB": f"{amount} руб.",
-            "AMOUNT_TEXT": f"{number_to_word}{' тысячи' if number_to_word[-1] in ['и', 'е'] else ' тысяч'}",
-            "CONTRACT_REF": f"{contract_num} от {contract_date}",
-        }
-
-        # --- Замена в параграфах ---
-        for paragraph in doc.paragraphs:
-            replace_placeholders_in_paragraph(paragraph, context)
-
-        # --- Замена в таблицах ---
-        for table in doc.tables:
-            replace_placeholders_in_table(table, context)
-
-        doc.save(output_path)
-        logging.info(f"✅ Счёт создан: {output_path}")
+        template_path, context, output_path = invoice_context(
+            client_data, contract_num, contract_date, service_type, amount, payment_method
+        )
+        if not template_path.exists():
+            logging.error(f"Шаблон не найден: {template_path}")
+            return False
+
+        # --- Подстановка в разобранный шаблон (или готовый такой же счёт) ---
+        if not render_cached(template_path, output_path, context, force):
+            logging.info(f"✅ Счёт создан: {output_path}")
         return True
 
     except Exception as e:
@@ -0,0 +1,131 @@
+# core/fuzzy.py
+import bisect
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def levenshtein(a: str, b: str, max_distance: Optional[int] = None) -> int:
+    """
+    Расстояние Левенштейна (вставка, удаление, замена символа).
+    С max_distance считает только до этого предела: если строки дальше,
+    возвращает max_distance + 1.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+    if not b:
+        return len(a)
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,                 # удаление
+                current[j - 1] + 1,              # вставка
+                previous[j - 1] + (ca != cb),    # замена
+            ))
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class FuzzyIndex:
+    """
+    Индекс для поиска ключей с опечатками (не больше max_distance правок).
+
+    Принцип «ящиков»: ключ делится на max_distance + 1 частей, и k правок
+    могут испортить не больше k из них — хотя бы одна часть найдётся в запросе
+    без изменений, сдвинутая не больше чем на k символов. Поэтому кандидаты
+    берутся точным поиском частей по словарю, а расстояние Левенштейна
+    считается только для них, а не для всех ключей таблицы.
+    """
+
+    def __init__(self, max_distance: int, items: Iterable[Tuple[str, int]] = ()):
+        self.max_distance = max_distance
+        self._positions: Dict[str, List[int]] = {}          # ключ → позиции строк
+        self._segments: Dict[tuple, List[str]] = {}         # (длина ключа, № части, часть) → ключи
+        self._short: List[str] = []                         # ключи короче max_distance + 1 символов
+        for key, position in items:
+            self.add(key, position)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _bounds(self, length: int) -> List[int]:
+        parts = self.max_distance + 1
+        return [i * length // parts for i in range(parts + 1)]
+
+    def add(self, key: str, position: int):
+        if not key:
+            return
+        positions = self._positions.get(key)
+        if positions is not None:
+            # По возрастанию: первая позиция — порядок выдачи при равном расстоянии
+            bisect.insort(positions, position)
+            return
+        self._positions[key] = [position]
+        if len(key) <= self.max_distance:
+            self._short.append(key)
+            return
+        bounds = self._bounds(len(key))
+        for i in range(len(bounds) - 1):
+            self._segments.setdefault((len(key), i, key[bounds[i]:bounds[i + 1]]), []).append(key)
+
+    def remove(self, key: str, position: int):
+        """Убирает позицию ключа; ключ без позиций удаляется из индекса"""
+        positions = self._positions.get(key) if key else None
+        if not positions or position not in positions:
+            return
+        positions.remove(position)
+        if positions:
+            return
+        del self._positions[key]
+        if len(key) <= self.max_distance:
+            self._short.remove(key)
+            return
+        bounds = self._bounds(len(key))
+        for i in range(len(bounds) - 1):
+            segment = (len(key), i, key[bounds[i]:bounds[i + 1]])
+            self._segments[segment].remove(key)
+            if not self._segments[segment]:
+                del self._segments[segment]
+
+    def _candidates(self, term: str, distance: int) -> set:
+        found = set(self._short)
+        for length in range(max(len(term) - distance, 1), len(term) + distance + 1):
+            bounds = self._bounds(length)
+            for i in range(len(bounds) - 1):
+                start, size = bounds[i], bounds[i + 1] - bounds[i]
+                for shift in range(-distance, distance + 1):
+                    if 0 <= start + shift and start + shift + size <= len(term):
+                        found.update(self._segments.get(
+                            (length, i, term[start + shift:start + shift + size]), ()))
+        return found
+
+    def search(self, term: str, max_distance: int) -> List[Tuple[int, str, List[int]]]:
+        """
+        Ключи на расстоянии не больше max_distance (но не дальше, чем задано
+        при построении): [(расстояние, ключ, позиции)], ближайшие первыми
+        """
+        if not term:
+            return []
+        distance = min(max_distance, self.max_distance)
+        found = []
+        for key in self._candidates(term, distance):
+            key_distance = levenshtein(term, key, distance)
+            if key_distance <= distance:
+                found.append((key_distance, key, self._positions[key]))
+        found.sort(key=lambda item: (item[0], item[2][0]))
+        return found
+
+
+def allowed_distance(term: str, max_distance: int) -> int:
+    """Короткому запросу — меньше опечаток: не больше одной на каждые 3 символа"""
+    return min(max_distance, len(term) // 3)
+
+
+def best_matches(candidates: Dict[int, int], limit: int) -> List[int]:
+    """{позиция: расстояние} → позиции лучших limit (ближе — выше, при равенстве — по порядку базы)"""
+    return sorted(candidates, key=lambda pos: (candidates[pos], pos))[:limit]
@@ -0,0 +1,224 @@
+# core/jobs.py
+import itertools
+import logging
+import queue
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from config.settings import JOB_POLL_INTERVAL_MS, JOB_WORKERS
+
+_current = threading.local()
+
+
+class JobCancelled(Exception):
+    """Задание отменено оператором (бросает Job.check_cancelled)"""
+
+
+class Job:
+    """
+    Задание в фоне: ход выполнения, отмена и результат.
+    Отмена задания в очереди — сразу; выполняющееся задание останавливается
+    само там, где вызывает check_cancelled (например, между документами пакета).
+    """
+
+    def __init__(self, job_id: int, name: str, owner: "JobQueue"):
+        self.id = job_id
+        self.name = name
+        self.future: Optional[Future] = None
+        self.done_count = 0
+        self.total = 0                      # 0 — ход выполнения неизвестен
+        self.status = ""
+        self._cancel = threading.Event()
+        self._owner = owner
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def progress(self) -> Optional[float]:
+        """Доля выполненного 0..1 (None — неизвестно)"""
+        return self.done_count / self.total if self.total else None
+
+    def cancel(self):
+        self._cancel.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.name)
+
+    def report(self, done: int, total: int = 0, status: str = ""):
+        """Ход выполнения из рабочего потока (в окне — при следующем опросе очереди)"""
+        self.done_count, self.total = done, total or self.total
+        if status:
+            self.status = status
+        self._owner._events.put(("progress", self, None))
+
+
+def current_job() -> Optional[Job]:
+    """Задание, которое выполняется в этом потоке (None — вызов не из очереди)"""
+    return getattr(_current, "job", None)
+
+
+def report_progress(done: int, total: int = 0, status: str = ""):
+    """Ход выполнения для core-функций: вне очереди заданий ничего не делает"""
+    job = current_job()
+    if job is not None:
+        job.report(done, total, status)
+
+
+def job_cancelled() -> bool:
+    """Отменено ли задание этого потока (вне очереди заданий — всегда False)"""
+    job = current_job()
+    return job is not None and job.cancelled
+
+
+def check_cancelled():
+    """Точка остановки для core-функций: JobCancelled, если задание этого потока отменено"""
+    job = current_job()
+    if job is not None:
+        job.check_cancelled()
+
+
+class JobQueue:
+    """
+    Очередь фоновых заданий для окна Tk: генерация документов, поиск,
+    запись в Excel идут в пуле потоков, а результаты и ход выполнения
+    возвращаются в поток Tk через опрос очереди событий (widget.after).
+    Обработчики on_done / on_error / on_progress вызываются только в потоке Tk.
+    Потоки, а не процессы: кэши таблиц и индексы общие, запись в таблицы
+    идёт по очереди через блокировки core.database.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._events: "queue.Queue[tuple]" = queue.Queue()
+        self._ids = itertools.count(1)
+        self._jobs: List[Job] = []
+        self._lock = threading.Lock()
+        self._handlers = {}                 # id задания → (on_done, on_error, on_progress, on_cancel)
+        self._listeners: List[Callable[[], None]] = []
+
+    def submit(self, fn: Callable[..., Any], *args, name: str = "",
+               on_done: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None,
+               on_progress: Optional[Callable[[Job], None]] = None,
+               on_cancel: Optional[Callable[[Job], None]] = None, **kwargs) -> Job:
+        """
+        Ставит fn(*args, **kwargs) в очередь.
+        :param on_done: результат fn (в потоке Tk)
+        :param on_error: исключение fn (в потоке Tk); без него — только запись в лог
+        :param on_progress: задание после каждого report_progress (в потоке Tk)
+        :param on_cancel: задание, отменённое до начала или остановленное через
+            check_cancelled (в потоке Tk) — окно возвращает кнопки в рабочее состояние.
+            Завершившееся несмотря на отмену вызывает on_done (сделанное не теряется).
+        """
+        job = Job(next(self._ids), name or getattr(fn, "__name__", "задание"), self)
+        with self._lock:
+            self._jobs.append(job)
+            self._handlers[job.id] = (on_done, on_error, on_progress, on_cancel)
+        job.future = self._pool.submit(self._run, job, fn, args, kwargs)
+        job.future.add_done_callback(lambda future: self._events.put(("done", job, future)))
+        self._notify()
+        return job
+
+    @staticmethod
+    def _run(job: Job, fn, args, kwargs):
+        job.check_cancelled()
+        _current.job = job
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.job = None
+
+    def active(self) -> List[Job]:
+        """Задания в очереди и выполняющиеся"""
+        with self._lock:
+            return list(self._jobs)
+
+    def cancel_all(self):
+        for job in self.active():
+            job.cancel()
+
+    def add_listener(self, listener: Callable[[], None]):
+        """listener() вызывается в потоке Tk при любом изменении списка или хода заданий"""
+        self._listeners.append(listener)
+
+    def _notify(self):
+        for listener in self._listeners:
+            try:
+                listener()
+            except Exception as e:
+                logging.error(f"🔴 Ошибка обновления хода заданий: {e}")
+
+    def pump(self):
+        """Разбирает накопившиеся события и вызывает обработчики (только из потока Tk)"""
+        changed = False
+        while True:
+            try:
+                kind, job, future = self._events.get_nowait()
+            except queue.Empty:
+                break
+            changed = True
+            on_done, on_error, on_progress, on_cancel = self._handlers.get(job.id, (None,) * 4)
+            if kind == "progress":
+                if on_progress is not None:
+                    self._call(on_progress, job)
+                continue
+
+            with self._lock:
+                self._jobs.remove(job)
+                self._handlers.pop(job.id, None)
+            try:
+                result = future.result()
+            except (CancelledError, JobCancelled):
+                logging.info(f"Задание '{job.name}' отменено")
+                if on_cancel is not None:
+                    self._call(on_cancel, job)
+                continue
+            except Exception as e:
+                logging.error(f"🔴 Задание '{job.name}' завершилось с ошибкой: {e}")
+                if on_error is not None:
+                    self._call(on_error, e)
+                continue
+            if on_done is not None:
+                self._call(on_done, result)
+        if changed:
+            self._notify()
+
+    @staticmethod
+    def _call(handler, value):
+        try:
+            handler(value)
+        except Exception as e:
+            logging.error(f"🔴 Ошибка в обработчике задания: {e}")
+
+    def attach(self, widget, interval_ms: int = JOB_POLL_INTERVAL_MS):
+        """Опрос очереди событий в цикле Tk, пока widget существует"""
+        def poll():
+            self.pump()
+            widget.after(interval_ms, poll)
+        widget.after(interval_ms, poll)
+
+    def shutdown(self, wait: bool = True):
+        """Отменяет задания, которые ещё не начались, и ждёт выполняющиеся"""
+        for job in self.active():
+            if job.future is not None:
+                job.future.cancel()
+        self._pool.shutdown(wait=wait)
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def job_queue() -> JobQueue:
+    """Общая очередь заданий приложения"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
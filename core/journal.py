@@ -0,0 +1,111 @@
+# core/journal.py
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class Journal:
+    """
+    Журнал вставок (JSON Lines) рядом с файлом Excel.
+
+    Каждая новая строка таблицы (op "insert") и каждая правка ячеек строки
+    (op "update": ключ строки и изменённые колонки) сначала дописывается
+    в журнал (быстро и без перезаписи .xlsx), а в сам файл переносится
+    пачкой при уплотнении.
+    Уплотнение переименовывает журнал в *.compacting — новые записи в это
+    время идут в свежий журнал, а после сбоя недоперенесённые строки
+    остаются на диске и подхватываются при следующем запуске.
+    """
+
+    def __init__(self, base_path: Path):
+        self.path = base_path.with_suffix(".journal.jsonl")
+        self.compacting_path = base_path.with_suffix(".journal.compacting")
+
+    def append(self, rows: List[Dict[str, Any]]):
+        """Дописывает строки и сбрасывает их на диск (fsync)"""
+        self._write([{"op": "insert", "row": row} for row in rows])
+
+    def append_update(self, key: Any, values: Dict[str, Any]):
+        """Дописывает правку строки с ключом key: {колонка: новое значение}"""
+        self._write([{"op": "update", "key": key, "values": values}])
+
+    def _write(self, entries: List[Dict[str, Any]]):
+        lines = "".join(
+            json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+            for entry in entries
+        )
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def files(self) -> List[Path]:
+        """Существующие файлы журнала в порядке записи"""
+        return [p for p in (self.compacting_path, self.path) if p.exists()]
+
+    def stamp(self) -> tuple:
+        stamp = ()
+        for p in (self.compacting_path, self.path):
+            try:
+                st = p.stat()
+                stamp += (st.st_mtime_ns, st.st_size)
+            except FileNotFoundError:
+                stamp += (0, 0)
+        return stamp
+
+    def has_pending(self) -> bool:
+        for p in (self.compacting_path, self.path):
+            try:
+                if p.stat().st_size > 0:
+                    return True
+            except FileNotFoundError:
+                continue  # Журнал могли только что уплотнить (в фоне или на другом месте)
+        return False
+
+    @staticmethod
+    def _read_file(path: Path) -> Iterator[Dict[str, Any]]:
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Недописанная последняя строка после сбоя — пропускаем
+                    logging.warning(f"⚠️ Повреждённая строка {line_no} в журнале {path.name}")
+                    continue
+                if entry.get("op") in ("insert", "update"):
+                    yield entry
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Все записи журнала (вставки и правки), ещё не перенесённые в Excel"""
+        result = []
+        for path in self.files():
+            result.extend(self._read_file(path))
+        return result
+
+    def begin_compaction(self) -> Optional[List[Dict[str, Any]]]:
+        """
+        Забирает журнал на уплотнение: записи (вставки и правки по порядку)
+        или None, если переносить нечего.
+        Оставшийся после сбоя *.compacting дополняется текущим журналом.
+        """
+        if self.path.exists():
+            if self.compacting_path.exists():
+                with open(self.compacting_path, "a", encoding="utf-8") as dst, \
+                        open(self.path, encoding="utf-8") as src:
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                self.path.unlink()
+            else:
+                os.replace(self.path, self.compacting_path)
+        if not self.compacting_path.exists():
+            return None
+        return list(self._read_file(self.compacting_path))
+
+    def finish_compaction(self):
+        """Строки перенесены в Excel — журнал на уплотнении больше не нужен"""
+        self.compacting_path.unlink(missing_ok=True)
@@ -0,0 +1,89 @@
+# core/locking.py
+import os
+import threading
+import time
+from pathlib import Path
+
+from config.settings import LOCK_TIMEOUT_SEC
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+def _try_lock(f) -> bool:
+    try:
+        if os.name == "nt":
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.lockf(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(f):
+    if os.name == "nt":
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.lockf(f, fcntl.LOCK_UN)
+
+
+class FileLock:
+    """
+    Межпроцессная блокировка (advisory) на файле-замке рядом с данными:
+    программы на разных рабочих местах с общей папкой data/ пишут по очереди.
+
+    Повторный вход из того же потока разрешён (блокировка считает глубину),
+    другие потоки процесса ждут, как и другие процессы. Если замок не удалось
+    взять за timeout секунд — TimeoutError.
+    """
+
+    def __init__(self, path: Path, timeout: float = LOCK_TIMEOUT_SEC, poll: float = 0.05):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.poll = poll
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self):
+        if not self._thread_lock.acquire(timeout=self.timeout):
+            raise TimeoutError(f"Замок {self.path.name} занят другим потоком")
+        if self._depth:
+            self._depth += 1
+            return
+
+        try:
+            f = open(self.path, "a+")
+            deadline = time.monotonic() + self.timeout
+            while not _try_lock(f):
+                if time.monotonic() >= deadline:
+                    f.close()
+                    raise TimeoutError(f"Замок {self.path.name} занят другим рабочим местом")
+                time.sleep(self.poll)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        self._file = f
+        self._depth = 1
+
+    def release(self):
+        self._depth -= 1
+        if not self._depth:
+            try:
+                _unlock(self._file)
+            finally:
+                self._file.close()
+                self._file = None
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,166 @@
+# core/output_cache.py
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config.paths import OUTPUT_DIR
+from config.settings import DOCX_RENDER_ENGINE
+from core.templates import render_to_file
+
+# Отпечаток готового документа → файл в documents_ready
+MANIFEST_PATH = OUTPUT_DIR / ".manifest.json"
+
+# Файлы, которых уже нет, вычищаются из манифеста не чаще раза в минуту
+PRUNE_INTERVAL_SEC = 60
+
+_lock = threading.Lock()                   # манифест; сама генерация идёт без блокировки
+_pruned_at = 0.0
+_template_hashes: Dict[Path, tuple] = {}   # шаблон → (штамп файла, SHA-1 содержимого)
+
+
+def _template_hash(path: Path) -> str:
+    """SHA-1 шаблона (пересчитывается, только если файл изменился)"""
+    st = path.stat()
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _template_hashes.get(path)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, hashlib.sha1(path.read_bytes()).hexdigest())
+        _template_hashes[path] = cached
+    return cached[1]
+
+
+def fingerprint(template_path: Path, data: Dict[str, Any]) -> str:
+    """Отпечаток документа: содержимое шаблона, движок и данные для подстановки"""
+    payload = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+    digest = hashlib.sha1(_template_hash(Path(template_path)).encode())
+    digest.update(DOCX_RENDER_ENGINE.encode())
+    digest.update(payload.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _load_manifest() -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.warning(f"⚠️ Манифест {MANIFEST_PATH.name} не прочитан, начинаем заново: {e}")
+        return {}
+
+
+def _save_manifest(manifest: Dict[str, Dict[str, Any]]):
+    tmp = MANIFEST_PATH.with_name(MANIFEST_PATH.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, MANIFEST_PATH)
+
+
+def _file_stamp(path: Path) -> Optional[list]:
+    try:
+        st = path.stat()
+        return [st.st_mtime_ns, st.st_size]
+    except FileNotFoundError:
+        return None
+
+
+def _tmp_path(path: Path) -> Path:
+    """Свой временный файл для каждого потока: один документ могут создавать одновременно"""
+    return path.with_name(f"{path.stem}.{os.getpid()}-{threading.get_ident()}.tmp{path.suffix}")
+
+
+def _reuse(cached: Path, output_path: Path):
+    """Готовый файл под новым именем: жёсткая ссылка, если ФС умеет, иначе копия"""
+    if output_path.exists() and os.path.samefile(cached, output_path):
+        return
+    tmp = _tmp_path(output_path)
+    try:
+        os.link(cached, tmp)
+    except OSError:
+        shutil.copy2(cached, tmp)
+    os.replace(tmp, output_path)
+
+
+def render_cached(template_path: Path, output_path: Path, data: Dict[str, Any], force: bool = False) -> bool:
+    """
+    Заполняет шаблон, если такой же документ (тот же шаблон и те же данные)
+    ещё не создавался. Иначе берёт готовый файл из documents_ready — тот же
+    файл или жёсткая ссылка на него под новым именем.
+    Готовый файл, изменённый вручную после создания, не используется.
+    :param force: создать документ заново в любом случае
+    :return: True — документ взят готовым, False — создан заново
+    """
+    output_path = Path(output_path)
+    key = fingerprint(template_path, data)
+    if not force:
+        with _lock:
+            entry = _load_manifest().get(key)
+            if entry is not None:
+                cached = OUTPUT_DIR / entry["file"]
+                if _file_stamp(cached) == entry["stamp"]:
+                    _reuse(cached, output_path)
+                    logging.info(f"Документ не изменился — взят готовый: {cached.name}")
+                    return True
+
+    render_replacing(template_path, output_path, data)
+    _record([(key, output_path)])
+    return False
+
+
+def render_replacing(template_path: Path, output_path: Path, data: Dict[str, Any]) -> List[str]:
+    """
+    Заполняет шаблон во временный файл и подменяет им output_path. Запись
+    не попадает в файл, на который есть жёсткая ссылка из манифеста.
+    Манифест не меняется (в пуле процессов core.batch его обновляет
+    основной процесс — см. record_rendered).
+    :return: плейсхолдеры без значения
+    """
+    output_path = Path(output_path)
+    tmp = _tmp_path(output_path)
+    try:
+        unresolved = render_to_file(template_path, tmp, data, report_as=output_path)
+        os.replace(tmp, output_path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return unresolved
+
+
+def record_rendered(documents: Iterable[Tuple[Path, Path, Dict[str, Any]]]):
+    """
+    Созданные документы [(шаблон, файл, данные)] — в манифест одной записью:
+    повторная генерация с теми же данными возьмёт их готовыми, а записи
+    о перезаписанных файлах удаляются.
+    """
+    _record([(fingerprint(template_path, data), Path(output_path))
+             for template_path, output_path, data in documents])
+
+
+def _record(documents: List[Tuple[str, Path]]):
+    """Отпечаток → файл в манифест (только файлы из documents_ready)"""
+    global _pruned_at
+    output_dir = OUTPUT_DIR.resolve()
+    documents = [(key, path) for key, path in documents if path.parent.resolve() == output_dir]
+    if not documents:
+        return
+    stamps = {key: _file_stamp(path) for key, path in documents}
+    names = {path.name for _, path in documents}
+    with _lock:
+        # Манифест читается заново: пока шёл рендер, его могли обновить другие задания
+        manifest = _load_manifest()
+        # Записи о файлах, которые перезаписаны другими данными
+        manifest = {k: v for k, v in manifest.items() if v["file"] not in names}
+        for key, path in documents:
+            manifest[key] = {"file": path.name, "stamp": stamps[key]}
+        now = time.monotonic()
+        if now - _pruned_at >= PRUNE_INTERVAL_SEC:
+            # Записи об удалённых файлах
+            manifest = {k: v for k, v in manifest.items() if k in stamps or (OUTPUT_DIR / v["file"]).exists()}
+            _pruned_at = now
+        _save_manifest(manifest)
@@ -0,0 +1,158 @@
+# core/records.py
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from config.settings import DATE_FORMAT
+
+# Заголовок Excel → поле записи
+CLIENT_FIELDS = {
+    "№": "number",
+    "Фамилия": "surname",
+    "Имя": "name",
+    "Отчество": "patronymic",
+    "Марка авто": "car_model",
+    "VIN": "vin",
+    "Индекс": "index",
+    "Папка": "folder",
+    "Адрес": "address",
+    "Паспорт (серия и номер)": "passport",
+    "Кем выдан": "issued_by",
+    "Дата выдачи": "issue_date",
+    "Код подразделения": "dep_code",
+    "Телефон": "phone",
+    "Дата рождения": "birth_date",
+    "Дата создания папки": "created",
+}
+
+CONTRACT_FIELDS = {
+    "Номер": "number",
+    "ФИО": "fio",
+    "Номер договора": "contract_num",
+    "Телефон": "phone",
+    "Индекс": "index",
+    "Дата": "date",
+    "№ клиента": "client_number",
+}
+
+# Колонки с небольшим набором повторяющихся значений: храним одну копию строки на значение
+_ENCODED_COLUMNS = ("Марка авто", "Кем выдан", "Индекс")
+_pools: Dict[str, Dict[str, str]] = {column: {} for column in _ENCODED_COLUMNS}
+
+
+def cell_text(value: Any) -> str:
+    """Значение ячейки → строка: пусто для None/NaN, даты в ДД.ММ.ГГГГ, 5.0 → "5" """
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return ""
+        if value.is_integer():
+            return str(int(value))
+    if isinstance(value, (datetime, date)):
+        return value.strftime(DATE_FORMAT)
+    return str(value)
+
+
+def cell_int(value: Any) -> Optional[int]:
+    """Номер из ячейки: 5, 5.0 и "5" → 5 (None для пустых и некорректных)"""
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _encode(column: str, value: str) -> str:
+    pool = _pools.get(column)
+    if pool is None:
+        return value
+    return pool.setdefault(value, value)
+
+
+# Поля с целыми номерами (остальные — строки)
+_NUMBER_FIELDS = ("number", "client_number")
+
+
+class _RecordMixin:
+    """Доступ к записи по заголовкам Excel, как к строке таблицы: record["Фамилия"]"""
+
+    __slots__ = ()
+    HEADERS: Dict[str, str] = {}
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]):
+        """Запись из строки {заголовок: значение}; лишние колонки игнорируются"""
+        values = {}
+        for header, attr in cls.HEADERS.items():
+            value = row.get(header)
+            if attr in _NUMBER_FIELDS:
+                values[attr] = cell_int(value)
+            else:
+                values[attr] = _encode(header, cell_text(value))
+        return cls(**values)
+
+    def __getitem__(self, header: str) -> Any:
+        try:
+            value = getattr(self, self.HEADERS[header])
+        except KeyError:
+            raise KeyError(header) from None
+        return "" if value is None else value
+
+    def __contains__(self, header: str) -> bool:
+        return header in self.HEADERS
+
+    def get(self, header: str, default: Any = None) -> Any:
+        return self[header] if header in self.HEADERS else default
+
+    def keys(self):
+        return self.HEADERS.keys()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """{заголовок: значение} — в порядке колонок листа"""
+        return {header: self[header] for header in self.HEADERS}
+
+
+@dataclass(slots=True)
+class ClientRecord(_RecordMixin):
+    """Клиент из листа Folder"""
+
+    number: Optional[int] = None
+    surname: str = ""
+    name: str = ""
+    patronymic: str = ""
+    car_model: str = ""
+    vin: str = ""
+    index: str = ""
+    folder: str = ""
+    address: str = ""
+    passport: str = ""
+    issued_by: str = ""
+    issue_date: str = ""
+    dep_code: str = ""
+    phone: str = ""
+    birth_date: str = ""
+    created: str = ""
+
+    HEADERS = CLIENT_FIELDS
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.surname} {self.name} {self.patronymic}"
+
+
+@dataclass(slots=True)
+class ContractRecord(_RecordMixin):
+    """Строка реестра договоров (лист Registry)"""
+
+    number: Optional[int] = None
+    fio: str = ""
+    contract_num: str = ""
+    phone: str = ""
+    index: str = ""
+    date: str = ""
+    client_number: Optional[int] = None     # № клиента в листе Folder (пусто в старых строках)
+
+    HEADERS = CONTRACT_FIELDS
+
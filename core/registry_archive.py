@@ -0,0 +1,178 @@
+# core/registry_archive.py
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from openpyxl import Workbook, load_workbook
+
+from config.settings import DATE_FORMAT
+from core.records import cell_int
+from core.storage import sheet_rows
+
+
+def period_of(value: Any, period: str) -> Optional[str]:
+    """
+    Период договора по дате: "2024" (year), "2024-Q1" (quarter), "2024-03" (month).
+    Строки периодов одного вида сравниваются как даты: "2024-Q1" < "2024-Q2".
+    None — дата пустая или не разобрана.
+    """
+    if isinstance(value, (datetime, date)):
+        day = value
+    else:
+        try:
+            day = datetime.strptime(str(value).strip(), DATE_FORMAT)
+        except ValueError:
+            return None
+    if period == "year":
+        return f"{day.year}"
+    if period == "quarter":
+        return f"{day.year}-Q{(day.month - 1) // 3 + 1}"
+    if period == "month":
+        return f"{day.year}-{day.month:02d}"
+    raise ValueError(f"Неизвестный период архива: {period}")
+
+
+class RegistryArchive:
+    """
+    Архив реестра договоров: по файлу .xlsx на период (только для чтения)
+    и манифест manifest.json с тем, что нужно для поиска без открытия файлов:
+        {"partitions": {"2024": {"file": ..., "rows": 120,
+                                 "registry": [1, 120], "contract": [101, 220]}},
+         "fio": {"иванов иван иванович": ["2023", "2024"]}}
+    По ФИО сразу видно, в каких периодах у клиента есть договоры,
+    по номеру договора — в каком файле его искать.
+    """
+
+    def __init__(self, directory: Path, columns: List[str],
+                 fio_key: Callable[[str], Optional[str]],
+                 contract_value: Callable[[Any], Optional[int]]):
+        self.directory = Path(directory)
+        self.manifest_path = self.directory / "manifest.json"
+        self.columns = columns
+        self._fio_key = fio_key
+        self._contract_value = contract_value
+        self._lock = threading.Lock()
+        self._manifest = (None, {"partitions": {}, "fio": {}})
+        self._partitions: Dict[str, tuple] = {}   # период → (штамп файла, строки)
+
+    @staticmethod
+    def _stamp(path: Path) -> Optional[tuple]:
+        try:
+            st = path.stat()
+            return st.st_mtime_ns, st.st_size
+        except FileNotFoundError:
+            return None
+
+    def manifest(self) -> dict:
+        """Манифест (перечитывается, только если файл изменился)"""
+        with self._lock:
+            stamp = self._stamp(self.manifest_path)
+            if stamp is not None and stamp != self._manifest[0]:
+                with open(self.manifest_path, encoding="utf-8") as f:
+                    self._manifest = (stamp, json.load(f))
+            return self._manifest[1]
+
+    def periods_for_fio(self, full_name: str) -> List[str]:
+        key = self._fio_key(full_name)
+        return list(self.manifest()["fio"].get(key, [])) if key else []
+
+    def periods_for_contract(self, contract_num: str) -> List[str]:
+        number = self._contract_value(contract_num)
+        if number is None:
+            return []
+        return [
+            period for period, info in sorted(self.manifest()["partitions"].items())
+            if info["contract"] and info["contract"][0] <= number <= info["contract"][1]
+        ]
+
+    def max_values(self) -> Dict[str, int]:
+        """Наибольшие Номер и номер договора в архиве — нумерация продолжается после них"""
+        result = {"registry": 0, "contract": 0}
+        for info in self.manifest()["partitions"].values():
+            for name in result:
+                if info[name]:
+                    result[name] = max(result[name], info[name][1])
+        return result
+
+    def read(self, period: str) -> List[Dict[str, Any]]:
+        """Строки архивного периода (кэшируются, пока файл не изменился)"""
+        info = self.manifest()["partitions"].get(period)
+        if info is None:
+            return []
+        path = self.directory / info["file"]
+        stamp = self._stamp(path)
+        cached = self._partitions.get(period)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = list(sheet_rows(wb.active.iter_rows(values_only=True)))
+        finally:
+            wb.close()
+        self._partitions[period] = (stamp, rows)
+        return rows
+
+    def add(self, period: str, rows: List[Dict[str, Any]]) -> int:
+        """
+        Дописывает строки в файл периода и обновляет манифест.
+        Договоры, уже лежащие в архиве, не задваиваются.
+        :return: сколько строк добавлено
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        manifest = json.loads(json.dumps(self.manifest()))  # копия для изменения
+        info = manifest["partitions"].setdefault(
+            period, {"file": f"contracts_registry_{period}.xlsx", "rows": 0, "registry": None, "contract": None}
+        )
+        path = self.directory / info["file"]
+        if path.exists():
+            wb = load_workbook(path)
+            ws = wb.active
+            # Колонки, добавленные в реестр после создания файла
+            for i, column in enumerate(self.columns, 1):
+                if ws.cell(row=1, column=i).value is None:
+                    ws.cell(row=1, column=i, value=column)
+        else:
+            wb = Workbook()
+            ws = wb.active
+            ws.title = "Registry"
+            ws.append(self.columns)
+
+        stored = {str(row.get("Номер договора")).strip() for row in self.read(period)}
+        added = 0
+        for row in rows:
+            contract_num = str(row.get("Номер договора") or "").strip()
+            if contract_num and contract_num in stored:
+                continue
+            stored.add(contract_num)
+            ws.append([row.get(column) for column in self.columns])
+            added += 1
+
+            for name, value in (("registry", cell_int(row.get("Номер"))),
+                                ("contract", self._contract_value(row.get("Номер договора")))):
+                if value is not None:
+                    low, high = info[name] or (value, value)
+                    info[name] = [min(low, value), max(high, value)]
+            key = self._fio_key(str(row.get("ФИО") or ""))
+            if key:
+                periods = manifest["fio"].setdefault(key, [])
+                if period not in periods:
+                    periods.append(period)
+                    periods.sort()
+        info["rows"] += added
+
+        # Сначала файл периода, потом манифест: после сбоя строки окажутся
+        # и в архиве, и в реестре, но не пропадут
+        tmp = path.with_name(path.stem + ".tmp.xlsx")
+        wb.save(tmp)
+        os.replace(tmp, path)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.manifest_path)
+        logging.info(f"Архив реестра {period}: добавлено строк — {added}")
+        return added
@@ -0,0 +1,205 @@
+# core/search_index.py
+import bisect
+import re
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+# Символы, при которых запрос нельзя считать обычной подстрокой (regex-семантика str.contains)
+REGEX_META = set(".^$*+?{}[]\\|()")
+
+NGRAM = 3
+
+
+def _ngrams(text: str) -> Iterator[str]:
+    for i in range(len(text) - NGRAM + 1):
+        yield text[i:i + NGRAM]
+
+
+class SubstringIndex:
+    """
+    Триграммный инвертированный индекс для поиска подстроки без учёта регистра.
+
+    Строка таблицы — кортеж значений нескольких колонок (None — колонка не участвует).
+    Результат совпадает с маской `str.contains(term, case=False)` по этим колонкам,
+    объединённой через ИЛИ: индекс только отсекает кандидатов, окончательная
+    проверка делается тем же регулярным выражением.
+    """
+
+    def __init__(self, rows: Iterable[Sequence[Optional[str]]] = ()):
+        self._raw: List[tuple] = []      # исходные значения колонок
+        self._lower: List[tuple] = []    # те же значения в нижнем регистре
+        self._postings: Dict[str, array] = {}
+        self.extend(rows)
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def add_row(self, values: Sequence[Optional[str]]):
+        """Добавляет строку в конец индекса (номер строки = позиция в таблице)"""
+        row_id = len(self._raw)
+        raw = tuple(values)
+        lower = tuple(v.lower() if v else "" for v in raw)
+        self._raw.append(raw)
+        self._lower.append(lower)
+
+        grams = set()
+        for text in lower:
+            grams.update(_ngrams(text))
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = array("i")
+            posting.append(row_id)
+
+    def extend(self, rows: Iterable[Sequence[Optional[str]]]):
+        for values in rows:
+            self.add_row(values)
+
+    @staticmethod
+    def _grams(lower: tuple) -> set:
+        grams = set()
+        for text in lower:
+            grams.update(_ngrams(text))
+        return grams
+
+    def replace_row(self, row_id: int, values: Sequence[Optional[str]]):
+        """Заменяет значения строки row_id (клиента исправили): меняются только её триграммы"""
+        raw = tuple(values)
+        lower = tuple(v.lower() if v else "" for v in raw)
+        old, new = self._grams(self._lower[row_id]), self._grams(lower)
+        self._raw[row_id] = raw
+        self._lower[row_id] = lower
+        for gram in old - new:
+            posting = self._postings[gram]
+            posting.pop(bisect.bisect_left(posting, row_id))
+            if not posting:
+                del self._postings[gram]
+        for gram in new - old:
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = array("i")
+            # Позиции в списке — по возрастанию (порядок выдачи search)
+            posting.insert(bisect.bisect_left(posting, row_id), row_id)
+
+    def search(self, term: str, limit: Optional[int] = None, literal: bool = False) -> List[int]:
+        """
+        Возвращает позиции строк (по возрастанию), где хотя бы одна колонка
+        содержит term без учёта регистра. limit — остановиться после N совпадений.
+        По умолчанию term — регулярное выражение, как в str.contains
+        (некорректное приводит к re.error); literal=True — обычная подстрока.
+        """
+        pattern = re.compile(re.escape(term) if literal else term, flags=re.IGNORECASE)
+
+        if not literal and REGEX_META.intersection(term):
+            # Настоящее регулярное выражение — индекс не поможет, проверяем все строки
+            candidates = range(len(self._raw))
+            needle = None
+        else:
+            needle = term.lower()
+            grams = set(_ngrams(needle))
+            if grams:
+                postings = [self._postings.get(g) for g in grams]
+                if any(p is None for p in postings):
+                    return []
+                candidates = min(postings, key=len)
+            else:
+                # Запрос короче триграммы — проходим по порядку до первых совпадений
+                candidates = range(len(self._raw))
+
+        found = []
+        for row_id in candidates:
+            if needle is not None and not any(needle in text for text in self._lower[row_id]):
+                continue
+            if any(v is not None and pattern.search(v) for v in self._raw[row_id]):
+                found.append(row_id)
+                if limit is not None and len(found) >= limit:
+                    break
+        return found
+
+
+class KeyIndex:
+    """
+    Хэш-индекс: ключ → позиции строк таблицы (по возрастанию).
+    Пустые ключи (None или "") не индексируются.
+    """
+
+    def __init__(self, keys: Iterable[Optional[str]] = ()):
+        self._positions: Dict[str, List[int]] = {}
+        self._size = 0
+        self.extend(keys)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def replace(self, position: int, old_key: Optional[str], new_key: Optional[str]):
+        """Ключ строки position изменился (позиции остаются по возрастанию)"""
+        if old_key == new_key:
+            return
+        if old_key:
+            positions = self._positions[old_key]
+            positions.remove(position)
+            if not positions:
+                del self._positions[old_key]
+        if new_key:
+            bisect.insort(self._positions.setdefault(new_key, []), position)
+
+    def add(self, key: Optional[str]):
+        if key:
+            self._positions.setdefault(key, []).append(self._size)
+        self._size += 1
+
+    def extend(self, keys: Iterable[Optional[str]]):
+        for key in keys:
+            self.add(key)
+
+    def get(self, key: str) -> List[int]:
+        return self._positions.get(key, [])
+
+    def first(self, key: str) -> Optional[int]:
+        positions = self._positions.get(key)
+        return positions[0] if positions else None
+
+
+class PrefixIndex:
+    """
+    Отсортированный массив ключей для поиска по началу строки (bisect).
+    Один ключ может ссылаться на одну строку таблицы несколько раз
+    (по разным колонкам) — позиции не уникальны.
+    """
+
+    def __init__(self, items: Iterable[tuple] = ()):
+        pairs = sorted((key, pos) for key, pos in items if key)
+        self._keys: List[str] = [key for key, _ in pairs]
+        self._positions: List[int] = [pos for _, pos in pairs]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: str, position: int):
+        if not key:
+            return
+        # Порядок (ключ, позиция) — как при построении
+        lo, hi = bisect.bisect_left(self._keys, key), bisect.bisect_right(self._keys, key)
+        i = bisect.bisect_right(self._positions, position, lo, hi)
+        self._keys.insert(i, key)
+        self._positions.insert(i, position)
+
+    def remove(self, key: str, position: int):
+        """Убирает одну пару (key, position), если она есть"""
+        if not key:
+            return
+        i = bisect.bisect_left(self._keys, key)
+        while i < len(self._keys) and self._keys[i] == key:
+            if self._positions[i] == position:
+                del self._keys[i]
+                del self._positions[i]
+                return
+            i += 1
+
+    def iter_prefix(self, prefix: str) -> Iterator[int]:
+        """Позиции строк с ключами, начинающимися на prefix, в алфавитном порядке ключей"""
+        i = bisect.bisect_left(self._keys, prefix)
+        keys, positions = self._keys, self._positions
+        while i < len(keys) and keys[i].startswith(prefix):
+            yield positions[i]
+            i += 1
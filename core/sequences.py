@@ -0,0 +1,105 @@
+# core/sequences.py
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from core.locking import FileLock
+
+
+class SequenceStore:
+    """
+    Счётчики номеров (№ клиента, Номер в реестре, номер договора) в маленьком файле рядом с базой.
+
+    Счётчики сгруппированы по таблице-источнику и хранят её штамп, при котором
+    они были верны:
+        {"registry": {"stamp": [...], "counters": {"registry": 12, "contract": 112}}}
+    Пока штамп таблицы совпадает, следующий номер выдаётся без чтения таблицы.
+    Если таблицу меняли в обход программы или с другого рабочего места
+    (штамп другой) — счётчики пересчитываются по таблице функцией rebuild.
+    Счётчики никогда не уменьшаются: номер, выданный через reserve, но ещё
+    не записанный в таблицу, не будет выдан повторно.
+    Файл читается и меняется под межпроцессной блокировкой (core.locking).
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = FileLock(self.path.with_suffix(".lock"))
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ Файл счётчиков повреждён, будет пересоздан: {e}")
+            return {}
+
+    def _save(self, data: dict):
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def peek(self, source: str, stamp: Optional[tuple],
+             rebuild: Callable[[], Dict[str, int]]) -> Dict[str, int]:
+        """
+        Последние выданные значения счётчиков таблицы source.
+        :param stamp: текущий штамп таблицы
+        :param rebuild: пересчёт счётчиков по самой таблице (при расхождении)
+        """
+        with self._lock:
+            data = self._load()
+            return self._current(data, source, stamp, rebuild)
+
+    def _current(self, data: dict, source: str, stamp: Optional[tuple],
+                 rebuild: Callable[[], Dict[str, int]]) -> Dict[str, int]:
+        group = data.get(source)
+        if stamp is not None and group and group.get("stamp") == list(stamp):
+            return group["counters"]
+
+        counters = rebuild()
+        # Номера, уже выданные (в т.ч. другим рабочим местам), не выдаются повторно
+        for name, value in (group or {}).get("counters", {}).items():
+            counters[name] = max(counters.get(name, 0), value)
+        logging.info(f"Счётчики '{source}' пересчитаны по таблице: {counters}")
+        data[source] = {"stamp": list(stamp) if stamp else None, "counters": counters}
+        self._save(data)
+        return counters
+
+    def reserve(self, source: str, counter: str, stamp: Optional[tuple],
+                rebuild: Callable[[], Dict[str, int]], count: int = 1) -> int:
+        """
+        Выдаёт count номеров подряд из счётчика counter таблицы source
+        и сразу запоминает их в файле: ни этот, ни другой процесс их больше
+        не получит. :return: первый выданный номер
+        """
+        with self._lock:
+            data = self._load()
+            counters = self._current(data, source, stamp, rebuild)
+            first = counters.get(counter, 0) + 1
+            counters[counter] = first + count - 1
+            self._save(data)
+            return first
+
+    def advance(self, source: str, values: Dict[str, int],
+                stamp_before: Optional[tuple], stamp_after: Optional[tuple]):
+        """
+        Учитывает строку, только что записанную программой в таблицу source.
+        Если до записи счётчики уже не соответствовали таблице, они будут
+        пересчитаны при следующем peek.
+        """
+        with self._lock:
+            data = self._load()
+            group = data.get(source)
+            if stamp_before is None or not group or group.get("stamp") != list(stamp_before):
+                if group:
+                    group["stamp"] = None  # Пересчитать при следующем peek (не ниже текущих значений)
+            else:
+                counters = group["counters"]
+                for name, value in values.items():
+                    counters[name] = max(counters.get(name, 0), value)
+                group["stamp"] = list(stamp_after) if stamp_after else None
+            self._save(data)
@@ -0,0 +1,79 @@
+# core/snapshot.py
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+class Snapshot:
+    """
+    Снимок листа Excel в двоичном файле рядом с .xlsx (*.snapshot.pkl).
+
+    Разбор большого .xlsx занимает секунды, чтение снимка — доли секунды.
+    Снимок хранит колонки листа (заголовок + кортеж значений на колонку)
+    и ключ исходного файла: mtime, размер и SHA-1. Снимок свежий, если файл
+    не менялся (совпали mtime и размер) или совпало содержимое (SHA-1) —
+    например, файл скопировали с другого компьютера.
+    """
+
+    def __init__(self, source_path: Path):
+        self.source_path = Path(source_path)
+        self.path = self.source_path.with_suffix(".snapshot.pkl")
+        self._lock = threading.Lock()
+
+    def source_key(self) -> Dict[str, Any]:
+        """Ключ исходного .xlsx — снимать до чтения файла, чтобы не принять новый файл за старый"""
+        st = self.source_path.stat()
+        with open(self.source_path, "rb") as f:
+            sha1 = hashlib.sha1(f.read()).hexdigest()
+        return {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha1": sha1}
+
+    def _is_fresh(self, key: Dict[str, Any]) -> bool:
+        st = self.source_path.stat()
+        if key["size"] != st.st_size:
+            return False
+        return key["mtime_ns"] == st.st_mtime_ns or key["sha1"] == self.source_key()["sha1"]
+
+    def load(self) -> Optional[List[Dict[str, Any]]]:
+        """Строки листа из снимка или None, если снимка нет или он устарел"""
+        try:
+            with open(self.path, "rb") as f:
+                data = pickle.load(f)
+            if not self._is_fresh(data["source"]):
+                logging.info(f"Снимок {self.path.name} устарел — читаем {self.source_path.name}")
+                return None
+            header = data["header"]
+            return [dict(zip(header, values)) for values in zip(*data["columns"])]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"⚠️ Снимок {self.path.name} не прочитан: {e}")
+            return None
+
+    def save(self, rows: List[Dict[str, Any]], source: Dict[str, Any]):
+        """Сохраняет строки листа; source — ключ файла на момент чтения (source_key)"""
+        header = list(dict.fromkeys(column for row in rows for column in row))
+        data = {
+            "source": source,
+            "header": header,
+            "columns": [tuple(row.get(column) for row in rows) for column in header],
+        }
+        with self._lock:
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+        logging.info(f"Снимок {self.path.name} обновлён: {len(rows)} строк")
+
+    def save_async(self, get_rows: Callable[[], List[Dict[str, Any]]], source: Dict[str, Any]):
+        """Сохраняет снимок в фоновом потоке, не задерживая интерфейс"""
+        def run():
+            try:
+                self.save(get_rows(), source)
+            except Exception as e:
+                logging.warning(f"⚠️ Снимок {self.path.name} не сохранён: {e}")
+
+        threading.Thread(target=run, name=f"snapshot-{self.source_path.stem}", daemon=True).start()
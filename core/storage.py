@@ -0,0 +1,524 @@
+# core/storage.py
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import closing, nullcontext
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, Iterable, Iterator, List, Tuple
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+from config.paths import CLIENTS_DB_PATH, CONTRACTS_DB_PATH, SQLITE_DB_PATH
+from config.settings import STORAGE_BACKEND, EXCEL_SNAPSHOT_ENABLED
+from core.journal import Journal
+from core.snapshot import Snapshot
+
+# Колонки таблиц в порядке листов Excel
+CLIENT_COLUMNS = [
+    "№", "Фамилия", "Имя", "Отчество", "Марка авто", "VIN",
+    "Индекс", "Папка", "Адрес", "Паспорт (серия и номер)",
+    "Кем выдан", "Дата выдачи", "Код подразделения",
+    "Телефон", "Дата рождения", "Дата создания папки"
+]
+REGISTRY_COLUMNS = ["Номер", "ФИО", "Номер договора", "Телефон", "Индекс", "Дата", "№ клиента"]
+
+COLUMNS = {"clients": CLIENT_COLUMNS, "registry": REGISTRY_COLUMNS}
+
+# Заголовки листов как в исходных файлах (в реестре "Индекс " с пробелом)
+SHEET_HEADERS = {
+    "clients": CLIENT_COLUMNS,
+    "registry": ["Номер", "ФИО", "Номер договора", "Телефон", "Индекс ", "Дата", "№ клиента"],
+}
+
+# Логическое имя таблицы → (файл Excel, лист)
+EXCEL_SHEETS = {
+    "clients": (CLIENTS_DB_PATH, "Folder"),
+    "registry": (CONTRACTS_DB_PATH, "Registry"),
+}
+
+
+# Уникальный ключ строки — по нему журнал не задваивает строки после сбоя
+KEY_COLUMNS = {"clients": "№", "registry": "Номер договора"}
+
+
+def row_values(table: str, data: Dict[str, Any]) -> list:
+    """Значения строки в порядке колонок таблицы"""
+    return [data.get(column, "") for column in COLUMNS[table]]
+
+
+def _key(value: Any) -> str:
+    """Ключ для сравнения: 5, 5.0 и "5" — одно и то же"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return "" if value is None else str(value).strip()
+
+
+def _split_entries(entries: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """Записи журнала → (новые строки, {ключ строки: {колонка: значение}} — правки, последняя побеждает)"""
+    rows, updates = [], {}
+    for entry in entries:
+        if entry["op"] == "insert":
+            rows.append(entry["row"])
+        else:
+            updates.setdefault(_key(entry["key"]), {}).update(entry["values"])
+    return rows, updates
+
+
+def _same_row(table: str, a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """Совпадают ли строки по всем колонкам таблицы (пустая ячейка = "")"""
+    return all(_key(a.get(column)) == _key(b.get(column)) for column in COLUMNS[table])
+
+
+def _ensure_header(ws, table: str):
+    """Дописывает в заголовок листа колонки, добавленные позже (например, "№ клиента" в реестре)"""
+    for i, column in enumerate(COLUMNS[table], 1):
+        if ws.cell(row=1, column=i).value is None:
+            ws.cell(row=1, column=i, value=column)
+
+
+def sheet_rows(rows: Iterator[tuple]) -> Iterator[Dict[str, Any]]:
+    """Кортежи значений листа (первый — заголовок) → {заголовок: значение}, пустые строки пропускаются"""
+    # В шаблоне реестра заголовок "Индекс " с пробелом
+    header = [str(c).strip() if c is not None else None for c in next(rows, ())]
+    for values in rows:
+        if all(v is None for v in values):
+            continue
+        yield {h: v for h, v in zip(header, values) if h}
+
+
+class ExcelStorage:
+    """
+    Хранение в .xlsx (как было изначально): лист Folder и лист Registry.
+    Новые строки и правки пишутся в журнал (core.journal) и переносятся
+    в .xlsx пачкой при уплотнении (compact) — в простое или при выходе.
+    Пока правка в журнале, чтение возвращает строку уже с новыми значениями.
+    """
+
+    name = "excel"
+
+    def __init__(self):
+        self._journals = {table: Journal(path) for table, (path, _) in EXCEL_SHEETS.items()}
+        self._snapshots = {table: Snapshot(path) for table, (path, _) in EXCEL_SHEETS.items()}
+        self._lock = threading.Lock()
+
+    def stamp(self, table: str) -> tuple:
+        """Версия таблицы: меняется при любой записи (по ней кэш понимает, что пора перечитать)"""
+        st = EXCEL_SHEETS[table][0].stat()
+        return (st.st_mtime_ns, st.st_size) + self._journals[table].stamp()
+
+    def _iter_sheet(self, table: str) -> Iterator[Dict[str, Any]]:
+        """Строки листа .xlsx (без журнала): потоково"""
+        path, sheet = EXCEL_SHEETS[table]
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from sheet_rows(wb[sheet].iter_rows(values_only=True))
+        finally:
+            wb.close()
+
+    def _with_journal(self, table: str, sheet_rows: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Строки листа с применёнными правками из журнала, затем новые строки журнала"""
+        journal, updates = _split_entries(self._journals[table].entries())
+        key_column = KEY_COLUMNS[table]
+        pending_keys = {_key(row.get(key_column)) for row in journal} - {""}
+        stored = {}  # ключ → строка, уже записанная на лист (или раньше в журнал)
+
+        for row in sheet_rows:
+            if pending_keys or updates:
+                key = _key(row.get(key_column))
+                if key in pending_keys:
+                    stored.setdefault(key, row)
+                if key in updates:
+                    row = dict(row, **updates[key])
+            yield row
+
+        # Строки журнала, ещё не перенесённые в .xlsx
+        for row in journal:
+            key = _key(row.get(key_column))
+            if key and key in stored:
+                # Та же строка — повтор после сбоя уплотнения; другая — дубликат ключа
+                if not _same_row(table, stored[key], row):
+                    logging.warning(f"⚠️ Журнал '{table}': {key_column} {key} уже занят другой строкой — "
+                                    f"строка журнала не показана: {row}")
+                continue
+            if key:
+                stored[key] = row
+            row = dict(row, **updates.get(key, {}))
+            yield {column: (None if value == "" else value) for column, value in row.items()}
+
+    def iter_rows(self, table: str) -> Iterator[Dict[str, Any]]:
+        """
+        Потоковое чтение строк (openpyxl read_only): память не зависит от
+        числа строк, можно прервать на первом совпадении.
+        Пустые ячейки — None, полностью пустые строки пропускаются.
+        """
+        return self._with_journal(table, self._iter_sheet(table))
+
+    def read_rows(self, table: str) -> List[Dict[str, Any]]:
+        """
+        Все строки таблицы списком (для кэша в памяти). Лист читается из
+        снимка (core.snapshot), если он свежий; иначе разбирается .xlsx,
+        а снимок пересохраняется в фоне — следующий запуск будет быстрым.
+        """
+        path, _ = EXCEL_SHEETS[table]
+        sheet_rows = self._snapshots[table].load() if EXCEL_SNAPSHOT_ENABLED else None
+        if sheet_rows is None:
+            source = self._snapshots[table].source_key() if EXCEL_SNAPSHOT_ENABLED else None
+            sheet_rows = list(self._iter_sheet(table))
+            if source is not None:
+                self._snapshots[table].save_async(lambda: sheet_rows, source)
+        return list(self._with_journal(table, sheet_rows))
+
+    def _refresh_snapshot(self, table: str):
+        """
+        Снимок для следующего запуска после записи .xlsx. Читается сохранённый
+        файл (data_only, как в read_rows), а не лист в памяти: в памяти вместо
+        значений формул — сами формулы, и снимок расходился бы с холодным чтением.
+        """
+        snapshot = self._snapshots[table]
+        snapshot.save_async(lambda: list(self._iter_sheet(table)), snapshot.source_key())
+
+    def append(self, table: str, rows: List[Dict[str, Any]]):
+        self._journals[table].append([dict(zip(COLUMNS[table], row_values(table, r))) for r in rows])
+
+    def has_pending(self, table: str) -> bool:
+        return self._journals[table].has_pending()
+
+    def compact(self, table: str, locked: Callable[[], ContextManager] = nullcontext) -> int:
+        """
+        Переносит журнал в .xlsx одной записью файла: новые строки
+        дописываются в конец листа, в исправленных строках меняются только
+        изменённые ячейки. Файл сохраняется во временный и подменяется атомарно.
+
+        locked() — замок таблицы: он берётся только на смену журнала
+        (begin_compaction) и на подмену файла, а .xlsx переписывается без него —
+        запись с других рабочих мест в это время идёт в свежий журнал и не ждёт.
+        Два уплотнения одной таблицы одновременно не запускать (замок
+        уплотнения держит вызывающий).
+        :return: сколько строк перенесено (новых и исправленных)
+        """
+        journal = self._journals[table]
+        with locked():
+            entries = journal.begin_compaction()
+        if entries is None:
+            return 0
+        rows, updates = _split_entries(entries)
+
+        path, sheet = EXCEL_SHEETS[table]
+        wb = load_workbook(path)
+        ws = wb[sheet]
+        _ensure_header(ws, table)
+        columns = COLUMNS[table]
+        key_column = KEY_COLUMNS[table]
+        key_idx = columns.index(key_column)
+        # Ключ строки → номер строки на листе (строки могли удалять и сортировать)
+        locator = {}
+        for row_no, values in enumerate(ws.iter_rows(min_row=2, values_only=True), 2):
+            key = _key(values[key_idx]) if len(values) > key_idx else ""
+            if key:
+                locator.setdefault(key, row_no)
+
+        added = 0
+        for data in rows:
+            key = _key(data.get(key_column))
+            if key and key in locator:
+                stored = dict(zip(columns, (cell.value for cell in ws[locator[key]])))
+                # Та же строка уже перенесена до сбоя — пропускаем молча
+                if not _same_row(table, stored, data):
+                    logging.error(f"🔴 Журнал {path.name}: {key_column} {key} уже занят другой строкой — "
+                                  f"строка не перенесена: {data}")
+                continue
+            ws.append(row_values(table, data))
+            if key:
+                locator[key] = ws.max_row
+            added += 1
+
+        updated = 0
+        for key, values in updates.items():
+            row_no = locator.get(key)
+            if row_no is None:
+                logging.warning(f"⚠️ Журнал {path.name}: строка {key} для правки не найдена")
+                continue
+            for column, value in values.items():
+                ws.cell(row=row_no, column=columns.index(column) + 1, value=value)
+            updated += 1
+
+        tmp = path.with_name(path.stem + ".tmp.xlsx")
+        wb.save(tmp)
+        with locked():
+            os.replace(tmp, path)
+            journal.finish_compaction()
+        if EXCEL_SNAPSHOT_ENABLED:
+            self._refresh_snapshot(table)
+        logging.info(f"Журнал {path.name}: перенесено строк — {added}, исправлено — {updated}")
+        return added + updated
+
+    def update(self, table: str, key_column: str, key: Any, values: Dict[str, Any]) -> bool:
+        """
+        Записывает правку строки в журнал: только переданные колонки,
+        без чтения и перезаписи .xlsx. Строку ищут по ключу таблицы
+        (KEY_COLUMNS) — её существование проверяет вызывающий.
+        """
+        if key_column != KEY_COLUMNS[table]:
+            raise ValueError(f"Правка '{table}' возможна только по колонке {KEY_COLUMNS[table]}")
+        unknown = set(values) - set(COLUMNS[table])
+        if unknown:
+            raise ValueError(f"Неизвестные колонки: {', '.join(sorted(unknown))}")
+        self._journals[table].append_update(key, values)
+        return True
+
+    def replace_rows(self, table: str, rows: List[Dict[str, Any]]):
+        """
+        Перезаписывает лист целиком (архивирование реестра). Журнал должен
+        быть пуст — вызывающий уплотняет его заранее под замком таблицы.
+        """
+        with self._lock:
+            if self._journals[table].has_pending():
+                raise RuntimeError(f"Журнал '{table}' не уплотнён — лист не перезаписан")
+            path, sheet = EXCEL_SHEETS[table]
+            wb = load_workbook(path)
+            ws = wb[sheet]
+            _ensure_header(ws, table)
+            if ws.max_row > 1:
+                ws.delete_rows(2, ws.max_row - 1)
+            for data in rows:
+                ws.append(row_values(table, data))
+            tmp = path.with_name(path.stem + ".tmp.xlsx")
+            wb.save(tmp)
+            os.replace(tmp, path)
+            if EXCEL_SNAPSHOT_ENABLED:
+                self._refresh_snapshot(table)
+            logging.info(f"{path.name}: лист перезаписан, строк — {len(rows)}")
+
+
+class SqliteStorage:
+    """Хранение в локальном файле SQLite с индексами по VIN, ФИО и номеру договора"""
+
+    name = "sqlite"
+
+    # Строк за один запрос при потоковом чтении (iter_rows)
+    ITER_BATCH_ROWS = 1000
+
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS clients (
+            "№" INTEGER, "Фамилия" TEXT, "Имя" TEXT, "Отчество" TEXT,
+            "Марка авто" TEXT, "VIN" TEXT, "Индекс" TEXT, "Папка" TEXT,
+            "Адрес" TEXT, "Паспорт (серия и номер)" TEXT, "Кем выдан" TEXT,
+            "Дата выдачи" TEXT, "Код подразделения" TEXT, "Телефон" TEXT,
+            "Дата рождения" TEXT, "Дата создания папки" TEXT
+        )""",
+        """CREATE TABLE IF NOT EXISTS registry (
+            "Номер" INTEGER, "ФИО" TEXT, "Номер договора" TEXT,
+            "Телефон" TEXT, "Индекс" TEXT, "Дата" TEXT, "№ клиента" INTEGER
+        )""",
+        'CREATE INDEX IF NOT EXISTS idx_clients_num ON clients ("№")',
+        'CREATE INDEX IF NOT EXISTS idx_clients_vin ON clients ("VIN")',
+        'CREATE INDEX IF NOT EXISTS idx_clients_fio ON clients ("Фамилия", "Имя", "Отчество")',
+        'CREATE INDEX IF NOT EXISTS idx_registry_fio ON registry ("ФИО")',
+        'CREATE INDEX IF NOT EXISTS idx_registry_contract ON registry ("Номер договора")',
+        # Счётчик изменений по таблицам — штамп для кэша и нумерации
+        "CREATE TABLE IF NOT EXISTS meta (tbl TEXT PRIMARY KEY, version INTEGER NOT NULL)",
+        "INSERT OR IGNORE INTO meta VALUES ('clients', 0), ('registry', 0)",
+    ] + [
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_version AFTER {event} ON {table}
+            BEGIN UPDATE meta SET version = version + 1 WHERE tbl = '{table}'; END"""
+        for table in ("clients", "registry")
+        for event in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+    def __init__(self, db_path: Path = SQLITE_DB_PATH):
+        self.db_path = Path(db_path)
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _ensure_schema(self):
+        """
+        Таблицы, индексы, триггеры и строки meta — один раз на экземпляр,
+        отдельной зафиксированной транзакцией. Дальше соединения только
+        читают или пишут данные: чтение не открывает транзакцию записи
+        и не мешает записи с другого рабочего места.
+        """
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            with closing(sqlite3.connect(self.db_path)) as conn, conn:
+                for statement in self.SCHEMA:
+                    conn.execute(statement)
+                # Базы, созданные до появления колонки (например, "№ клиента" в реестре)
+                for table, columns in COLUMNS.items():
+                    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                    for column in columns:
+                        if column not in existing:
+                            conn.execute(f'ALTER TABLE {table} ADD COLUMN "{column}"')
+            self._schema_ready = True
+
+    def connect(self) -> sqlite3.Connection:
+        self._ensure_schema()
+        return sqlite3.connect(self.db_path)
+
+    def stamp(self, table: str) -> tuple:
+        with closing(self.connect()) as conn:
+            return conn.execute("SELECT version FROM meta WHERE tbl = ?", (table,)).fetchone()
+
+    def read(self, table: str) -> pd.DataFrame:
+        with closing(self.connect()) as conn:
+            return pd.read_sql_query(f"SELECT * FROM {table} ORDER BY rowid", conn)
+
+    def read_rows(self, table: str) -> List[Dict[str, Any]]:
+        return list(self.iter_rows(table))
+
+    def iter_rows(self, table: str) -> Iterator[Dict[str, Any]]:
+        """
+        Потоковое чтение строк пачками по ITER_BATCH_ROWS. Каждая пачка —
+        законченный запрос: пока строки разбираются, база не заблокирована,
+        и запись с другого рабочего места или из фонового задания не ждёт.
+        """
+        conn = self.connect()
+        try:
+            last = 0
+            while True:
+                cursor = conn.execute(
+                    f"SELECT rowid, * FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, self.ITER_BATCH_ROWS),
+                )
+                names = [d[0] for d in cursor.description][1:]
+                batch = cursor.fetchall()
+                if not batch:
+                    return
+                last = batch[-1][0]
+                for values in batch:
+                    yield dict(zip(names, values[1:]))
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, table: str, rows: List[Dict[str, Any]]):
+        columns = COLUMNS[table]
+        names = ", ".join(f'"{column}"' for column in columns)
+        marks = ", ".join("?" * len(columns))
+        sql = f"INSERT INTO {table} ({names}) VALUES ({marks})"
+        conn.executemany(sql, [[_to_sql(v) for v in row_values(table, r)] for r in rows])
+
+    def append(self, table: str, rows: List[Dict[str, Any]]):
+        with closing(self.connect()) as conn, conn:
+            self._insert(conn, table, rows)
+
+    def update(self, table: str, key_column: str, key: Any, values: Dict[str, Any]) -> bool:
+        assignments = ", ".join(f'"{column}" = ?' for column in values)
+        sql = f'UPDATE {table} SET {assignments} WHERE "{key_column}" = ?'
+        with closing(self.connect()) as conn, conn:
+            cursor = conn.execute(sql, [_to_sql(v) for v in values.values()] + [_to_sql(key)])
+            return cursor.rowcount > 0
+
+    def has_pending(self, table: str) -> bool:
+        return False  # SQLite пишет сразу, журнал не нужен
+
+    def compact(self, table: str, locked: Callable[[], ContextManager] = nullcontext) -> int:
+        return 0
+
+    def replace_all(self, table: str, df: pd.DataFrame):
+        """Полностью заменяет содержимое таблицы (используется импортом)"""
+        with closing(self.connect()) as conn, conn:
+            conn.execute(f"DELETE FROM {table}")
+            self._insert(conn, table, df.to_dict("records"))
+
+
+def _to_sql(value: Any) -> Any:
+    """Значение ячейки → тип, который понимает sqlite3 (NaN → NULL, даты → строка)"""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp) or hasattr(value, "strftime"):
+        return value.strftime("%d.%m.%Y")
+    if hasattr(value, "item"):  # numpy-скаляры
+        return value.item()
+    return value
+
+
+_BACKENDS = {"excel": ExcelStorage, "sqlite": SqliteStorage}
+_storage = None
+
+
+def get_storage():
+    """Текущее хранилище по настройке STORAGE_BACKEND"""
+    global _storage
+    if _storage is None:
+        try:
+            _storage = _BACKENDS[STORAGE_BACKEND]()
+        except KeyError:
+            raise ValueError(f"Неизвестное хранилище: {STORAGE_BACKEND}")
+    return _storage
+
+
+# --- Импорт / экспорт ---
+
+def import_excel_to_sqlite(
+    clients_path: Path = CLIENTS_DB_PATH,
+    registry_path: Path = CONTRACTS_DB_PATH,
+    db_path: Path = SQLITE_DB_PATH,
+) -> Dict[str, int]:
+    """
+    Разовый перенос клиентов и реестра из Excel в SQLite.
+    Содержимое таблиц SQLite заменяется целиком.
+    :return: число перенесённых строк по таблицам
+    """
+    target = SqliteStorage(db_path)
+    counts = {}
+    for table, path in (("clients", clients_path), ("registry", registry_path)):
+        sheet = EXCEL_SHEETS[table][1]
+        # dtype=object: строки вида "+7" или "0123" переносятся как есть, без приведения к числу
+        df = pd.read_excel(path, sheet_name=sheet, dtype=object)
+        df.columns = [str(c).strip() for c in df.columns]
+        df = df.reindex(columns=COLUMNS[table])
+        target.replace_all(table, df)
+        counts[table] = len(df)
+        logging.info(f"Импорт в SQLite: {table} — {len(df)} строк из {path}")
+    return counts
+
+
+def export_sqlite_to_excel(
+    clients_path: Path,
+    registry_path: Path,
+    db_path: Path = SQLITE_DB_PATH,
+    overwrite: bool = False,
+) -> Dict[str, int]:
+    """
+    Выгружает SQLite обратно в .xlsx с листами "Folder" и "Registry"
+    в той же раскладке колонок, что и исходные файлы.
+    Существующий файл перезаписывается только при overwrite=True: в нём
+    заменяются строки листа, а заголовок листа и другие листы остаются.
+    """
+    targets = (("clients", Path(clients_path)), ("registry", Path(registry_path)))
+    existing = [str(path) for _, path in targets if path.exists()]
+    if existing and not overwrite:
+        raise FileExistsError(f"Файлы уже существуют: {', '.join(existing)}")
+
+    source = SqliteStorage(db_path)
+    counts = {}
+    for table, path in targets:
+        df = source.read(table)
+        rows = ([None if pd.isna(v) else v for v in row] for row in df[COLUMNS[table]].itertuples(index=False))
+        sheet = EXCEL_SHEETS[table][1]
+        if path.exists():
+            wb = load_workbook(path)
+            ws = wb[sheet] if sheet in wb.sheetnames else wb.create_sheet(sheet)
+            _ensure_header(ws, table)
+            if ws.max_row > 1:
+                ws.delete_rows(2, ws.max_row - 1)
+            for values in rows:
+                ws.append(values)
+            tmp = path.with_name(path.stem + ".tmp.xlsx")
+            wb.save(tmp)
+            os.replace(tmp, path)
+        else:
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet(sheet)
+            ws.append(SHEET_HEADERS[table])
+            for values in rows:
+                ws.append(values)
+            wb.save(path)
+        counts[table] = len(df)
+        logging.info(f"Экспорт из SQLite: {table} — {len(df)} строк в {path}")
+    return counts
@@ -0,0 +1,270 @@
+# core/templates.py
+import copy
+import logging
+import re
+import threading
+import zipfile
+from bisect import bisect_right
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from docx import Document
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+from config.settings import DOCX_RENDER_ENGINE
+
+# Плейсхолдер в шаблоне: {FULL_FIO}, {DATE} и т.п.
+PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+
+def _substitute(texts: List[str], data: Dict[str, Any], unresolved: List[str]) -> Optional[List[str]]:
+    """
+    Подстановка за один проход по тексту run'ов абзаца.
+    Плейсхолдер может быть разбит Word'ом на несколько run'ов («{FULL_» + «FIO}»):
+    значение пишется в run, где плейсхолдер начинается (с его форматированием),
+    остаток плейсхолдера из следующих run'ов удаляется. Ключи, которых нет
+    в data, добавляются в unresolved и удаляются из текста.
+    :return: новые тексты run'ов или None, если плейсхолдеров нет
+    """
+    full = "".join(texts)
+    matches = list(PLACEHOLDER_RE.finditer(full)) if "{" in full else []
+    if not matches:
+        return None
+
+    starts = list(accumulate((len(text) for text in texts[:-1]), initial=0))
+    result = [[] for _ in texts]
+
+    def copy_text(begin: int, end: int):
+        """Текст full[begin:end] — в те run'ы, которым он принадлежал"""
+        i = bisect_right(starts, begin) - 1
+        while begin < end:
+            run_end = starts[i] + len(texts[i])
+            if begin < run_end:
+                result[i].append(full[begin:min(end, run_end)])
+                begin = min(end, run_end)
+            i += 1
+
+    position = 0
+    for match in matches:
+        copy_text(position, match.start())
+        key = match.group(1)
+        if key in data:
+            result[bisect_right(starts, match.start()) - 1].append(str(data[key]))
+        else:
+            unresolved.append(key)
+        position = match.end()
+    copy_text(position, len(full))
+    return ["".join(parts) for parts in result]
+
+
+def replace_placeholders_in_paragraph(paragraph, data: Dict[str, Any]) -> List[str]:
+    """
+    Заменяет {ключ} на значение в параграфе (с сохранением форматирования run'ов).
+    :return: плейсхолдеры без значения в data (они удаляются из текста)
+    """
+    unresolved = []
+    runs = paragraph.runs
+    texts = [run.text for run in runs]
+    replaced = _substitute(texts, data, unresolved)
+    if replaced is not None:
+        for run, old, new in zip(runs, texts, replaced):
+            if old != new:
+                run.text = new
+    return unresolved
+
+
+def replace_placeholders_in_table(table, data: Dict[str, Any]) -> List[str]:
+    """Заменяет {ключ} на значение в таблицах. :return: плейсхолдеры без значения"""
+    unresolved = []
+    for row in table.rows:
+        for cell in row.cells:
+            for paragraph in cell.paragraphs:
+                unresolved += replace_placeholders_in_paragraph(paragraph, data)
+    return unresolved
+
+
+def _paragraph_text(p) -> str:
+    return "".join(t.text or "" for t in p.iter(qn("w:t")))
+
+
+# Части .docx с текстом для подстановки: тело документа, колонтитулы
+_TEXT_PARTS_RE = re.compile(r"^/?word/(document|header\d*|footer\d*)\.xml$")
+
+
+def _log_unresolved(template_path: Path, output_path: Path, unresolved: List[str]):
+    if unresolved:
+        missing = ", ".join(sorted(set(unresolved)))
+        logging.warning(f"⚠️ {template_path.name}: нет значений для {missing} — удалены из {Path(output_path).name}")
+
+
+class CompiledTemplate:
+    """
+    Шаблон .docx, разобранный один раз (python-docx): документ, нетронутые
+    копии XML тела и колонтитулов и места плейсхолдеров — номера параграфов
+    (включая параграфы в таблицах) и ключи в каждом из них.
+
+    Документ собирается из копий: заменяются только параграфы
+    с плейсхолдерами, шаблон заново не открывается и не обходится.
+    """
+
+    def __init__(self, path: Path, stamp: tuple):
+        self.path = Path(path)
+        self.stamp = stamp
+        self._document = Document(self.path)
+        # [(часть документа, нетронутый XML, [(№ параграфа, ключи)])]
+        self._parts = []
+        for part in self._document.part.package.iter_parts():
+            if not _TEXT_PARTS_RE.match(str(part.partname)):
+                continue
+            pristine = copy.deepcopy(part.element)
+            locations: List[Tuple[int, FrozenSet[str]]] = []
+            for index, p in enumerate(pristine.iter(qn("w:p"))):
+                keys = frozenset(PLACEHOLDER_RE.findall(_paragraph_text(p)))
+                if keys:
+                    locations.append((index, keys))
+            if locations:
+                self._parts.append((part, pristine, locations))
+        self.keys = frozenset().union(*(keys for _, _, locations in self._parts for _, keys in locations))
+        # Документ один на шаблон — собираем по очереди
+        self._lock = threading.Lock()
+
+    def render(self, data: Dict[str, Any], output_path: Path, report_as: Optional[Path] = None) -> List[str]:
+        """
+        Подставляет data в копию шаблона и сохраняет в output_path.
+        :param report_as: файл, который назвать в предупреждении (если пишем во временный)
+        :return: плейсхолдеры, для которых в data нет значения (в документ не попадают)
+        """
+        unresolved = []
+        with self._lock:
+            for part, pristine, locations in self._parts:
+                element = copy.deepcopy(pristine)
+                paragraphs = list(element.iter(qn("w:p")))
+                for index, _ in locations:
+                    unresolved += replace_placeholders_in_paragraph(Paragraph(paragraphs[index], None), data)
+                part._element = element
+            self._document.save(output_path)
+        _log_unresolved(self.path, report_as or output_path, unresolved)
+        return unresolved
+
+
+# Метки мест подстановки в XML шаблона (символы из области частного использования)
+_SLOT_OPEN, _SLOT_CLOSE = "\ue000", "\ue001"
+_SLOT_RE = re.compile(f"{_SLOT_OPEN}(\\d+){_SLOT_CLOSE}".encode())
+
+
+class XmlTemplate:
+    """
+    Шаблон .docx как zip-архив, без объектной модели python-docx
+    (DOCX_RENDER_ENGINE = "xml").
+
+    При разборе XML тела и колонтитулов режется на неизменные куски байтов
+    и места подстановки — тексты (w:t) параграфов с плейсхолдерами.
+    Документ собирается склейкой кусков с подставленными значениями,
+    остальные части архива копируются без изменений. Подстановка — та же,
+    что в CompiledTemplate (_substitute), но по элементам w:t, а не по run'ам:
+    значение получает форматирование run'а, где начинается плейсхолдер.
+    Табуляции и переводы строк в значениях не превращаются в w:tab/w:br.
+    """
+
+    def __init__(self, path: Path, stamp: tuple):
+        self.path = Path(path)
+        self.stamp = stamp
+        with zipfile.ZipFile(self.path) as archive:
+            self._entries = [(info, archive.read(info)) for info in archive.infolist()]
+        # Имя части → (куски байтов и номера мест, [(ключи, исходные тексты w:t)])
+        self._parts: Dict[str, Tuple[list, List[Tuple[FrozenSet[str], List[str]]]]] = {}
+        for info, raw in self._entries:
+            if _TEXT_PARTS_RE.match(info.filename):
+                compiled = self._compile_part(raw)
+                if compiled is not None:
+                    self._parts[info.filename] = compiled
+        self.keys = frozenset().union(*(keys for _, groups in self._parts.values() for keys, _ in groups))
+
+    @staticmethod
+    def _compile_part(raw: bytes):
+        root = etree.fromstring(raw)
+        groups = []
+        for p in root.iter(qn("w:p")):
+            elements = list(p.iter(qn("w:t")))
+            texts = [t.text or "" for t in elements]
+            keys = frozenset(PLACEHOLDER_RE.findall("".join(texts)))
+            if not keys:
+                continue
+            first_slot = sum(len(group_texts) for _, group_texts in groups)
+            for slot, t in enumerate(elements, first_slot):
+                t.text = f"{_SLOT_OPEN}{slot}{_SLOT_CLOSE}"
+                # Как при записи run.text: пробелы по краям значения не теряются
+                t.set(qn("xml:space"), "preserve")
+            groups.append((keys, texts))
+        if not groups:
+            return None
+        xml = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+        # Чётные элементы — неизменные байты, нечётные — номера мест подстановки
+        chunks = _SLOT_RE.split(xml)
+        chunks[1::2] = [int(slot) for slot in chunks[1::2]]
+        return chunks, groups
+
+    def _render_part(self, chunks: list, groups, data: Dict[str, Any], unresolved: List[str]) -> bytes:
+        values = []
+        for _, texts in groups:
+            replaced = _substitute(texts, data, unresolved)
+            values.extend(texts if replaced is None else replaced)
+        encoded = [escape(value).encode() for value in values]
+        return b"".join(chunk if i % 2 == 0 else encoded[chunk] for i, chunk in enumerate(chunks))
+
+    def render(self, data: Dict[str, Any], output_path: Path, report_as: Optional[Path] = None) -> List[str]:
+        """
+        Подставляет data и записывает архив в output_path за один проход.
+        :param report_as: файл, который назвать в предупреждении (если пишем во временный)
+        :return: плейсхолдеры, для которых в data нет значения (в документ не попадают)
+        """
+        unresolved = []
+        with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for info, raw in self._entries:
+                compiled = self._parts.get(info.filename)
+                if compiled is not None:
+                    raw = self._render_part(*compiled, data, unresolved)
+                # Копия: writestr дописывает в ZipInfo размеры и смещение
+                archive.writestr(copy.copy(info), raw)
+        _log_unresolved(self.path, report_as or output_path, unresolved)
+        return unresolved
+
+
+_ENGINES = {"docx": CompiledTemplate, "xml": XmlTemplate}
+_compiled: Dict[Tuple[Path, str], Any] = {}
+_compiled_lock = threading.Lock()
+
+
+def compiled_template(path: Path, engine: Optional[str] = None):
+    """
+    Разобранный шаблон из кэша; шаблон перечитывается, если файл изменился.
+    :param engine: "docx" (python-docx) или "xml" (сырой XML), по умолчанию DOCX_RENDER_ENGINE
+    """
+    path = Path(path)
+    engine = engine or DOCX_RENDER_ENGINE
+    if engine not in _ENGINES:
+        raise ValueError(f"Неизвестный движок шаблонов: {engine}")
+    st = path.stat()
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _compiled_lock:
+        template = _compiled.get((path, engine))
+        if template is None or template.stamp != stamp:
+            template = _ENGINES[engine](path, stamp)
+            _compiled[(path, engine)] = template
+            logging.info(f"Шаблон {path.name} разобран ({engine}): ключей для подстановки — {len(template.keys)}")
+        return template
+
+
+def render_to_file(template_path: Path, output_path: Path, data: Dict[str, Any],
+                   report_as: Optional[Path] = None) -> List[str]:
+    """
+    Заполняет шаблон и сохраняет документ (для пула процессов в core.batch:
+    каждый процесс разбирает шаблон один раз и держит его в своём кэше).
+    :param report_as: итоговый документ, если output_path — временный файл
+    :return: плейсхолдеры без значения
+    """
+    return compiled_template(template_path).render(data, output_path, report_as)
@@ -68,6 +68,75 @@ def sanitize_filename(filename: str) -> str:
     return filename
 
 
+# Латинские буквы, похожие на кириллические (сканы, набор в другой раскладке)
+_LATIN_LOOKALIKES = "abcehkmoptxy"
+_CYRILLIC_LOOKALIKES = "авсенкмортху"
+_LATIN_TO_CYRILLIC = str.maketrans(_LATIN_LOOKALIKES, _CYRILLIC_LOOKALIKES)
+
+# В VIN: буквы I, O, Q (в VIN не бывают) → цифры 1, 0, 0, кириллица → латиница.
+# Одна таблица: кириллическая О сразу становится 0, как и латинская O
+_VIN_DIGITS = {"I": "1", "O": "0", "Q": "0"}
+_VIN_FOLDING = str.maketrans({
+    **{cyr: _VIN_DIGITS.get(lat, lat) for cyr, lat in zip(_CYRILLIC_LOOKALIKES.upper(), _LATIN_LOOKALIKES.upper())},
+    **_VIN_DIGITS,
+})
+
+# Латиница → кириллица для имён, набранных транслитом (загранпаспорт и т.п.).
+# Длинные сочетания проверяются раньше коротких
+_TRANSLIT = {
+    "shch": "щ", "sch": "щ",
+    "zh": "ж", "kh": "х", "ts": "ц", "tz": "ц", "ch": "ч", "sh": "ш",
+    "yu": "ю", "iu": "ю", "ya": "я", "ia": "я", "yo": "е", "ye": "е",
+    "a": "а", "b": "б", "c": "к", "d": "д", "e": "е", "f": "ф", "g": "г",
+    "h": "х", "i": "и", "j": "и", "k": "к", "l": "л", "m": "м", "n": "н",
+    "o": "о", "p": "п", "q": "к", "r": "р", "s": "с", "t": "т", "u": "у",
+    "v": "в", "w": "в", "x": "кс", "y": "и", "z": "з",
+}
+_TRANSLIT_RE = re.compile("|".join(sorted(_TRANSLIT, key=len, reverse=True)))
+
+# Буквы, которые в транслите не различаются: ё/е, э/е, й/ы/и, ь и ъ не пишутся,
+# я и ю — как «ia» и «iu» (Мария / Maria / Mariya, Юлия / Yulia / Julia)
+_CYRILLIC_FOLDING = str.maketrans({
+    "ё": "е", "э": "е", "й": "и", "ы": "и", "ь": None, "ъ": None, "я": "иа", "ю": "иу",
+})
+
+
+def _normalize_word(word: str) -> str:
+    latin = set(re.findall("[a-z]", word.casefold()))
+    lookalikes_only = latin <= set(_LATIN_LOOKALIKES)
+    if lookalikes_only and (re.search("[а-яё]", word, flags=re.IGNORECASE) or word.isupper()):
+        # Кириллица с вкраплениями похожих латинских букв (или «МАКАРОВ», распознанный латиницей)
+        word = word.casefold().translate(_LATIN_TO_CYRILLIC)
+    else:
+        # Транслит — всё слово, даже если в нём попалась кириллица («Pеtrov» с русской е)
+        word = _TRANSLIT_RE.sub(lambda m: _TRANSLIT[m.group()], word.casefold())
+    return re.sub("и+", "и", word.translate(_CYRILLIC_FOLDING))
+
+
+def normalize_search_text(text: str) -> str:
+    """
+    Ключ для поиска по ФИО: без лишних пробелов и регистра, в кириллице.
+    «Пётр», «ПЕТР», «Пeтр» (латинская e) и «Petr» дают один и тот же ключ,
+    «Pеtrov» (транслит с русской е) — тот же, что «Петров».
+    Имена в транслите совпадают с кириллицей: Мария / Maria / Mariya,
+    Юлия / Yulia / Julia, Наталья / Natalya / Natalia, Юрий / Yuriy / Iurii
+    """
+    return " ".join(_normalize_word(word) for word in str(text).split())
+
+
+def normalize_vin(vin: str) -> str:
+    """
+    Ключ VIN для поиска: без разделителей, заглавными латинскими буквами,
+    I → 1, O и Q → 0 (этих букв в VIN нет, см. validate_vin)
+    """
+    return re.sub(r'[\s\-_]+', '', str(vin)).upper().translate(_VIN_FOLDING)
+
+
+def client_folder_name(surname: str, car_model: str, vin: str, index: str) -> str:
+    """Имя папки клиента: Фамилия_Марка_vin VIN_Индекс"""
+    return f"{surname}_{car_model}_vin {vin}_{index}"
+
+
 def format_phone(phone: str) -> tuple[str, str]:
     """
     Форматирует телефон и возвращает (форматированный, последние_4_цифры)
@@ -2,6 +2,8 @@
 import re
 # from typing import Match
 
+import pandas as pd
+
 
 def validate_phone(phone: str) -> bool:
     """
@@ -69,6 +71,36 @@ def validate_date(date_str: str) -> bool:
         return False
 
 
+# --- Проверка целых колонок (массовый импорт) ---
+# Те же правила, что у функций выше, но для pd.Series: одна операция на колонку.
+# Пустые ячейки (None/NaN/"") считаются некорректными, как и в validate_*
+
+def _text_series(values: pd.Series) -> pd.Series:
+    """Строковые значения колонки; не-строки (NaN, числа) → пустая строка"""
+    return values.where(values.map(lambda v: isinstance(v, str)), "").astype(str)
+
+
+def validate_phone_series(phones: pd.Series) -> pd.Series:
+    """validate_phone для колонки: Series из True/False"""
+    digits = _text_series(phones).str.replace(r'\D', '', regex=True)
+    length = digits.str.len()
+    return (length == 10) | ((length == 11) & digits.str[0].isin(['7', '8']))
+
+
+def validate_vin_series(vins: pd.Series) -> pd.Series:
+    """validate_vin для колонки: Series из True/False"""
+    cleaned = _text_series(vins).str.strip().str.upper().str.replace(r'[\s\-_]+', '', regex=True)
+    return cleaned.str.fullmatch(r'[A-HJ-NPR-Z0-9]{17}')
+
+
+def validate_date_series(dates: pd.Series) -> pd.Series:
+    """validate_date для колонки: Series из True/False"""
+    text = _text_series(dates).str.strip()
+    parsed = pd.to_datetime(text.where(text.str.fullmatch(r'\d{2}\.\d{2}\.\d{4}')),
+                            format="%d.%m.%Y", errors="coerce")
+    return parsed.notna() & parsed.dt.year.between(1900, 2100)
+
+
 # --- Для тестирования ---
 if __name__ == "__main__":
     print("Телефон:")
@@ -0,0 +1,189 @@
+# gui/widgets/autocomplete.py
+import itertools
+import tkinter as tk
+from typing import Callable, List, Optional, Tuple
+
+from config.settings import AUTOCOMPLETE_DELAY_MS, MAX_SEARCH_RESULTS
+from core.database import suggest_clients, suggest_contracts
+from core.jobs import Job, JobQueue
+
+# Подсказка: (текст в списке, что подставить в поле)
+Suggestion = Tuple[str, str]
+
+# Свой поток для подсказок: не ждут в очереди за генерацией документов
+_queries: Optional[JobQueue] = None
+_tags = itertools.count(1)
+
+
+def _query_queue(widget) -> JobQueue:
+    global _queries
+    if _queries is None:
+        _queries = JobQueue(workers=1)
+        _queries.attach(widget.nametowidget("."), interval_ms=20)
+    return _queries
+
+
+def client_suggestions(text: str) -> List[Suggestion]:
+    """Клиенты по началу VIN или ФИО → подставляется VIN (или ФИО, если VIN нет)"""
+    result = []
+    for client in suggest_clients(text, MAX_SEARCH_RESULTS):
+        label = f"{client.full_name} — {client.car_model} {client.vin}".strip()
+        result.append((label, client.vin or client.full_name))
+    return result
+
+
+def contract_suggestions(text: str) -> List[Suggestion]:
+    """Договоры по началу номера или ФИО → подставляется номер договора"""
+    return [
+        (f"{contract.contract_num} — {contract.fio} ({contract.date})", str(contract.contract_num))
+        for contract in suggest_contracts(text, MAX_SEARCH_RESULTS)
+    ]
+
+
+class Autocomplete:
+    """
+    Выпадающий список подсказок под полем ввода.
+
+    Запрос уходит через AUTOCOMPLETE_DELAY_MS после последнего нажатия
+    клавиши (набор подряд — один запрос), выполняется в фоне (core.jobs),
+    а ответ на устаревший запрос отбрасывается. ↓/↑ — выбор, Enter или
+    щелчок — подставить, Esc — закрыть список. Пока в списке ничего не
+    выбрано, Enter работает, как раньше (обработчик окна).
+    """
+
+    def __init__(self, entry, source: Callable[[str], List[Suggestion]],
+                 on_select: Optional[Callable[[str], None]] = None,
+                 min_chars: int = 2, delay_ms: int = AUTOCOMPLETE_DELAY_MS):
+        self.entry = entry
+        self._source = source
+        self._on_select = on_select
+        self._min_chars = min_chars
+        self._delay_ms = delay_ms
+        self._timer = None
+        self._job: Optional[Job] = None
+        self._generation = 0
+        self._text = ""                     # текст, по которому показан (или ищется) список
+        self._values: List[str] = []
+
+        self._popup = tk.Toplevel(entry)
+        self._popup.withdraw()
+        self._popup.overrideredirect(True)
+        self._listbox = tk.Listbox(self._popup, height=MAX_SEARCH_RESULTS, takefocus=0, activestyle="none")
+        self._listbox.pack(fill="both", expand=True)
+        self._listbox.bind("<ButtonRelease-1>", lambda event: self._choose())
+
+        # Свой тег перед тегом поля: Enter/стрелки перехватываются до обработчиков окна
+        tag = f"Autocomplete{next(_tags)}"
+        entry.bindtags((tag,) + entry.bindtags())
+        entry.bind_class(tag, "<KeyRelease>", self._on_key)
+        entry.bind_class(tag, "<Down>", lambda event: self._move(1))
+        entry.bind_class(tag, "<Up>", lambda event: self._move(-1))
+        entry.bind_class(tag, "<Return>", self._on_return)
+        entry.bind_class(tag, "<Escape>", self._on_escape)
+        entry.bind_class(tag, "<FocusOut>", lambda event: entry.after(150, self._hide_unless_focused))
+        entry.bind_class(tag, "<Destroy>", lambda event: self._cancel())
+
+    def _on_key(self, event):
+        if event.keysym in ("Down", "Up", "Return", "KP_Enter", "Escape", "Tab"):
+            return
+        text = self.entry.get().strip()
+        if text == self._text:
+            return  # Shift, стрелки влево/вправо и т.п. — текст не изменился
+        self._cancel()
+        self._text = text
+        if len(text) < self._min_chars:
+            self.hide()
+            return
+        self._timer = self.entry.after(self._delay_ms, lambda: self._query(text))
+
+    def _cancel(self):
+        """Отменяет отложенный и уже отправленный запрос"""
+        self._generation += 1
+        if self._timer is not None:
+            self.entry.after_cancel(self._timer)
+            self._timer = None
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+
+    def _query(self, text: str):
+        self._timer = None
+        generation = self._generation
+        self._job = _query_queue(self.entry).submit(
+            self._source, text, name="Подсказки",
+            on_done=lambda suggestions: self._show(generation, suggestions),
+        )
+
+    def _show(self, generation: int, suggestions: List[Suggestion]):
+        if generation != self._generation or not self.entry.winfo_exists():
+            return  # Пока искали, текст в поле изменился
+        self._job = None
+        if not suggestions:
+            self.hide()
+            return
+        self._values = [value for _, value in suggestions]
+        self._listbox.delete(0, tk.END)
+        for label, _ in suggestions:
+            self._listbox.insert(tk.END, label)
+        self._listbox.config(height=len(suggestions))
+        x = self.entry.winfo_rootx()
+        y = self.entry.winfo_rooty() + self.entry.winfo_height()
+        self._popup.geometry(f"{max(self.entry.winfo_width(), 300)}x{self._listbox.winfo_reqheight()}+{x}+{y}")
+        self._popup.deiconify()
+        self._popup.lift()
+
+    def visible(self) -> bool:
+        return self._popup.winfo_exists() and self._popup.winfo_viewable()
+
+    def hide(self):
+        if self._popup.winfo_exists():
+            self._popup.withdraw()
+            self._listbox.selection_clear(0, tk.END)
+
+    def _hide_unless_focused(self):
+        """Поле потеряло фокус: список закрывается, если щёлкнули не по нему"""
+        if not self.entry.winfo_exists() or self.entry.focus_get() is self.entry:
+            return
+        if self.entry.winfo_containing(*self.entry.winfo_pointerxy()) is not self._listbox:
+            self.hide()
+
+    def _move(self, step: int):
+        if not self.visible():
+            return None
+        current = self._listbox.curselection()
+        index = (current[0] + step) if current else (0 if step > 0 else len(self._values) - 1)
+        index = max(0, min(index, len(self._values) - 1))
+        self._listbox.selection_clear(0, tk.END)
+        self._listbox.selection_set(index)
+        self._listbox.see(index)
+        return "break"
+
+    def _on_return(self, event):
+        if self.visible() and self._listbox.curselection():
+            self._choose()
+            return "break"
+        self._cancel()
+        self.hide()
+        return None
+
+    def _on_escape(self, event):
+        if self.visible():
+            self._cancel()
+            self.hide()
+            return "break"
+        return None
+
+    def _choose(self):
+        selection = self._listbox.curselection()
+        if not selection:
+            return
+        value = self._values[selection[0]]
+        self._cancel()
+        self.hide()
+        self._text = value
+        self.entry.delete(0, tk.END)
+        self.entry.insert(0, value)
+        self.entry.icursor(tk.END)
+        self.entry.focus_set()
+        if self._on_select is not None:
+            self._on_select(value)
@@ -0,0 +1,30 @@
+# gui/widgets/client_lookup.py
+from tkinter import messagebox
+from typing import Optional, Tuple
+
+from core.database import find_client, fuzzy_search_clients
+from core.records import ClientRecord
+
+
+def find_client_or_similar(search_term: str) -> Tuple[Optional[ClientRecord], bool]:
+    """
+    Клиент по VIN или ФИО (find_client); если точных совпадений нет —
+    ближайший клиент с опечаткой в VIN или фамилии (fuzzy_search_clients).
+    Вызывается в фоне. :return: (клиент или None, найден ли он точно)
+    """
+    client = find_client(search_term)
+    if client is not None:
+        return client, True
+    similar = fuzzy_search_clients(search_term, limit=1)
+    return (similar[0], False) if similar else (None, False)
+
+
+def confirm_similar_client(client: ClientRecord, search_term: str, parent) -> bool:
+    """Клиент найден нечётким поиском: оператор подтверждает, что это он"""
+    return messagebox.askyesno(
+        "Похожий клиент",
+        f"Клиент «{search_term}» не найден.\n"
+        f"Похожий клиент:\n{client.full_name}\nVIN: {client.vin}\n\n"
+        "Это он?",
+        parent=parent,
+    )
@@ -0,0 +1,53 @@
+# gui/widgets/job_status.py
+from tkinter import ttk
+
+from core.jobs import JobQueue
+
+
+class JobStatusBar(ttk.Frame):
+    """
+    Строка состояния фоновых заданий: сколько заданий идёт, ход текущего
+    и кнопка отмены. Обновляется по событиям очереди (в потоке Tk).
+    """
+
+    def __init__(self, parent, jobs: JobQueue):
+        super().__init__(parent)
+        self._jobs = jobs
+        self._label = ttk.Label(self, text="")
+        self._label.pack(side="left", padx=(10, 5))
+        self._cancel_btn = ttk.Button(self, text="Отменить", command=jobs.cancel_all, state="disabled")
+        self._cancel_btn.pack(side="right", padx=(5, 10))
+        self._bar = ttk.Progressbar(self, length=120, mode="determinate", maximum=1.0)
+        self._bar.pack(side="right", padx=5)
+        self._busy = False
+        jobs.add_listener(self.refresh)
+
+    def refresh(self):
+        active = self._jobs.active()
+        if not active:
+            self._stop()
+            self._label.config(text="")
+            self._bar["value"] = 0
+            self._cancel_btn.config(state="disabled")
+            return
+
+        job = active[0]
+        text = f"⏳ {job.name}" + (f": {job.status}" if job.status else "")
+        if len(active) > 1:
+            text += f" (ещё {len(active) - 1})"
+        self._label.config(text=text)
+        self._cancel_btn.config(state="normal")
+        if job.progress is None:
+            if not self._busy:
+                self._bar.config(mode="indeterminate")
+                self._bar.start(15)
+                self._busy = True
+        else:
+            self._stop()
+            self._bar["value"] = job.progress
+
+    def _stop(self):
+        if self._busy:
+            self._bar.stop()
+            self._bar.config(mode="determinate")
+            self._busy = False
@@ -3,15 +3,74 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 
 # Импорты из проекта
-from core.database import find_client, save_contract_record, get_next_registry_id, is_contract_exists_for_fio
+from core.database import (
+    save_contract_record, is_contract_exists_for_fio,
+    reserve_contract_number, reserve_registry_id,
+)
 from core.document_generator import generate_contract
+from core.jobs import check_cancelled, job_queue, report_progress
+from gui.widgets.autocomplete import Autocomplete, client_suggestions
+from gui.widgets.client_lookup import confirm_similar_client, find_client_or_similar
 from config.settings import WINDOW_WIDTH, ENTRY_WIDTH
 from core.utils import get_current_date
 
 
+def _find_client_for_contract(search_term: str):
+    """
+    Поиск клиента и проверка договора (в фоне).
+    :return: (клиент, найден ли он точно, есть ли договор)
+    """
+    report_progress(0, 2, "поиск клиента")
+    client_data, exact = find_client_or_similar(search_term)
+    if client_data is None:
+        return None, False, False
+    check_cancelled()
+    report_progress(1, 2, "проверка договоров")
+    return client_data, exact, is_contract_exists_for_fio(client_data.full_name)
+
+
+def _create_contract(client_data, full_name: str):
+    """
+    Генерация договора и запись в реестр (в фоне).
+    :return: строка реестра или None, если документ не создан
+    :raises RuntimeError: документ создан, но реестр запись не принял
+    Отмена возможна до создания документа; созданный договор записывается в реестр.
+    """
+    # Номер договора резервируется до генерации: на другом рабочем месте
+    # его уже не выдадут, и в документе и в реестре будет один номер
+    report_progress(0, 3, "резерв номера")
+    check_cancelled()
+    contract_num = reserve_contract_number()
+
+    # Генерация договора
+    report_progress(1, 3, f"документ {contract_num}")
+    check_cancelled()  # Номер пропускается, как при сбое генерации
+    if not generate_contract(client_data, contract_num=contract_num):
+        return None
+
+    # Сохранение в реестр договоров
+    report_progress(2, 3, "запись в реестр")
+    contract_data = {
+        "Номер": reserve_registry_id(),
+        "ФИО": full_name,
+        "Номер договора": contract_num,
+        "Телефон": client_data["Телефон"],
+        "Индекс": client_data["Индекс"],
+        "Дата": get_current_date(),
+        "№ клиента": client_data["№"],
+    }
+    if not save_contract_record(contract_data):
+        raise RuntimeError(f"документ {contract_num} создан, но договор не записан в реестр.\n"
+                           "Подробности в логе.")
+    report_progress(3, 3)
+    return contract_data
+
+
 def open_contract_window(parent):
     """
-    Окно для поиска клиента и оформления договора
+    Окно для поиска клиента и оформления договора.
+    Поиск и генерация идут в фоне (core.jobs): окно не зависает, а после
+    подтверждения закрывается — договор создаётся, пока вводится следующий клиент
     :param parent: родительское окно
     """
     window = tk.Toplevel(parent)
@@ -31,6 +90,8 @@ def open_contract_window(parent):
     search_entry = ttk.Entry(window, width=ENTRY_WIDTH)
     search_entry.grid(row=0, column=1, padx=(0, 10), pady=30, sticky="ew")
     search_entry.focus()
+    # Подсказки при вводе VIN или ФИО
+    Autocomplete(search_entry, client_suggestions)
 
     def create_contract():
         search_term = search_entry.get().strip()
@@ -38,59 +99,81 @@ def open_contract_window(parent):
             messagebox.showwarning("Внимание", "Введите данные для поиска.")
             return
 
-        # Поиск клиента
-        client_data = find_client(search_term)
+        # Поиск клиента — в фоне, дальше в confirm_contract
+        create_btn.config(state="disabled")
+        job_queue().submit(
+            _find_client_for_contract, search_term, name="Поиск клиента",
+            on_done=lambda found: confirm_contract(search_term, found),
+            on_error=search_failed, on_cancel=search_cancelled,
+        )
+
+    def search_cancelled(job):
+        if window.winfo_exists():
+            create_btn.config(state="normal")
+
+    def search_failed(error):
+        if window.winfo_exists():
+            create_btn.config(state="normal")
+            messagebox.showerror("Ошибка", f"Не удалось найти клиента:\n{error}", parent=window)
+
+    def confirm_contract(search_term, found):
+        if not window.winfo_exists():
+            return  # Окно закрыли, пока шёл поиск
+        create_btn.config(state="normal")
+        client_data, exact, contract_exists = found
         if client_data is None:
-            messagebox.showerror("Ошибка", "Клиент не найден. Проверьте ФИО или VIN.")
+            messagebox.showerror("Ошибка", "Клиент не найден. Проверьте ФИО или VIN.", parent=window)
+            return
+        # Найден с опечаткой — только после подтверждения оператора
+        if not exact and not confirm_similar_client(client_data, search_term, window):
             return
 
         # Формируем полное ФИО
         full_name = f"{client_data['Фамилия']} {client_data['Имя']} {client_data['Отчество']}"
 
         # 🔍 Проверка на существующий договор
-        if is_contract_exists_for_fio(full_name):
+        if contract_exists:
             answer = messagebox.askyesno(
                 "Дубликат договора",
                 f"Договор для клиента:\n{full_name}\nуже существует.\n\n"
-                "Вы уверены, что хотите создать ещё один?"
+                "Вы уверены, что хотите создать ещё один?",
+                parent=window,
             )
             if not answer:
                 return  # Отмена операции
         # Подтверждение
-        full_name = f"{client_data['Фамилия']} {client_data['Имя']} {client_data['Отчество']}"
-        if not messagebox.askyesno("Подтверждение", f"Оформить договор для:\n{full_name}?"):
+        if not messagebox.askyesno("Подтверждение", f"Оформить договор для:\n{full_name}?", parent=window):
             return
 
-        # Генерация договора
-        success = generate_contract(client_data.to_dict())
-        if success:
-            # Сохранение в реестр договоров
-            from core.database import get_next_contract_number
-
-            contract_data = {
-                "Номер": get_next_registry_id(),
-                "ФИО": full_name,
-                "Номер договора": get_next_contract_number(),
-                "Телефон": client_data["Телефон"],
-                "Индекс": client_data["Индекс"],
-                "Дата": get_current_date()
-            }
-            save_contract_record(contract_data)
-
+        # Генерация договора — в фоне, итог сообщается из главного окна
+        def done(contract_data):
+            if contract_data is None:
+                messagebox.showerror(
+                    "Ошибка", f"Не удалось создать договор для {full_name}.\n"
+                              "Проверьте шаблон 'contract_template.docx'.", parent=parent)
+                return
             messagebox.showinfo("Успех", f"Договор успешно создан и сохранён! \n\n"
                                          f"Номер договора: {contract_data['Номер договора']}\n"
                                          f"Клиент: {full_name}\n"
-                                         f"Дата: {get_current_date()}")
-            window.destroy()
-        else:
-            messagebox.showerror("Ошибка", "Не удалось создать договор.\nПроверьте шаблон 'contract_template.docx'.")
+                                         f"Дата: {contract_data['Дата']}", parent=parent)
+
+        def failed(error):
+            messagebox.showerror("Ошибка", f"Договор для {full_name} не оформлен:\n{error}", parent=parent)
+
+        def cancelled(job):
+            messagebox.showwarning("Отменено", f"Договор для {full_name} не создан: задание отменено.", parent=parent)
+
+        job_queue().submit(_create_contract, client_data, full_name,
+                           name=f"Договор: {full_name}", on_done=done, on_error=failed, on_cancel=cancelled)
+        window.destroy()
 
     # Кнопки
     button_frame = ttk.Frame(window)
     button_frame.grid(row=1, column=0, columnspan=2, pady=10)
 
     ttk.Button(button_frame, text="Отмена", command=window.destroy).pack(side="left", padx=5)
-    ttk.Button(button_frame, text="Оформить", command=create_contract).pack(side="left", padx=5)
+    create_btn = ttk.Button(button_frame, text="Оформить", command=create_contract)
+    create_btn.pack(side="left", padx=5)
 
     # Обработка Enter
     search_entry.bind("<Return>", lambda event: create_contract())
@@ -3,12 +3,24 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 
 # Импорты из проекта
-from core.database import save_client, get_next_client_id
+from core.database import save_client, reserve_client_id
+from core.jobs import check_cancelled, job_queue, report_progress
 from core.validators import validate_phone, validate_vin
-from core.utils import get_current_date, format_phone
+from core.utils import get_current_date, format_phone, client_folder_name
 from config.settings import WINDOW_WIDTH, ENTRY_WIDTH
 
 
+def _save_new_client(full_data: dict) -> bool:
+    """Резервирует № клиента и сохраняет его (в фоне); отмена — до резерва №"""
+    report_progress(0, 2, "резерв №")
+    check_cancelled()
+    full_data["№"] = reserve_client_id()
+    report_progress(1, 2, "запись в базу")
+    saved = save_client(full_data)
+    report_progress(2, 2)
+    return saved
+
+
 def open_data_entry_window(parent):
     """
     Открывает окно для ввода данных нового клиента
@@ -117,11 +129,11 @@ def open_data_entry_window(parent):
                 formatted_phone = phone  # если ошибка — сохраняем как есть
 
         # 🔹 Генерация имени папки
-        folder_name = f"{data['surname']}_{data['car_model']}_vin {data['vin']}_{data['index']}"
+        folder_name = client_folder_name(data['surname'], data['car_model'], data['vin'], data['index'])
 
-        # 🔹 Подготовка данных для сохранения
+        # 🔹 Подготовка данных для сохранения (№ резервируется при записи)
         full_data = {
-            "№": get_next_client_id(),
+            "№": None,
             "Фамилия": data["surname"],
             "Имя": data["name"],
             "Отчество": data["patronymic"],
@@ -139,19 +151,33 @@ def open_data_entry_window(parent):
             "Дата создания папки": get_current_date()
         }
 
-        # 🔹 Сохранение
-        if save_client(full_data):
-            messagebox.showinfo("Успех", f"Клиент добавлен!")
-            window.destroy()
-        else:
-            messagebox.showerror("Ошибка", "Не удалось сохранить данные.")
+        # 🔹 Сохранение — в фоне, окно не зависает на записи в Excel
+        def done(saved):
+            if not window.winfo_exists():
+                return
+            save_btn.config(state="normal")
+            if saved:
+                messagebox.showinfo("Успех", f"Клиент добавлен!", parent=window)
+                window.destroy()
+            else:
+                messagebox.showerror("Ошибка", "Не удалось сохранить данные.", parent=window)
+
+        def cancelled(job):
+            if window.winfo_exists():
+                save_btn.config(state="normal")
+                messagebox.showwarning("Отменено", "Клиент не сохранён: задание отменено.", parent=window)
+
+        save_btn.config(state="disabled")
+        job_queue().submit(_save_new_client, full_data, name=f"Новый клиент: {data['surname']}",
+                           on_done=done, on_error=lambda error: done(False), on_cancel=cancelled)
 
     # Кнопки
     button_frame = ttk.Frame(window)
     button_frame.grid(row=len(fields_config) + 1, column=0, columnspan=2, pady=20)
 
     ttk.Button(button_frame, text="Отмена", command=window.destroy).pack(side="left", padx=5)
-    ttk.Button(button_frame, text="Сохранить", command=submit).pack(side="left", padx=5)
+    save_btn = ttk.Button(button_frame, text="Сохранить", command=submit)
+    save_btn.pack(side="left", padx=5)
 
     # Фокус на первое поле
     entries["surname"].focus()
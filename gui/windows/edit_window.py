@@ -4,13 +4,34 @@ from tkinter import ttk, messagebox
 from typing import Dict, Any
 
 # Импорты из проекта
-from core.database import find_client
+from core.database import update_client
+from core.jobs import check_cancelled, job_queue, report_progress
+from gui.widgets.autocomplete import Autocomplete, client_suggestions
+from gui.widgets.client_lookup import confirm_similar_client, find_client_or_similar
 from config.settings import WINDOW_WIDTH, ENTRY_WIDTH
 
 
+def _find_client_for_edit(vin: str):
+    """Поиск клиента (в фоне). :return: (клиент, найден ли он точно)"""
+    report_progress(0, 1, "поиск клиента")
+    found = find_client_or_similar(vin)
+    report_progress(1, 1)
+    return found
+
+
+def _save_client_changes(client_id: int, new_data: Dict[str, Any], expected):
+    """Запись изменений клиента (в фоне); отмена — до начала записи"""
+    report_progress(0, 1, "запись в базу")
+    check_cancelled()
+    updated = update_client(client_id, new_data, expected=expected)
+    report_progress(1, 1)
+    return updated
+
+
 def open_edit_window(parent):
     """
-    Окно для редактирования данных клиента по VIN
+    Окно для редактирования данных клиента по VIN.
+    Поиск и запись идут в фоне (core.jobs)
     :param parent: родительское окно
     """
     window = tk.Toplevel(parent)
@@ -45,26 +66,41 @@ def open_edit_window(parent):
     search_entry = ttk.Entry(search_frame, width=ENTRY_WIDTH)
     search_entry.pack(side="left", padx=10)
     search_entry.focus()
+    # Подсказки при вводе VIN или ФИО: выбранный клиент сразу загружается
+    Autocomplete(search_entry, client_suggestions, on_select=lambda vin: load_client())
 
     entries = {}
-    client_row_num = None
+    client_id = None
     original_data = {}
 
     def load_client():
-        nonlocal client_row_num, original_data
         vin = search_entry.get().strip()
         if not vin:
             messagebox.showwarning("Внимание", "Введите VIN.")
             return
 
-        # Поиск по VIN
-        client_data = find_client(vin)
+        # Поиск по VIN — в фоне, дальше в show_client
+        def failed(error):
+            if window.winfo_exists():
+                messagebox.showerror("Ошибка", f"Не удалось найти клиента:\n{error}", parent=window)
+
+        job_queue().submit(_find_client_for_edit, vin, name="Поиск клиента",
+                           on_done=lambda found: show_client(vin, found), on_error=failed)
+
+    def show_client(vin, found):
+        nonlocal client_id, original_data
+        if not window.winfo_exists():
+            return  # Окно закрыли, пока шёл поиск
+        client_data, exact = found
         if client_data is None:
-            messagebox.showerror("Ошибка", "Клиент с таким VIN не найден.")
+            messagebox.showerror("Ошибка", "Клиент с таким VIN не найден.", parent=window)
+            return
+        # Найден с опечаткой — только после подтверждения оператора
+        if not exact and not confirm_similar_client(client_data, vin, window):
             return
 
-        client_row_num = int(client_data["№"]) + 1  # Excel-строка (учитывая заголовок)
-        original_data = client_data.to_dict()
+        client_id = int(client_data["№"])
+        original_data = client_data
 
         # Заполнение полей
         for label_text, field_name in fields_config:
@@ -77,7 +113,7 @@ def open_edit_window(parent):
         save_btn.config(state="normal")
 
     def save_changes():
-        if client_row_num is None:
+        if client_id is None:
             return
 
         # Сбор новых данных
@@ -85,54 +121,35 @@ def open_edit_window(parent):
         for label_text, field_name in fields_config:
             new_data[field_name] = entries[field_name].get().strip()
 
-        # Генерация имени папки
-        folder_name = f"{new_data['Фамилия']}_{new_data['Марка авто']}_vin {new_data['VIN']}_{new_data['Индекс']}"
-
-        # Обновление в Excel
-        try:
-            from openpyxl import load_workbook
-            from config.paths import CLIENTS_DB_PATH
-
-            wb = load_workbook(CLIENTS_DB_PATH)
-            ws = wb["Folder"]
-
-            # Все поля в правильном порядке
-            ordered_fields = [
-                "№", "Фамилия", "Имя", "Отчество", "Марка авто", "VIN",
-                "Индекс", "Папка", "Адрес", "Паспорт (серия и номер)",
-                "Кем выдан", "Дата выдачи", "Код подразделения",
-                "Телефон", "Дата рождения", "Дата создания папки"
-            ]
-
-            row_data = [
-                original_data["№"],  # № не меняем
-                new_data["Фамилия"],
-                new_data["Имя"],
-                new_data["Отчество"],
-                new_data["Марка авто"],
-                new_data["VIN"],
-                new_data["Индекс"],
-                folder_name,
-                new_data["Адрес"],
-                new_data["Паспорт (серия и номер)"],
-                new_data["Кем выдан"],
-                new_data["Дата выдачи"],
-                new_data["Код подразделения"],
-                new_data["Телефон"],
-                new_data["Дата рождения"],
-                original_data["Дата создания папки"]  # дата создания не меняется
-            ]
-
-            # Перезапись строки
-            for col, value in enumerate(row_data, 1):
-                ws.cell(row=client_row_num, column=col, value=value)
-
-            wb.save(CLIENTS_DB_PATH)
-            messagebox.showinfo("Успех", "Данные успешно обновлены!")
-            window.destroy()
-
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось сохранить изменения:\n{e}")
+        # Обновление в хранилище: пишутся только изменённые ячейки,
+        # имя папки пересобирается, № и дата создания папки не меняются
+        # expected: если клиента тем временем изменили на другом рабочем месте,
+        # его правки не затираются
+        def done(updated):
+            if not window.winfo_exists():
+                return
+            save_btn.config(state="normal")
+            if updated is not None:
+                messagebox.showinfo("Успех", "Данные успешно обновлены!", parent=window)
+                window.destroy()
+            else:
+                messagebox.showerror(
+                    "Ошибка",
+                    "Не удалось сохранить изменения.\n"
+                    "Возможно, клиента изменили на другом рабочем месте — найдите его заново.\n"
+                    "Подробности в логе.",
+                    parent=window,
+                )
+
+        def save_cancelled(job):
+            if window.winfo_exists():
+                save_btn.config(state="normal")
+                messagebox.showwarning("Отменено", "Изменения не сохранены: задание отменено.", parent=window)
+
+        save_btn.config(state="disabled")
+        job_queue().submit(_save_client_changes, client_id, new_data, original_data,
+                           name="Сохранение клиента", on_done=done, on_error=lambda error: done(None),
+                           on_cancel=save_cancelled)
 
     # --- 2. Форма редактирования ---
     form_frame = ttk.Frame(window)
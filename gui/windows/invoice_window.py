@@ -3,14 +3,45 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 
 # Импорты из проекта
-from core.database import find_client
+from core.database import resolve_contracts
 from core.document_generator import generate_invoice
+from core.jobs import check_cancelled, job_queue, report_progress
+from gui.widgets.autocomplete import Autocomplete, contract_suggestions
+from gui.widgets.client_lookup import confirm_similar_client, find_client_or_similar
 from config.settings import WINDOW_WIDTH, ENTRY_WIDTH
 
 
+def _find_client_for_invoice(search_term: str, contract_num: str):
+    """
+    Клиент по номеру договора, иначе по ФИО или VIN (в фоне).
+    :return: (клиент или None, найден ли он точно)
+    """
+    report_progress(0, 2, "поиск договора")
+    resolved = resolve_contracts([contract_num])
+    check_cancelled()
+    report_progress(1, 2, "поиск клиента")
+    if resolved:
+        # Нашли по номеру договора → клиент по "№ клиента" из строки реестра
+        # (старые строки без него — по полному ФИО, если такой клиент один)
+        _, client_data = resolved[contract_num]
+        return client_data, True
+    # Ищем напрямую по ФИО или VIN
+    return find_client_or_similar(search_term)
+
+
+def _issue_invoice(**invoice):
+    """Генерация счёта (в фоне); отмена — пока документ не начал создаваться"""
+    report_progress(0, 1, "документ")
+    check_cancelled()
+    success = generate_invoice(**invoice)
+    report_progress(1, 1)
+    return success
+
+
 def open_invoice_window(parent):
     """
-    Окно для выставления счёта клиенту
+    Окно для выставления счёта клиенту.
+    Поиск и генерация счёта идут в фоне (core.jobs)
     :param parent: родительское окно
     """
     window = tk.Toplevel(parent)
@@ -32,6 +63,8 @@ def open_invoice_window(parent):
     search_entry = ttk.Entry(window, width=ENTRY_WIDTH)
     search_entry.grid(row=row_idx, column=1, padx=(0, 10), pady=15, sticky="ew")
     search_entry.focus()
+    # Подсказки при вводе номера договора или ФИО
+    Autocomplete(search_entry, contract_suggestions, on_select=lambda contract_num: amount_entry.focus())
     row_idx += 1
 
     # --- 2. Услуга ---
@@ -89,59 +122,73 @@ def open_invoice_window(parent):
         else:
             search_term_for_search = search_term
 
-        # Поиск в реестре договоров (по номеру) или по ФИО/VIN
-        from core.database import pd
-        try:
-            contracts_df = pd.read_excel("data/contracts_registry.xlsx", sheet_name="Registry")
-            contract_match = contracts_df[
-                contracts_df["Номер договора"].astype(str) == search_term_for_search
-                ]
-            if not contract_match.empty:
-                # Нашли по номеру договора → ищем клиента по ФИО
-                client_fio = contract_match.iloc[0]["ФИО"]
-                client_parts = client_fio.split()
-                if len(client_parts) >= 1:
-                    client_data = find_client(client_parts[0])  # по фамилии
-                else:
-                    client_data = None
-            else:
-                # Ищем напрямую по ФИО или VIN
-                client_data = find_client(search_term)
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось прочитать реестр договоров:\n{e}")
-            return
+        # Поиск в реестре договоров (по номеру) или по ФИО/VIN — в фоне
+        def search_failed(error):
+            if window.winfo_exists():
+                issue_btn.config(state="normal")
+                messagebox.showerror("Ошибка", f"Не удалось прочитать реестр договоров:\n{error}", parent=window)
+
+        def search_cancelled(job):
+            if window.winfo_exists():
+                issue_btn.config(state="normal")
+
+        issue_btn.config(state="disabled")
+        job_queue().submit(
+            _find_client_for_invoice, search_term, search_term_for_search, name="Поиск договора",
+            on_done=lambda found: confirm_invoice(search_term, found, search_term_for_search, service, amount),
+            on_error=search_failed, on_cancel=search_cancelled,
+        )
 
+    def confirm_invoice(search_term, found, contract_num, service, amount):
+        if not window.winfo_exists():
+            return  # Окно закрыли, пока шёл поиск
+        issue_btn.config(state="normal")
+        client_data, exact = found
         if client_data is None:
-            messagebox.showerror("Ошибка", "Клиент не найден.")
+            messagebox.showerror("Ошибка", "Клиент не найден.", parent=window)
+            return
+        # Найден с опечаткой — только после подтверждения оператора
+        if not exact and not confirm_similar_client(client_data, search_term, window):
             return
 
         # Подтверждение
         full_name = f"{client_data['Фамилия']} {client_data['Имя']} {client_data['Отчество']}"
         msg = f"Выставить счёт на {amount} ₽\nуслуга: {service}\nклиенту: {full_name}?"
-        if not messagebox.askyesno("Подтверждение", msg):
+        if not messagebox.askyesno("Подтверждение", msg, parent=window):
             return
 
-        # Генерация счёта
-        success = generate_invoice(
-            client_data=client_data.to_dict(),
-            contract_num=search_term_for_search,
+        # Генерация счёта — в фоне, итог сообщается из главного окна
+        def done(success):
+            if success:
+                messagebox.showinfo("Успех", f"Счёт по договору {contract_num} успешно создан!", parent=parent)
+            else:
+                messagebox.showerror("Ошибка", f"Не удалось создать счёт по договору {contract_num}.\n"
+                                               "Проверьте шаблоны в папке 'templates/'.", parent=parent)
+
+        def cancelled(job):
+            messagebox.showwarning("Отменено", f"Счёт по договору {contract_num} не создан: задание отменено.",
+                                   parent=parent)
+
+        job_queue().submit(
+            _issue_invoice,
+            name=f"Счёт: {contract_num}",
+            on_done=done,
+            on_cancel=cancelled,
+            client_data=client_data,
+            contract_num=contract_num,
             service_type=service,
             amount=amount,
             payment_method=payment_var.get()
         )
-
-        if success:
-            messagebox.showinfo("Успех", "Счёт успешно создан!")
-            window.destroy()
-        else:
-            messagebox.showerror("Ошибка", "Не удалось создать счёт.\nПроверьте шаблоны в папке 'templates/'.")
+        window.destroy()
 
     # --- Кнопки ---
     button_frame = ttk.Frame(window)
     button_frame.grid(row=row_idx + 1, column=0, columnspan=2, pady=20)
 
     ttk.Button(button_frame, text="Отмена", command=window.destroy).pack(side="left", padx=5)
-    ttk.Button(button_frame, text="Выставить счёт", command=issue_invoice).pack(side="left", padx=5)
+    issue_btn = ttk.Button(button_frame, text="Выставить счёт", command=issue_invoice)
+    issue_btn.pack(side="left", padx=5)
 
     # Обработка Enter
     search_entry.bind("<Return>", lambda event: amount_entry.focus())
@@ -2,6 +2,8 @@
 import tkinter as tk
 from tkinter import messagebox
 import os
+import threading
+import logging
 
 import sys
 from pathlib import Path
@@ -14,8 +16,13 @@ from gui.windows.contract_window import open_contract_window
 from gui.windows.invoice_window import open_invoice_window
 from gui.windows.edit_window import open_edit_window
 
+from gui.widgets.job_status import JobStatusBar
+
 from core.utils import setup_logging
+from core.jobs import job_queue
+from core.database import compact_storage, has_pending_writes, warm_cache
 from config.paths import OUTPUT_DIR, CLIENTS_DB_PATH, CONTRACTS_DB_PATH
+from config.settings import JOURNAL_COMPACT_INTERVAL_MS
 
 
 def create_directories():
@@ -35,9 +42,28 @@ def check_files():
     return missing
 
 
+def compact_when_idle():
+    """Периодически переносит журнал новых записей в файлы Excel (в фоне)"""
+    try:
+        if has_pending_writes():
+            job_queue().submit(compact_storage, name="Запись в Excel")
+    except Exception as e:
+        logging.error(f"Ошибка проверки журнала: {e}")
+    finally:
+        # Одна неудачная проверка не останавливает периодический перенос
+        root.after(JOURNAL_COMPACT_INTERVAL_MS, compact_when_idle)
+
+
 def on_closing():
     """Действие при закрытии окна"""
-    if messagebox.askokcancel("Выход", "Закрыть программу?"):
+    active = job_queue().active()
+    question = "Закрыть программу?"
+    if active:
+        question = (f"Фоновых заданий: {len(active)}.\n"
+                    "Начатые будут завершены, остальные отменены.\n\n" + question)
+    if messagebox.askokcancel("Выход", question):
+        job_queue().shutdown(wait=True)
+        compact_storage()  # Все новые записи — в Excel перед выходом
         root.destroy()
 
 
@@ -45,7 +71,7 @@ def create_main_window():
     global root
     root = tk.Tk()
     root.title("AutoContractManager — Оформление договоров")
-    root.geometry("450x500")
+    root.geometry("450x540")
     root.resizable(False, False)
 
     # Настройка фона и шрифтов
@@ -98,9 +124,16 @@ def create_main_window():
         command=lambda: open_edit_window(root)
     ).pack(pady=10)
 
+    # Ход фоновых заданий (генерация документов, поиск, запись в Excel)
+    JobStatusBar(root, job_queue()).pack(side="bottom", fill="x", pady=(0, 10))
+    job_queue().attach(root)
+
     # Обработчик закрытия окна
     root.protocol("WM_DELETE_WINDOW", on_closing)
 
+    # Перенос журнала записей в Excel в простое
+    root.after(JOURNAL_COMPACT_INTERVAL_MS, compact_when_idle)
+
     return root
 
 
@@ -121,6 +154,9 @@ def main():
             "\n\nСоздайте их вручную или скопируйте шаблоны."
         )
 
+    # Таблицы и индексы загружаются в фоне, пока открывается окно
+    threading.Thread(target=warm_cache, name="warm-cache", daemon=True).start()
+
     # Создаём главное окно
     global root
     root = create_main_window()
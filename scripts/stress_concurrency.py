@@ -0,0 +1,141 @@
+# scripts/stress_concurrency.py — проверка записи с нескольких рабочих мест
+"""
+Несколько процессов одновременно сохраняют клиентов (save_client), договоры
+(save_contract_record) и переносят журнал в Excel (compact_storage) — как
+несколько компьютеров с общей папкой data/. Работает на пустых таблицах
+во временной папке, рабочие данные не трогает.
+
+В конце проверяется, что сохранено ровно столько строк, сколько записали
+процессы, и что № клиентов, Номера реестра и номера договоров не повторяются.
+
+    python scripts/stress_concurrency.py --processes 4 --iterations 25
+"""
+import argparse
+import logging
+import multiprocessing
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+
+def use_data_dir(data_dir: Path):
+    """Пути config.paths → временная папка (до импорта core)"""
+    import config.paths as paths
+    paths.DATA_DIR = data_dir
+    paths.OUTPUT_DIR = data_dir / "documents_ready"
+    paths.CLIENTS_DB_PATH = data_dir / "database_of_contracts.xlsx"
+    paths.CONTRACTS_DB_PATH = data_dir / "contracts_registry.xlsx"
+    paths.SQLITE_DB_PATH = data_dir / "database.sqlite3"
+    paths.SEQUENCES_PATH = data_dir / "sequences.json"
+    paths.REGISTRY_ARCHIVE_DIR = data_dir / "registry_archive"
+    paths.OUTPUT_DIR.mkdir(exist_ok=True)
+
+
+def create_tables(data_dir: Path):
+    """Пустые листы "Folder" и "Registry" с заголовками"""
+    use_data_dir(data_dir)
+    from openpyxl import Workbook
+    from core.storage import COLUMNS, EXCEL_SHEETS
+    for table, (path, sheet) in EXCEL_SHEETS.items():
+        wb = Workbook()
+        wb.active.title = sheet
+        wb.active.append(COLUMNS[table])
+        wb.save(path)
+
+
+def worker(data_dir: Path, worker_id: int, iterations: int, compact_every: int):
+    """Одно «рабочее место»: клиент + договор за шаг, время от времени — перенос журнала"""
+    use_data_dir(data_dir)
+    logging.basicConfig(level=logging.ERROR)
+    from core.database import (
+        compact_storage, find_client, reserve_client_id, reserve_contract_number,
+        reserve_registry_id, save_client, save_contract_record,
+    )
+    for i in range(iterations):
+        vin = f"STRESS{worker_id:03d}{i:08d}"
+        client = {
+            "Фамилия": f"Нагрузкин{worker_id}", "Имя": f"Шаг{i}", "Отчество": "Тестович",
+            "Марка авто": "LADA", "VIN": vin, "Телефон": f"+7 900 {worker_id:03d}-{i:04d}",
+        }
+        # Как окно ввода: № резервируется заранее; через шаг — без № (выдаст save_client)
+        if i % 2 == 0:
+            client["№"] = reserve_client_id()
+        if not save_client(client):
+            raise RuntimeError(f"Клиент {vin} не сохранён")
+
+        contract = {
+            "Номер": reserve_registry_id(), "ФИО": f"Нагрузкин{worker_id} Шаг{i} Тестович",
+            "Номер договора": reserve_contract_number(), "Телефон": client["Телефон"],
+            "Индекс": "", "Дата": "01.01.2026",
+        }
+        if not save_contract_record(contract):
+            raise RuntimeError(f"Договор {contract['Номер договора']} не сохранён")
+
+        if compact_every and (i + 1) % compact_every == 0:
+            compact_storage()
+        if find_client(vin) is None:
+            raise RuntimeError(f"Клиент {vin} не найден после сохранения")
+
+
+def _duplicates(values) -> list:
+    return sorted(str(value) for value, count in Counter(values).items() if count > 1)
+
+
+def check(data_dir: Path, expected: int) -> list:
+    """Ошибки после прогона (пустой список — всё сошлось)"""
+    use_data_dir(data_dir)
+    from core.database import compact_storage, invalidate_cache, read_table
+    compact_storage()
+    invalidate_cache()
+    clients, registry = read_table("clients"), read_table("registry")
+    errors = []
+    if len(clients) != expected:
+        errors.append(f"клиентов {len(clients)}, ожидалось {expected}")
+    if len(registry) != expected:
+        errors.append(f"договоров {len(registry)}, ожидалось {expected}")
+    for title, values in (("№ клиента", [c.number for c in clients]),
+                          ("VIN", [c.vin for c in clients]),
+                          ("Номер в реестре", [r.number for r in registry]),
+                          ("номер договора", [r.contract_num for r in registry])):
+        duplicates = _duplicates(values)
+        if duplicates:
+            errors.append(f"{title} повторяется: {', '.join(duplicates[:10])}")
+    return errors
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Одновременная запись с нескольких процессов")
+    parser.add_argument("--processes", type=int, default=4, help="сколько «рабочих мест»")
+    parser.add_argument("--iterations", type=int, default=25, help="клиентов и договоров на процесс")
+    parser.add_argument("--compact-every", type=int, default=5, help="перенос журнала каждые N шагов (0 — нет)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="stress_") as tmp:
+        data_dir = Path(tmp)
+        create_tables(data_dir)
+        # spawn: каждый процесс сам импортирует core с путями временной папки
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=worker, args=(data_dir, n, args.iterations, args.compact_every))
+                     for n in range(args.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        errors = [f"процесс {n} завершился с кодом {p.exitcode}" for n, p in enumerate(processes) if p.exitcode]
+        errors += check(data_dir, args.processes * args.iterations)
+
+    if errors:
+        for error in errors:
+            print(f"🔴 {error}")
+        return 1
+    print(f"✅ {args.processes} процессов × {args.iterations}: строки сошлись, номера не повторяются")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())